@@ -0,0 +1,51 @@
+'''Access codes under sustained load: codes are created continuously,
+number of live codes and memory usage must reach steady state.
+
+Usage: python -m benchmarks.access_code_churn [--rate 5000] [--ttl 2]'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from argparse import ArgumentParser
+from asyncio import run, sleep
+from datetime import datetime, timedelta
+from resource import RUSAGE_SELF, getrusage
+from time import perf_counter
+
+from bigur.auth.store import Memory
+
+
+async def load(rate: int, ttl: float, duration: float) -> None:
+    store = Memory(reap_interval=0.1)
+    await store.start()
+
+    started = perf_counter()
+    reported = started
+    while perf_counter() - started < duration:
+        now = datetime.now()
+        for _ in range(rate // 10):
+            await store.access_codes.create(
+                expires=now + timedelta(seconds=ttl))
+        await sleep(0.1)
+        if perf_counter() - reported >= 1:
+            reported = perf_counter()
+            stats = store.access_codes.stats()
+            print('{:>6.1f}s live={:<8} reaped={:<8} maxrss={} KiB'.format(
+                reported - started, stats['live'], stats['reaped'],
+                getrusage(RUSAGE_SELF).ru_maxrss))
+
+    await store.stop()
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('--rate', type=int, default=5000, help='codes/sec')
+    parser.add_argument('--ttl', type=float, default=2, help='code lifetime')
+    parser.add_argument('--duration', type=float, default=10, help='seconds')
+    args = parser.parse_args()
+    run(load(args.rate, args.ttl, args.duration))
+
+
+if __name__ == '__main__':
+    main()
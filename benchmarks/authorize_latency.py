@@ -0,0 +1,184 @@
+'''Latency of `/auth/authorize` (implicit grant, RS256 access token)
+under concurrent load with inline and offloaded token signing. Also
+measures latency of trivial endpoint, served by same event loop, to
+show how much signing blocks the loop.
+
+Usage: python -m benchmarks.authorize_latency [-c 50] [-d 5]'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from argparse import ArgumentParser
+from asyncio import gather, run, sleep
+from logging import ERROR, getLogger
+from os.path import dirname, normpath
+from time import perf_counter
+from typing import List
+
+from aiohttp import ClientSession, CookieJar
+from aiohttp.test_utils import TestServer
+from aiohttp.web import Application, Response
+from aiohttp_jinja2 import setup as jinja_setup
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric.rsa import generate_private_key
+from jinja2 import FileSystemLoader
+from kaptan import Kaptan
+
+from bigur.auth.authn.user import UserPass
+from bigur.auth.config import Settings, set_settings
+from bigur.auth.handler.oauth2 import AuthorizationHandler
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.middlewares import session
+from bigur.auth.model import Client, Scope, User
+from bigur.auth.session import MemorySessionStore, sessions
+from bigur.auth.signer import create_backend
+from bigur.auth.store import Memory, store
+
+CONFIG = {
+    'authn': {
+        'cookie': {
+            'secure': False,
+            'session_name': 'sid',
+            'id_name': 'uid',
+            'max_age': 3600
+        },
+    },
+    'http_server': {
+        'endpoints': {
+            'login': {
+                'path': '/auth/login'
+            },
+        }
+    },
+}
+
+
+async def ping(request):
+    return Response(text='pong')
+
+
+async def create_app(key, backend: str, workers: int) -> Application:
+    app = Application(middlewares=[session])
+    cfg = Kaptan()
+    cfg.import_config(CONFIG)
+    app['config'] = cfg
+    set_settings(Settings.from_config(cfg))
+    app['cookie_key'] = bytes(32)
+    jinja_setup(
+        app,
+        loader=FileSystemLoader(normpath(dirname(__file__) + '/../templates')))
+    app.router.add_route('*', '/auth/login', UserPass)
+    app.router.add_route('*', '/auth/authorize', AuthorizationHandler)
+    app.router.add_route('GET', '/ping', ping)
+
+    key_jar = KeyJar(keys=[key])
+
+    async def start_signing(app):
+        await key_jar.start(create_backend(backend, workers=workers))
+
+    async def stop_signing(app):
+        await key_jar.stop()
+
+    app.on_startup.append(start_signing)
+    app.on_cleanup.append(stop_signing)
+    return app
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+async def measure(key, backend: str, concurrency: int, duration: float,
+                  workers: int) -> None:
+    store.set_store(Memory())
+    sessions.set_store(MemorySessionStore())
+    user = await store.users.put(User(username='admin', password='123'))
+    await store.scopes.put(Scope(code='read', title='Read', default=True))
+    server = TestServer(await create_app(key, backend, workers))
+    await server.start_server()
+    redirect_uri = str(server.make_url('/feedback'))
+    client = await store.clients.put(
+        Client(
+            client_type='public',
+            user_id=user.id,
+            title='Benchmark',
+            redirect_uris=[redirect_uri]))
+
+    authorize: List[float] = []
+    pings: List[float] = []
+    stop = perf_counter() + duration
+
+    async with ClientSession(cookie_jar=CookieJar(unsafe=True)) as http:
+        await http.post(
+            server.make_url('/auth/login'),
+            data={
+                'username': 'admin',
+                'password': '123'
+            })
+        params = {
+            'response_type': 'token',
+            'client_id': client.id,
+            'redirect_uri': redirect_uri,
+        }
+
+        async def load():
+            while perf_counter() < stop:
+                start = perf_counter()
+                async with http.get(
+                        server.make_url('/auth/authorize'),
+                        params=params,
+                        allow_redirects=False) as response:
+                    assert response.status == 303, response.status
+                authorize.append(perf_counter() - start)
+
+        async def probe():
+            while perf_counter() < stop:
+                start = perf_counter()
+                async with http.get(server.make_url('/ping')) as response:
+                    await response.read()
+                pings.append(perf_counter() - start)
+                await sleep(0.01)
+
+        await gather(probe(), *[load() for _ in range(concurrency)])
+
+    await server.close()
+
+    print('{:<8} {:>8.0f} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f}'.format(
+        backend,
+        len(authorize) / duration,
+        percentile(authorize, 0.5),
+        percentile(authorize, 0.99),
+        percentile(pings, 0.5),
+        percentile(pings, 0.99),
+    ))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-c', dest='concurrency', type=int, default=50)
+    parser.add_argument('-d', dest='duration', type=float, default=5)
+    parser.add_argument('-w', dest='workers', type=int, default=None)
+    parser.add_argument(
+        '-b',
+        dest='backends',
+        nargs='+',
+        default=['inline', 'thread', 'process'])
+    args = parser.parse_args()
+
+    getLogger('bigur').setLevel(ERROR)
+
+    key = generate_private_key(
+        public_exponent=65537, key_size=2048, backend=default_backend())
+
+    print('{:<8} {:>8} {:>9} {:>9} {:>9} {:>9}'.format(
+        'backend', 'req/s', 'p50, ms', 'p99, ms', 'ping p50', 'ping p99'))
+    for backend in args.backends:
+        run(
+            measure(key, backend, args.concurrency, args.duration,
+                    args.workers))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''Encode and decode throughput of authentication cookie: AES-CBC with
+cipher and padder built for every value (as before) and AES-GCM codec
+created once for a key.
+
+Usage: python -m benchmarks.cookie_codec [-n 100000]'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from argparse import ArgumentParser
+from os import urandom
+from time import perf_counter
+from typing import Callable
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher
+from cryptography.hazmat.primitives.ciphers.algorithms import AES
+from cryptography.hazmat.primitives.ciphers.modes import CBC
+
+from bigur.auth.authn.user.base import BLOCK_SIZE, VERSION_GCM, CookieCodec
+
+USER_ID = '5c4d2ad3e4f1b2a3c4d5e6f7'
+
+
+def legacy_crypt(key: bytes, username: str) -> bytes:
+    iv: bytes = urandom(BLOCK_SIZE)
+    cipher = Cipher(AES(key), CBC(iv), backend=default_backend())
+    encryptor = cipher.encryptor()
+    padder = padding.PKCS7(BLOCK_SIZE * 8).padder()
+    padded = (padder.update(username.encode('utf-8')) + padder.finalize())
+    return iv + encryptor.update(padded) + encryptor.finalize()
+
+
+def legacy_decrypt(key: bytes, value: bytes) -> str:
+    cipher = Cipher(AES(key), CBC(value[:BLOCK_SIZE]),
+                    backend=default_backend())
+    decryptor = cipher.decryptor()
+    padded = decryptor.update(value[BLOCK_SIZE:]) + decryptor.finalize()
+    unpadder = padding.PKCS7(BLOCK_SIZE * 8).unpadder()
+    return (unpadder.update(padded) + unpadder.finalize()).decode('utf-8')
+
+
+def measure(title: str, func: Callable, arg, count: int) -> None:
+    begin = perf_counter()
+    for _ in range(count):
+        func(arg)
+    elapsed = perf_counter() - begin
+    print('{:<16} {:>10.0f} {:>8.2f}'.format(
+        title, count / elapsed, elapsed / count * 1e6))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', dest='count', type=int, default=100000)
+    args = parser.parse_args()
+
+    key = urandom(32)
+    codec = CookieCodec(key)
+    legacy_value = legacy_crypt(key, USER_ID)
+    # Legacy value with version byte of GCM value is rejected by codec
+    while legacy_value[0] == VERSION_GCM:
+        legacy_value = legacy_crypt(key, USER_ID)
+    value = codec.encode(USER_ID)
+
+    print('{:<16} {:>10} {:>8}'.format('operation', 'ops/s', 'us/op'))
+    measure('cbc encode', lambda x: legacy_crypt(key, x), USER_ID, args.count)
+    measure('cbc decode', lambda x: legacy_decrypt(key, x), legacy_value,
+            args.count)
+    measure('gcm encode', codec.encode, USER_ID, args.count)
+    measure('gcm decode', codec.decode, value, args.count)
+    measure('cbc fallback', codec.decode, legacy_value, args.count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+'''Requests per second of JWKS endpoint: key set built on every request
+(as before), precomputed key set and conditional requests answered
+with 304 Not Modified.
+
+Usage: python -m benchmarks.jwks_endpoint [-c 20] [-d 3] [-k 2]'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from argparse import ArgumentParser
+from asyncio import gather, run
+from base64 import urlsafe_b64encode
+from hashlib import sha1
+from time import perf_counter
+from typing import Dict
+
+from aiohttp import ClientSession
+from aiohttp.test_utils import TestServer
+from aiohttp.web import Application, View, json_response
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric.rsa import generate_private_key
+from kaptan import Kaptan
+
+from bigur.auth.config import Settings, set_settings
+from bigur.auth.handler.oidc import JWKSHandler
+from bigur.auth.key_jar import KeyJar
+
+
+class LegacyJWKSHandler(View):
+    '''Key set built on every request.'''
+
+    async def get(self):
+        result = []
+        for private_key in self.request.app['jwt_keys']:
+            key = private_key.public_key()
+            numbers = key.public_numbers()
+            e = numbers.e.to_bytes(4, 'big').lstrip(b'\x00')
+            n = numbers.n.to_bytes(int(key.key_size / 8), 'big').lstrip(b'\x00')
+            result.append({
+                'e': urlsafe_b64encode(e).decode('utf-8'),
+                'kty': 'RSA',
+                'alg': 'RS256',
+                'n': urlsafe_b64encode(n).decode('utf-8'),
+                'use': 'sig',
+                'kid': sha1(n).hexdigest()
+            })
+        return json_response({'keys': result})
+
+
+async def measure(keys, concurrency: int, duration: float) -> None:
+    app = Application()
+    cfg = Kaptan()
+    cfg.import_config(
+        {'http_server': {'endpoints': {'login': {'path': '/auth/login'}}}})
+    app['config'] = cfg
+    set_settings(Settings.from_config(cfg))
+    app['jwt_keys'] = keys
+    app.router.add_route('*', '/legacy', LegacyJWKSHandler)
+    app.router.add_route('*', '/jwks', JWKSHandler)
+    KeyJar(keys=keys)
+
+    server = TestServer(app)
+    await server.start_server()
+
+    async with ClientSession() as http:
+
+        async def load(path: str, headers: Dict[str, str],
+                       status: int) -> int:
+            url = server.make_url(path)
+            count = 0
+            stop = perf_counter() + duration
+            while perf_counter() < stop:
+                async with http.get(url, headers=headers) as response:
+                    assert response.status == status, response.status
+                    await response.read()
+                count += 1
+            return count
+
+        etag = KeyJar.instance().jwks_etag
+        for title, path, headers, status in (
+            ('per request', '/legacy', {}, 200),
+            ('precomputed', '/jwks', {}, 200),
+            ('304', '/jwks', {'If-None-Match': etag}, 304),
+        ):
+            counts = await gather(*[
+                load(path, headers, status) for _ in range(concurrency)
+            ])
+            print('{:<12} {:>8.0f}'.format(title, sum(counts) / duration))
+
+    await server.close()
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-c', dest='concurrency', type=int, default=20)
+    parser.add_argument('-d', dest='duration', type=float, default=3)
+    parser.add_argument('-k', dest='keys', type=int, default=2)
+    args = parser.parse_args()
+
+    keys = [
+        generate_private_key(
+            public_exponent=65537, key_size=2048, backend=default_backend())
+        for _ in range(args.keys)
+    ]
+
+    print('{:<12} {:>8}'.format('handler', 'req/s'))
+    run(measure(keys, args.concurrency, args.duration))
+
+
+if __name__ == '__main__':
+    main()
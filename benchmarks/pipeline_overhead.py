@@ -0,0 +1,116 @@
+'''Per-request overhead of processing pipeline: RxPY observables chain
+(as it was, requires `rx` package) and native async pipeline. Stages
+are trivial validators, so only the cost of the pipeline machinery is
+measured: time per request, tasks created per request and peak of
+memory allocated while running a batch of concurrent requests.
+
+Usage: python -m benchmarks.pipeline_overhead [-n 20000] [-c 100]'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from argparse import ArgumentParser
+from asyncio import Task, gather, get_running_loop, run
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+from typing import Any, Awaitable, Callable
+
+from bigur.auth.pipeline import Pipeline
+
+try:
+    from asyncio import create_task
+    from rx import return_value
+    from rx import operators as op
+except ImportError:  # pragma: no cover
+    return_value = None
+
+
+async def validate_one(context):
+    return context
+
+
+async def validate_two(context):
+    return context
+
+
+async def validate_three(context):
+    return context
+
+
+async def grant(context):
+    return {'access_token': context}
+
+
+pipeline = Pipeline(validate_one, validate_two, validate_three, grant)
+
+
+def call_async(func):
+
+    def invoke(value):
+        return create_task(func(value))
+
+    return invoke
+
+
+def rx_stream(context):
+    return return_value(context).pipe(
+        op.flat_map(call_async(validate_one)),
+        op.flat_map(call_async(validate_two)),
+        op.flat_map(call_async(validate_three)),
+        op.flat_map(call_async(grant)),
+    )
+
+
+async def measure(title: str, create: Callable[[Any], Awaitable[Any]],
+                  requests: int, concurrency: int) -> None:
+    loop = get_running_loop()
+    tasks = 0
+
+    def task_factory(loop, coro):
+        nonlocal tasks
+        tasks += 1
+        return Task(coro, loop=loop)
+
+    # Warm up
+    await gather(*[create(x) for x in range(concurrency)])
+
+    loop.set_task_factory(task_factory)
+    begin = perf_counter()
+    for i in range(0, requests, concurrency):
+        await gather(*[create(x) for x in range(i, i + concurrency)])
+    elapsed = perf_counter() - begin
+    loop.set_task_factory(None)
+    # gather() wraps each coroutine in a task, exclude them
+    tasks -= requests
+
+    start()
+    await gather(*[create(x) for x in range(concurrency)])
+    _, peak = get_traced_memory()
+    stop()
+
+    print('{:<10} {:>10.1f} {:>10.1f} {:>12.1f}'.format(
+        title, elapsed / requests * 1e6, tasks / requests,
+        peak / concurrency))
+
+
+async def main_async(requests: int, concurrency: int) -> None:
+    print('{:<10} {:>10} {:>10} {:>12}'.format('pipeline', 'us/req',
+                                               'tasks/req', 'bytes/req'))
+    if return_value is not None:
+        await measure('rx', rx_stream, requests, concurrency)
+    else:
+        print('rx is not installed, skipping')
+    await measure('native', pipeline, requests, concurrency)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', dest='requests', type=int, default=20000)
+    parser.add_argument('-c', dest='concurrency', type=int, default=100)
+    args = parser.parse_args()
+    run(main_async(args.requests, args.concurrency))
+
+
+if __name__ == '__main__':
+    main()
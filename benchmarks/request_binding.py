@@ -0,0 +1,82 @@
+'''Throughput of building OAuth2 request object from HTTP parameters:
+with reflection on every request (as before) and with cached
+per-class binder.
+
+Usage: python -m benchmarks.request_binding [-n 100000]'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from argparse import ArgumentParser
+from dataclasses import fields
+from time import perf_counter
+from typing import Set
+
+from multidict import MultiDict, MultiDictProxy
+
+from bigur.auth.oauth2.grant.authorization_code import AuthorizationRequest
+from bigur.auth.oauth2.request import get_binder
+
+PARAMS = MultiDictProxy(
+    MultiDict([
+        ('response_type', 'code'),
+        ('client_id', '0f7a1b9c2d3e4f5a6b7c8d9e0f1a2b3c'),
+        ('redirect_uri', 'https://client.example.com/callback'),
+        ('scope', 'openid profile email'),
+        ('state', 'af0ifjsldkj'),
+        ('nonce', 'n-0S6_WzA2Mj'),
+    ]))
+
+
+def legacy_bind(params, request_class):
+    new_params = MultiDict()
+    for k, v in params.items():
+        if v:
+            new_params.add(k, v)
+    params = new_params
+
+    kwargs = {}
+    request_fields = {f.name for f in fields(request_class)}
+    for k, v in params.items():
+        if k in request_fields:
+            kwargs[k] = v
+    request = request_class(**kwargs)
+
+    # OAuth2Request.__post_init__
+    keys = {x.name for x in fields(request) if x.type == Set[str]}
+    for key in keys:
+        value = getattr(request, key, None)
+        if value is None:
+            setattr(request, key, set())
+        elif isinstance(value, str):
+            setattr(request, key, {x for x in value.split() if x})
+    return request
+
+
+def binder_bind(params, request_class):
+    if not all(params.values()):
+        params = MultiDict((k, v) for k, v in params.items() if v)
+    return get_binder(request_class).bind(params)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', dest='requests', type=int, default=100000)
+    args = parser.parse_args()
+
+    assert (legacy_bind(PARAMS, AuthorizationRequest) == binder_bind(
+        PARAMS, AuthorizationRequest))
+
+    print('{:<8} {:>12} {:>8}'.format('method', 'requests/s', 'us/req'))
+    for title, bind in (('legacy', legacy_bind), ('binder', binder_bind)):
+        begin = perf_counter()
+        for _ in range(args.requests):
+            bind(PARAMS, AuthorizationRequest)
+        elapsed = perf_counter() - begin
+        print('{:<8} {:>12.0f} {:>8.2f}'.format(
+            title, args.requests / elapsed, elapsed / args.requests * 1e6))
+
+
+if __name__ == '__main__':
+    main()
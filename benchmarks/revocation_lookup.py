@@ -0,0 +1,76 @@
+'''Cost of revocation check for every verified token: lookups of not
+revoked (most of requests) and revoked ids in list with `-n` revoked
+tokens, expiring within access token lifetime, with and without Bloom
+filter. Memory is size of buckets (and filter) after revocation.
+
+Usage: python -m benchmarks.revocation_lookup [-n 1000 100000]
+    [-l 200000]'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from argparse import ArgumentParser
+from random import uniform
+from sys import getsizeof
+from time import perf_counter, time
+from uuid import uuid4
+
+from bigur.auth.oauth2.token import ACCESS_TOKEN_EXPIRE_SECONDS
+from bigur.auth.revocation import RevocationList
+
+
+def memory(revocations: RevocationList) -> int:
+    # pylint: disable=protected-access
+    size = getsizeof(revocations._buckets)
+    for bucket in revocations._buckets.values():
+        size += getsizeof(bucket) + sum(getsizeof(x) for x in bucket)
+    if revocations._filter is not None:
+        size += getsizeof(revocations._filter._bits)
+    return size
+
+
+def lookups_per_second(revocations: RevocationList, tokens) -> float:
+    is_revoked = revocations.is_revoked
+    begin = perf_counter()
+    for jti, exp in tokens:
+        is_revoked(jti, exp)
+    return len(tokens) / (perf_counter() - begin)
+
+
+def measure(count: int, lookups: int, bloom: bool) -> None:
+    now = time()
+    revocations = RevocationList(bloom=bloom)
+    revoked = [(uuid4().hex, now + uniform(60, ACCESS_TOKEN_EXPIRE_SECONDS))
+               for _ in range(count)]
+    for jti, exp in revoked:
+        revocations.revoke(jti, exp)
+    valid = [(uuid4().hex, now + uniform(60, ACCESS_TOKEN_EXPIRE_SECONDS))
+             for _ in range(lookups)]
+    revoked = (revoked * (lookups // count + 1))[:lookups]
+
+    print('{:<8} {:>8} {:>14.0f} {:>14.0f} {:>10.1f}'.format(
+        'bloom' if bloom else 'set',
+        count,
+        lookups_per_second(revocations, valid),
+        lookups_per_second(revocations, revoked),
+        memory(revocations) / 1024,
+    ))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-n', dest='counts', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('-l', dest='lookups', type=int, default=200000)
+    args = parser.parse_args()
+
+    print('{:<8} {:>8} {:>14} {:>14} {:>10}'.format(
+        'lookup', 'revoked', 'valid, 1/s', 'revoked, 1/s', 'memory, KiB'))
+    for count in args.counts:
+        for bloom in (False, True):
+            measure(count, args.lookups, bloom)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+'''Signing and verification speed of supported key algorithms. Every
+verified token is unique, so verification measures signature check,
+not cache of verified tokens. Size of token and of JSON web key set
+with one key is printed too.
+
+Usage: python -m benchmarks.signing_algorithms [-n 2000]
+    [-a RS256 ES256 EdDSA]'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from argparse import ArgumentParser
+from json import dumps
+from time import perf_counter, time
+
+from bigur.auth.oidc.grant.implicit import IDToken
+from bigur.auth.signer import ALGORITHMS, Signer, generate_key
+from bigur.auth.verifier import TokenVerifier
+
+
+def measure(alg: str, count: int) -> None:
+    signer = Signer(generate_key(alg))
+    now = int(time())
+    tokens = [
+        IDToken(
+            iss='https://localhost',
+            sub='user',
+            aud='client',
+            nonce=str(i),
+            iat=now,
+            exp=now + 600) for i in range(count)
+    ]
+
+    start = perf_counter()
+    encoded = [x.encode(signer) for x in tokens]
+    sign_elapsed = perf_counter() - start
+
+    verifier = TokenVerifier.from_jwks({'keys': [signer.jwk()]})
+    start = perf_counter()
+    for token in encoded:
+        verifier.verify(token)
+    verify_elapsed = perf_counter() - start
+
+    print('{:<8} {:>10.0f} {:>10.0f} {:>8} {:>8}'.format(
+        alg,
+        count / sign_elapsed,
+        count / verify_elapsed,
+        len(encoded[0]),
+        len(dumps({'keys': [signer.jwk()]})),
+    ))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', dest='count', type=int, default=2000)
+    parser.add_argument(
+        '-a', dest='algorithms', nargs='+', default=list(ALGORITHMS))
+    args = parser.parse_args()
+
+    print('{:<8} {:>10} {:>10} {:>8} {:>8}'.format('alg', 'sign/s',
+                                                   'verify/s', 'token',
+                                                   'jwks'))
+    for alg in args.algorithms:
+        measure(alg, args.count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+'''Memory store lookup benchmark: lookup cost must not depend on
+number of records.
+
+Usage: python -m benchmarks.store_lookup [-n 1000 10000 ...]'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from argparse import ArgumentParser
+from asyncio import run
+from random import randrange
+from time import perf_counter
+
+from bigur.auth.model import User, Scope
+from bigur.auth.store import Memory
+
+LOOKUPS = 100000
+
+
+async def fill(store: Memory, count: int) -> None:
+    for i in range(count):
+        user = User(username='user{}'.format(i))
+        user.add_oidc_account('provider', 'subject{}'.format(i))
+        await store.users.put(user)
+        await store.scopes.put(Scope(code='scope{}'.format(i), title=''))
+
+
+async def measure(count: int) -> None:
+    store = Memory()
+    await fill(store, count)
+
+    names = ['user{}'.format(randrange(count)) for _ in range(LOOKUPS)]
+    start = perf_counter()
+    for name in names:
+        await store.users.get_by_username(name)
+    by_username = (perf_counter() - start) / LOOKUPS
+
+    subjects = ['subject{}'.format(randrange(count)) for _ in range(LOOKUPS)]
+    start = perf_counter()
+    for subject in subjects:
+        await store.users.get_by_oidp('provider', subject)
+    by_oidp = (perf_counter() - start) / LOOKUPS
+
+    codes = ['scope{}'.format(randrange(count)) for _ in range(LOOKUPS)]
+    start = perf_counter()
+    for code in codes:
+        await store.scopes.get_by_code(code)
+    by_code = (perf_counter() - start) / LOOKUPS
+
+    print('{:>9} {:>12.3f} {:>12.3f} {:>12.3f}'.format(
+        count, by_username * 1e6, by_oidp * 1e6, by_code * 1e6))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-n',
+        dest='counts',
+        type=int,
+        nargs='+',
+        default=[1000, 10000, 100000, 1000000],
+        help='number of records')
+    args = parser.parse_args()
+
+    print('{:>9} {:>12} {:>12} {:>12}'.format('records', 'username, us',
+                                              'oidp, us', 'scope, us'))
+    for count in args.counts:
+        run(measure(count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+'''Throughput and latency of `/auth/token` exchanging authorization
+codes or refresh tokens for tokens. Codes and refresh tokens are created
+before measurement and each one is redeemed once, with `openid` scope ID
+token is signed too. Replayed grants are rejected without signing, so
+`-r` shows cost of failed redemption (replayed refresh token revokes its
+family).
+
+Usage: python -m benchmarks.token_endpoint [-c 50] [-n 20000] [-r 0]
+    [-g authorization_code refresh_token]'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from argparse import ArgumentParser
+from asyncio import gather, run
+from logging import ERROR, getLogger
+from time import perf_counter
+from typing import Dict, List
+
+from aiohttp import ClientSession
+from aiohttp.test_utils import TestServer
+from aiohttp.web import Application
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric.rsa import generate_private_key
+from kaptan import Kaptan
+
+from bigur.auth.config import Settings, set_settings
+from bigur.auth.handler.oauth2 import TokenHandler
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.middlewares import session
+from bigur.auth.model import Client, User
+from bigur.auth.model.refresh_token import generate_token, hash_token
+from bigur.auth.session import MemorySessionStore, sessions
+from bigur.auth.signer import create_backend
+from bigur.auth.store import Memory, store
+
+from .authorize_latency import CONFIG, percentile
+
+
+def create_app(key) -> Application:
+    app = Application(middlewares=[session])
+    cfg = Kaptan()
+    cfg.import_config(CONFIG)
+    app['config'] = cfg
+    set_settings(Settings.from_config(cfg))
+    app.router.add_route('*', '/auth/token', TokenHandler)
+
+    key_jar = KeyJar(keys=[key])
+
+    async def start_signing(app):
+        await key_jar.start(create_backend('inline'))
+
+    async def stop_signing(app):
+        await key_jar.stop()
+
+    app.on_startup.append(start_signing)
+    app.on_cleanup.append(stop_signing)
+    return app
+
+
+async def create_grants(grant_type: str, scopes: List[str], client: Client,
+                        redirect_uri: str, count: int) -> List[Dict[str, str]]:
+    '''Returns parameters of `count` token requests.'''
+    grants = []
+    for _ in range(count):
+        if grant_type == 'authorization_code':
+            code = await store.access_codes.create(
+                scopes=scopes,
+                client_id=client.id,
+                user_id=client.user_id,
+                redirect_uri=redirect_uri)
+            grants.append({'code': code.code, 'redirect_uri': redirect_uri})
+        else:
+            token = generate_token()
+            await store.refresh_tokens.create(
+                id=hash_token(token),
+                family=token,
+                user_id=client.user_id,
+                client_id=client.id,
+                scopes=scopes)
+            grants.append({'refresh_token': token})
+    return grants
+
+
+async def measure(key, grant_type: str, scope: str, concurrency: int,
+                  count: int, replay: int) -> None:
+    store.set_store(Memory())
+    sessions.set_store(MemorySessionStore())
+    user = await store.users.put(User(username='admin', password='123'))
+    server = TestServer(create_app(key))
+    await server.start_server()
+    redirect_uri = str(server.make_url('/feedback'))
+    client = await store.clients.put(
+        Client(
+            client_type='public',
+            user_id=user.id,
+            title='Benchmark',
+            redirect_uris=[redirect_uri]))
+    grants = await create_grants(grant_type, scope.split(), client,
+                                 redirect_uri, count)
+    # Every grant is sent `replay` more times, extra requests must fail
+    grants = [x for x in grants for _ in range(replay + 1)]
+
+    latencies: List[float] = []
+    statuses = {200: 0, 400: 0}
+    grants_iter = iter(grants)
+
+    async with ClientSession() as http:
+
+        async def load():
+            for grant in grants_iter:
+                start = perf_counter()
+                data = {'grant_type': grant_type, 'client_id': client.id}
+                data.update(grant)
+                async with http.post(
+                        server.make_url('/auth/token'),
+                        data=data) as response:
+                    await response.read()
+                    statuses[response.status] += 1
+                latencies.append(perf_counter() - start)
+
+        begin = perf_counter()
+        await gather(*[load() for _ in range(concurrency)])
+        elapsed = perf_counter() - begin
+
+    await server.close()
+    assert statuses == {200: count, 400: count * replay}, statuses
+
+    print('{:<20} {:<14} {:>8.0f} {:>9.1f} {:>9.1f}'.format(
+        grant_type,
+        scope,
+        len(latencies) / elapsed,
+        percentile(latencies, 0.5),
+        percentile(latencies, 0.99),
+    ))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-c', dest='concurrency', type=int, default=50)
+    parser.add_argument('-n', dest='count', type=int, default=20000)
+    parser.add_argument('-r', dest='replay', type=int, default=0)
+    parser.add_argument(
+        '-s', dest='scopes', nargs='+', default=['read', 'openid read'])
+    parser.add_argument(
+        '-g',
+        dest='grant_types',
+        nargs='+',
+        default=['authorization_code', 'refresh_token'])
+    args = parser.parse_args()
+
+    getLogger('bigur').setLevel(ERROR)
+
+    key = generate_private_key(
+        public_exponent=65537, key_size=2048, backend=default_backend())
+
+    print('{:<20} {:<14} {:>8} {:>9} {:>9}'.format('grant', 'scope', 'req/s',
+                                                   'p50, ms', 'p99, ms'))
+    for grant_type in args.grant_types:
+        for scope in args.scopes:
+            run(
+                measure(key, grant_type, scope, args.concurrency, args.count,
+                        args.replay))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+'''Token signing benchmark: legacy PEM round trip through PyJWT
+against precomputed :class:`~bigur.auth.signer.Signer`.
+
+Usage: python -m benchmarks.token_signing [-n 2000]'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from argparse import ArgumentParser
+from hashlib import sha1
+from time import perf_counter, time
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric.rsa import generate_private_key
+from cryptography.hazmat.primitives.serialization import (Encoding,
+                                                          PrivateFormat,
+                                                          NoEncryption)
+from jwt import encode as jwt_encode
+
+from bigur.auth.oidc.grant.implicit import IDToken
+from bigur.auth.signer import Signer
+
+
+def legacy_encode(token, private_key):
+    '''Token encoding as it was before signer introduced.'''
+    private_bytes = private_key.private_bytes(
+        encoding=Encoding.PEM,
+        format=PrivateFormat.TraditionalOpenSSL,
+        encryption_algorithm=NoEncryption())
+    public_key = private_key.public_key()
+    numbers = public_key.public_numbers()
+    n = numbers.n.to_bytes(int(public_key.key_size / 8),
+                           'big').lstrip(b'\x00')
+    kid = sha1(n).hexdigest()
+    return jwt_encode(
+        token.payload(), private_bytes, algorithm='RS256',
+        headers={'kid': kid})
+
+
+def measure(name, func, count):
+    start = perf_counter()
+    for _ in range(count):
+        func()
+    elapsed = perf_counter() - start
+    print('{:<10} {:>10.0f} tokens/sec'.format(name, count / elapsed))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', dest='count', type=int, default=2000)
+    args = parser.parse_args()
+
+    key = generate_private_key(
+        public_exponent=65537, key_size=2048, backend=default_backend())
+    signer = Signer(key)
+    token = IDToken(
+        iss='https://localhost',
+        sub='user',
+        aud='client',
+        nonce='nonce',
+        iat=int(time()),
+        exp=int(time()) + 600)
+
+    measure('legacy', lambda: legacy_encode(token, key), args.count)
+    measure('signer', lambda: token.encode(signer), args.count)
+
+
+if __name__ == '__main__':
+    main()
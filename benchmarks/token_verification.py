@@ -0,0 +1,79 @@
+'''Verifications per second of RS256 access tokens: PyJWT decoding with
+key serialized to PEM on every call (as bearer authentication did), and
+:class:`~bigur.auth.verifier.TokenVerifier` with cold cache (every token
+is new) and warm cache (working set of tokens fits the cache).
+
+Usage: python -m benchmarks.token_verification [-n 20000] [-t 1000]'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from argparse import ArgumentParser
+from itertools import cycle, islice
+from time import perf_counter, time
+from typing import Callable, List
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric.rsa import generate_private_key
+from cryptography.hazmat.primitives.serialization import (Encoding,
+                                                          PublicFormat)
+from jwt import decode as jwt_decode
+
+from bigur.auth.signer import Signer
+from bigur.auth.verifier import TokenVerifier
+
+
+def measure(title: str, func: Callable, tokens: List[bytes]) -> None:
+    begin = perf_counter()
+    for token in tokens:
+        func(token)
+    elapsed = perf_counter() - begin
+    print('{:<16} {:>10.0f} {:>8.2f}'.format(
+        title, len(tokens) / elapsed, elapsed / len(tokens) * 1e6))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-n', dest='count', type=int, default=20000)
+    parser.add_argument('-t', dest='tokens', type=int, default=1000)
+    args = parser.parse_args()
+
+    key = generate_private_key(
+        public_exponent=65537, key_size=2048, backend=default_backend())
+    signer = Signer(key)
+    exp = int(time()) + 3600
+
+    def sign(i):
+        return signer.sign({
+            'sub': str(i),
+            'scope': ['read'],
+            'iss': 'https://localhost',
+            'exp': exp,
+        })
+
+    unique = [sign(i) for i in range(args.count)]
+    working_set = [sign(i) for i in range(args.tokens)]
+    repeated = list(islice(cycle(working_set), args.count))
+
+    def pyjwt(token):
+        public_bytes = key.public_key().public_bytes(
+            encoding=Encoding.PEM, format=PublicFormat.SubjectPublicKeyInfo)
+        return jwt_decode(token, public_bytes, algorithms=['RS256'])
+
+    def verifier():
+        return TokenVerifier({signer.kid: key.public_key()},
+                             issuer='https://localhost',
+                             maxsize=args.tokens)
+
+    print('{:<16} {:>10} {:>8}'.format('verifier', 'tokens/s', 'us/token'))
+    measure('pyjwt + pem', pyjwt, unique)
+    measure('cold cache', verifier().verify, unique)
+    warm = verifier()
+    for token in working_set:
+        warm.verify(token)
+    measure('warm cache', warm.verify, repeated)
+
+
+if __name__ == '__main__':
+    main()
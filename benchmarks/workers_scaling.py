@@ -0,0 +1,290 @@
+'''Throughput of authorization and token endpoints served by 1..N worker
+processes sharing listening socket with `SO_REUSEPORT`. Workers share
+SQLite store, session store and revocation list, the setup server
+accepts for more than one worker. User, client, session and access
+codes are created in databases before workers are started. Load is
+generated by separate processes, each code is sent once.
+
+Usage: python -m benchmarks.workers_scaling [-w 1 2 4] [-l 4] [-c 20]
+    [-d 5] [-n 50000]'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from argparse import ArgumentParser
+from asyncio import gather, run, sleep as async_sleep
+from base64 import urlsafe_b64encode
+from functools import partial
+from logging import ERROR, getLogger
+from multiprocessing import get_context
+from os import cpu_count
+from os.path import dirname, join, normpath
+from socket import socket
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
+from typing import Dict, List, Tuple
+
+from aiohttp import ClientError, ClientSession, CookieJar, TCPConnector
+from aiohttp.web import Application, Response, run_app
+from aiohttp_jinja2 import setup as jinja_setup
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric.rsa import generate_private_key
+from jinja2 import FileSystemLoader
+from kaptan import Kaptan
+from yarl import URL
+
+from bigur.auth.authn.user import UserPass
+from bigur.auth.authn.user.base import crypt
+from bigur.auth.config import Settings, set_settings
+from bigur.auth.handler.oauth2 import AuthorizationHandler, TokenHandler
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.middlewares import session
+from bigur.auth.model import Client, Scope, User
+from bigur.auth.revocation import revoked_tokens
+from bigur.auth.session import Session, SQLiteSessionStore, sessions
+from bigur.auth.signer import create_backend
+from bigur.auth.store import SQLite, store
+from bigur.auth.workers import Supervisor, unshared_state
+
+from .authorize_latency import CONFIG
+
+COOKIE_KEY = bytes(32)
+
+
+async def ping(request):
+    return Response(text='pong')
+
+
+def load_config() -> Kaptan:
+    '''Load configuration and set settings used by handlers.'''
+    cfg = Kaptan()
+    cfg.import_config(CONFIG)
+    set_settings(Settings.from_config(cfg))
+    return cfg
+
+
+def set_stores(directory: str) -> None:
+    '''Set stores with databases in `directory`, checked as server
+    checks them before starting workers.'''
+    store_instance = SQLite(path=join(directory, 'store.sqlite'))
+    sessions_instance = SQLiteSessionStore(
+        path=join(directory, 'sessions.sqlite'))
+    revoked_tokens.configure(path=join(directory, 'revocations.sqlite'))
+    problems = unshared_state(store_instance, sessions_instance,
+                              revoked_tokens)
+    if problems:
+        raise RuntimeError('; '.join(problems))
+    store.set_store(store_instance)
+    sessions.set_store(sessions_instance)
+
+
+def create_app(key, directory: str) -> Application:
+    # Stores are opened by workers, after they are forked
+    set_stores(directory)
+
+    app = Application(middlewares=[session])
+    app['config'] = load_config()
+    app['cookie_key'] = COOKIE_KEY
+    jinja_setup(
+        app,
+        loader=FileSystemLoader(normpath(dirname(__file__) + '/../templates')))
+    app.router.add_route('*', '/auth/login', UserPass)
+    app.router.add_route('*', '/auth/authorize', AuthorizationHandler)
+    app.router.add_route('*', '/auth/token', TokenHandler)
+    app.router.add_route('GET', '/ping', ping)
+
+    key_jar = KeyJar(keys=[key])
+
+    async def start(app):
+        await key_jar.start(create_backend('inline'))
+        await revoked_tokens.start()
+        await sessions.start()
+        await store.start()
+
+    async def stop(app):
+        await store.stop()
+        await sessions.stop()
+        await revoked_tokens.stop()
+        await key_jar.stop()
+
+    app.on_startup.append(start)
+    app.on_cleanup.append(stop)
+    return app
+
+
+async def setup(
+        directory: str,
+        codes: int) -> Tuple[Dict[str, str], Dict[str, str], List[str]]:
+    '''Create objects shared by workers, returns cookies, parameters
+    of authorization request and access codes.'''
+    load_config()
+    set_stores(directory)
+    await sessions.start()
+    await store.start()
+    user = await store.users.put(User(username='admin', password='123'))
+    await store.scopes.put(Scope(code='read', title='Read', default=True))
+    redirect_uri = 'http://localhost/feedback'
+    client = await store.clients.put(
+        Client(
+            client_type='public',
+            user_id=user.id,
+            title='Benchmark',
+            redirect_uris=[redirect_uri]))
+    user_session = await sessions.put(Session(user_id=user.id))
+    cookies = {
+        'sid': user_session.sid,
+        'uid': urlsafe_b64encode(crypt(COOKIE_KEY, user.id)).decode('utf-8')
+    }
+    params = {
+        'response_type': 'token',
+        'client_id': client.id,
+        'redirect_uri': redirect_uri,
+    }
+    access_codes = [(await store.access_codes.create(
+        client_id=client.id, user_id=user.id,
+        redirect_uri=redirect_uri)).code for _ in range(codes)]
+    await store.stop()
+    await sessions.stop()
+    return cookies, params, access_codes
+
+
+async def load_async(url: str, cookies: Dict[str, str],
+                     params: Dict[str, str], codes: List[str],
+                     concurrency: int, duration: float) -> int:
+    stop = perf_counter() + duration
+    count = 0
+    codes_iter = iter(codes)
+
+    async with ClientSession(
+            cookie_jar=CookieJar(unsafe=True),
+            connector=TCPConnector(limit=concurrency)) as http:
+        http.cookie_jar.update_cookies(cookies, URL(url))
+        authorize = URL(url) / 'auth' / 'authorize'
+        token = URL(url) / 'auth' / 'token'
+
+        async def worker():
+            nonlocal count
+            while perf_counter() < stop:
+                if codes:
+                    code = next(codes_iter, None)
+                    if code is None:
+                        return
+                    request = http.post(
+                        token,
+                        data={
+                            'grant_type': 'authorization_code',
+                            'code': code,
+                            'client_id': params['client_id'],
+                            'redirect_uri': params['redirect_uri'],
+                        })
+                else:
+                    request = http.get(
+                        authorize, params=params, allow_redirects=False)
+                async with request as response:
+                    await response.read()
+                    assert response.status in (200, 303), response.status
+                count += 1
+
+        await gather(*[worker() for _ in range(concurrency)])
+    return count
+
+
+def load(args) -> int:
+    return run(load_async(*args))
+
+
+def free_port() -> int:
+    with socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url: str, timeout: float = 30) -> None:
+
+    async def probe():
+        deadline = perf_counter() + timeout
+        async with ClientSession() as http:
+            while perf_counter() < deadline:
+                try:
+                    async with http.get(url + '/ping') as response:
+                        if response.status == 200:
+                            return
+                except ClientError:
+                    pass
+                await async_sleep(0.05)
+        raise RuntimeError('Server is not started')
+
+    run(probe())
+
+
+def measure(key, workers: int, loaders: int, concurrency: int,
+            duration: float, codes: int) -> Tuple[float, float]:
+    with TemporaryDirectory() as directory:
+        return measure_in(directory, key, workers, loaders, concurrency,
+                          duration, codes)
+
+
+def measure_in(directory: str, key, workers: int, loaders: int,
+               concurrency: int, duration: float,
+               codes: int) -> Tuple[float, float]:
+    cookies, params, access_codes = run(setup(directory, codes))
+    port = free_port()
+    url = 'http://127.0.0.1:{}'.format(port)
+    serve = partial(run_app,
+                    create_app(key, directory),
+                    host='127.0.0.1',
+                    port=port,
+                    reuse_port=True,
+                    access_log=None,
+                    print=None)
+
+    context = get_context('fork')
+    server = context.Process(target=Supervisor(serve, workers).run)
+    server.start()
+    try:
+        wait_ready(url)
+        # Let all workers bind
+        sleep(0.5)
+        results = []
+        with context.Pool(loaders) as pool:
+            for endpoint_codes in ([], access_codes):
+                jobs = [(url, cookies, params, endpoint_codes[i::loaders],
+                         concurrency, duration) for i in range(loaders)]
+                begin = perf_counter()
+                count = sum(pool.map(load, jobs))
+                results.append(count / (perf_counter() - begin))
+    finally:
+        server.terminate()
+        server.join()
+    return results[0], results[1]
+
+
+def main():
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument('-w', dest='workers', type=int, nargs='+',
+                        default=[1, 2, 4])
+    parser.add_argument('-l', dest='loaders', type=int, default=4)
+    parser.add_argument('-c', dest='concurrency', type=int, default=20)
+    parser.add_argument('-d', dest='duration', type=float, default=5)
+    parser.add_argument('-n', dest='codes', type=int, default=50000)
+    args = parser.parse_args()
+
+    getLogger('bigur').setLevel(ERROR)
+    getLogger('aiohttp').setLevel(ERROR)
+
+    key = generate_private_key(
+        public_exponent=65537, key_size=2048, backend=default_backend())
+
+    print('CPUs: {}'.format(cpu_count()))
+    print('{:<8} {:>14} {:>10}'.format('workers', 'authorize, r/s',
+                                       'token, r/s'))
+    for workers in args.workers:
+        authorize, token = measure(key, workers, args.loaders,
+                                   args.concurrency, args.duration,
+                                   args.codes)
+        print('{:<8} {:>14.0f} {:>10.0f}'.format(workers, authorize, token))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,7 @@ from logging import getLogger
 from aiohttp.web import Request, HTTPUnauthorized, HTTPForbidden
 from multidict import MultiDict
 
+from bigur.auth.password import verify_password
 from bigur.auth.store import store
 
 from bigur.auth.oauth2.exceptions import InvalidClient
@@ -34,7 +35,8 @@ async def authenticate_client(request: Request, params: MultiDict) -> None:
         elif client.client_type == 'confidential':
             if 'client_secret' not in params:
                 raise InvalidClient('Client\'s credentials not specified.')
-        if not client.verify_password(params['client_secret']):
+        if not await verify_password(client, params['client_secret'],
+                                     store.clients):
             raise InvalidClient('Invalid client\'s password.')
     else:
         raise InvalidClient('Parameter `client_id\' is not set.')
@@ -2,13 +2,14 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
-from base64 import urlsafe_b64decode
 from logging import getLogger
 
 from aiohttp.web import Request
 from multidict import MultiDict
 
-from .base import decrypt
+from bigur.auth.config import get_settings
+
+from .base import cookie_cache
 from .oidc import OpenIDConnect
 from .registration import Registration  # noqa
 from .user_pass import UserPass
@@ -23,19 +24,23 @@ async def authenticate_end_user(request: Request, params: MultiDict) -> Request:
     logger.debug('Authenticating of end user')
 
     # First check existing cookie, if it valid - pass
-    cookie_name: str = request.app['config'].get('authn.cookie.id_name')
+    cookie_name: str = get_settings().cookie_id_name
     cookie_value = request.cookies.get(cookie_name)
 
     # Check cookie
     if cookie_value:
         logger.debug('Found cookie, decoding')
 
-        key = request.app['cookie_key']
-        user_id: str = decrypt(key, urlsafe_b64decode(cookie_value))
-
-        # XXX: Check user's session is active
-        # XXX: Remove cookie if expired
-        logger.warning('Check cookie expirity stub')
+        try:
+            user_id: str = cookie_cache.decrypt(request.app['cookie_key'],
+                                                cookie_value)
+        except ValueError:
+            logger.warning('Can\'t decrypt cookie %s', cookie_name)
+            cookie_value = None
+        else:
+            if request['session'].user_id != user_id:
+                logger.debug('Session of user %s is not active', user_id)
+                cookie_value = None
 
     # If no valid cookie, try to authenticate user
     if cookie_value is None:
@@ -2,53 +2,158 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Business group for development management'
 __licence__ = 'For license information see LICENSE'
 
-from base64 import urlsafe_b64encode
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import lru_cache
 from os import urandom
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 from logging import getLogger
 
 from aiohttp.web import Request, Response, View
 from aiohttp_cors import CorsViewMixin, ResourceOptions
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.ciphers.algorithms import AES
 from cryptography.hazmat.primitives.ciphers.modes import CBC
 from cryptography.hazmat.primitives.ciphers import Cipher
 from multidict import MultiDict
 
+from bigur.auth.config import get_settings
+from bigur.auth.session.abc import revoke_callbacks
+from bigur.auth.utils import LRUCache
+
 logger = getLogger(__name__)
 
 BLOCK_SIZE = 16
 
+#: First byte of AES-GCM encrypted value.
+VERSION_GCM = 1
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+
+class CookieCodec:
+    '''Encrypts and decrypts values of cookies and state parameters.
+
+    Values are encrypted with AES-GCM, so tampered value fails to decrypt.
+    Encrypted value is version byte, nonce, ciphertext and tag. Values
+    without version byte are AES-CBC encrypted by previous versions, they
+    are decrypted while `legacy` is true. CBC values are not
+    authenticated, so `legacy` should be turned off (see
+    `authn.cookie.legacy_cbc`) once old cookies have expired.
+
+    :param bytes key: 16, 24 or 32 bytes key
+    :param bool legacy: decrypt AES-CBC values'''
+
+    __slots__ = ('_aead', '_algorithm', 'legacy')
+
+    def __init__(self, key: bytes, legacy: bool = True):
+        self._aead = AESGCM(key)
+        self._algorithm = AES(key)
+        self.legacy = legacy
+
+    def encode(self, value: str) -> bytes:
+        nonce = urandom(NONCE_SIZE)
+        return (bytes((VERSION_GCM,)) + nonce +
+                self._aead.encrypt(nonce, value.encode('utf-8'), None))
+
+    def decode(self, value: bytes) -> str:
+        '''Returns decrypted value, raises :exc:`ValueError` if value
+        can\'t be decrypted.'''
+        if len(value) >= 1 + NONCE_SIZE + TAG_SIZE and value[0] == VERSION_GCM:
+            try:
+                return self._aead.decrypt(value[1:1 + NONCE_SIZE],
+                                          value[1 + NONCE_SIZE:],
+                                          None).decode('utf-8')
+            except InvalidTag:
+                # CBC has no MAC, so tampered value must not be retried
+                # as legacy one. Legacy value, which starts with the same
+                # byte by chance, is rejected too.
+                raise ValueError('Invalid value')
+        if self.legacy:
+            return self.decode_cbc(value)
+        raise ValueError('Unsupported value format')
+
+    def decode_cbc(self, value: bytes) -> str:
+        if len(value) < 2 * BLOCK_SIZE or len(value) % BLOCK_SIZE:
+            raise ValueError('Invalid value')
+
+        cipher = Cipher(self._algorithm,
+                        CBC(value[:BLOCK_SIZE]),
+                        backend=default_backend())
+        decryptor = cipher.decryptor()
+        padded = decryptor.update(value[BLOCK_SIZE:]) + decryptor.finalize()
+        unpadder = padding.PKCS7(BLOCK_SIZE * 8).unpadder()
+
+        return (unpadder.update(padded) + unpadder.finalize()).decode('utf-8')
+
+
+@lru_cache(maxsize=8)
+def get_codec(key: bytes, legacy: bool = True) -> CookieCodec:
+    '''Returns codec for `key`, created once.'''
+    return CookieCodec(key, legacy)
+
 
 def decrypt(key: bytes, value: bytes) -> str:
-    backend = default_backend()
+    return get_codec(key, get_settings().cookie_legacy_cbc).decode(value)
 
-    iv = value[:BLOCK_SIZE]
-    data = value[BLOCK_SIZE:]
 
-    cipher = Cipher(AES(key), CBC(iv), backend=backend)
-    decryptor = cipher.decryptor()
+def crypt(key: bytes, username: str) -> bytes:
+    return get_codec(key, get_settings().cookie_legacy_cbc).encode(username)
 
-    padded = decryptor.update(data) + decryptor.finalize()
-    unpadder = padding.PKCS7(BLOCK_SIZE * 8).unpadder()
 
-    return (unpadder.update(padded) + unpadder.finalize()).decode('utf-8')
+class CookieCache:
+    '''Decrypted values of authentication cookies. Browser sends the
+    same cookie with every request, so it is decrypted once and user id
+    is taken from cache until entry expires or is revoked.
 
+    :param int maxsize: maximum number of cached cookies
+    :param float ttl: seconds cookie is cached'''
 
-def crypt(key: bytes, username: str) -> bytes:
-    backend = default_backend()
+    def __init__(self, maxsize: int = 10000, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._cache: LRUCache[Tuple[bytes, str], str] = LRUCache(maxsize, ttl)
 
-    iv: bytes = urandom(BLOCK_SIZE)
+    def configure(self, maxsize: Optional[int] = None,
+                  ttl: Optional[float] = None) -> None:
+        '''Set parameters from `authn.cookie.cache` configuration
+        section, cache is cleared.'''
+        if maxsize is not None:
+            self.maxsize = maxsize
+        if ttl is not None:
+            self.ttl = ttl
+        self._cache = LRUCache(self.maxsize, self.ttl)
 
-    cipher = Cipher(AES(key), CBC(iv), backend=backend)
-    encryptor = cipher.encryptor()
+    def decrypt(self, key: bytes, cookie: str) -> str:
+        '''Returns user id from `cookie`, raises :exc:`ValueError` if
+        cookie can\'t be decrypted.'''
+        user_id = self._cache.get((key, cookie))
+        if user_id is None:
+            user_id = decrypt(key, urlsafe_b64decode(cookie))
+            self._cache.set((key, cookie), user_id)
+        return user_id
 
-    padder = padding.PKCS7(BLOCK_SIZE * 8).padder()
-    padded = (padder.update(username.encode('utf-8')) + padder.finalize())
+    def revoke(self, user_id: str) -> int:
+        '''Removes all cookies of user, called when user\'s sessions are
+        revoked. Returns number of removed cookies.'''
+        count = self._cache.pop_value(user_id)
+        logger.debug('Removed %d cached cookies of user %s, stats: %s',
+                     count, user_id, self.stats())
+        return count
 
-    return iv + encryptor.update(padded) + encryptor.finalize()
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, float]:
+        '''Returns cache size, hits, misses and hit ratio.'''
+        return self._cache.stats()
+
+
+cookie_cache = CookieCache()
+revoke_callbacks.append(cookie_cache.revoke)
 
 
 class AuthN(View, CorsViewMixin):
@@ -65,10 +170,14 @@ class AuthN(View, CorsViewMixin):
         key = request.app['cookie_key']
         value = urlsafe_b64encode(crypt(key, userid)).decode('utf-8')
 
-        config = request.app['config']
-        cookie_name: str = config.get('authn.cookie.id_name')
-        cookie_max_age: int = config.get('authn.cookie.max_age')
-        if config.get('authn.cookie.secure'):
+        session = request['session']
+        session.user_id = userid
+        session.modified = True
+
+        settings = get_settings()
+        cookie_name: str = settings.cookie_id_name
+        cookie_max_age: Optional[int] = settings.cookie_max_age
+        if settings.cookie_secure:
             cookie_secure: Optional[str] = 'yes'
         else:
             cookie_secure = None
@@ -3,15 +3,15 @@ __copyright__ = '(c) 2016-2019 Business group for development management'
 __licence__ = 'For license information see LICENSE'
 
 from base64 import urlsafe_b64encode, urlsafe_b64decode
-from dataclasses import asdict
+from dataclasses import asdict, fields
 from json import dumps, loads
 from hashlib import sha256
 from logging import getLogger
 from pprint import pformat
-from typing import List, Union
+from time import monotonic
+from typing import Any, Dict, List, Optional, Tuple, Union
 from urllib.parse import urlencode
 
-from aiohttp import ClientSession, ClientError
 from aiohttp.web import Response
 from aiohttp.web_exceptions import HTTPSeeOther, HTTPBadRequest
 from aiohttp_jinja2 import render_template
@@ -20,12 +20,21 @@ from jwt.algorithms import get_default_algorithms
 from jwt.exceptions import InvalidKeyError
 from multidict import MultiDict
 
+from bigur.auth.config import get_settings
+from bigur.auth.http_client import REQUEST_ERRORS, http_client
 from bigur.auth.model.abc import AbstractProvider
+from bigur.auth.store import store
+from bigur.auth.utils import SingleFlight, parse_cache_control
 
-from bigur.auth.authn.user.base import AuthN, crypt, decrypt
+from bigur.auth.authn.user.base import AuthN, cookie_cache, crypt, decrypt
 
 logger = getLogger(__name__)
 
+#: Algorithms of ID tokens of upstream providers.
+ASYMMETRIC_ALGORITHMS = frozenset(
+    ('RS256', 'RS384', 'RS512', 'ES256', 'ES384', 'ES512', 'PS256', 'PS384',
+     'PS512'))
+
 
 class ProviderError(Exception):
     pass
@@ -39,6 +48,76 @@ class RegistrationNeeded(ProviderError):
     pass
 
 
+class Discovery:
+    '''Cache of providers' configuration documents. Documents are
+    cached for time from `Cache-Control` header of response, concurrent
+    requests for the same document make only one HTTP request.'''
+
+    def __init__(self):
+        self._documents: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._flight: SingleFlight[Dict[str, Any]] = SingleFlight()
+
+    def clear(self) -> None:
+        self._documents.clear()
+
+    def is_fresh(self, url: str, now: Optional[float] = None) -> bool:
+        try:
+            _, expires = self._documents[url]
+        except KeyError:
+            return False
+        return expires > (monotonic() if now is None else now)
+
+    async def fetch(self, url: str, ttl: float,
+                    min_ttl: float) -> Dict[str, Any]:
+        '''Gets configuration document and caches it.
+
+        :param str url: document's url
+        :param float ttl: time to live if response has no
+            `Cache-Control` header
+        :param float min_ttl: minimal time to live'''
+        logger.debug('Getting configuration from %s', url)
+        try:
+            async with http_client.get(url) as resp:
+                if resp.status == 200:
+                    document = await resp.json()
+                else:
+                    raise ConfigurationError(
+                        'Can\'t get configuration from {}: '
+                        'response code is {}'.format(url, resp.status))
+                max_age = parse_cache_control(
+                    resp.headers.get('Cache-Control'))
+        except REQUEST_ERRORS as e:
+            raise ConfigurationError(
+                'Can\'t get configuration from {}: {}'.format(
+                    url,
+                    str(e) or type(e).__name__))
+
+        if not isinstance(document, dict):
+            raise ConfigurationError('Invalid response while geting '
+                                     'configuration from {}'.format(url))
+        logger.debug('Configuration for provider:\n%s', pformat(document))
+
+        if max_age is not None:
+            ttl = max(max_age, min_ttl)
+        self._documents[url] = (document, monotonic() + ttl)
+        return document
+
+    async def get(self, url: str, ttl: float, min_ttl: float = 0):
+        '''Returns cached document, fetches it if it is expired.'''
+        if self.is_fresh(url):
+            return self._documents[url][0]
+        return await self._flight.do(url,
+                                     lambda: self.fetch(url, ttl, min_ttl))
+
+
+discovery = Discovery()
+provider_flight: SingleFlight[AbstractProvider] = SingleFlight()
+
+# Provider's attributes, which are not from configuration document
+PROVIDER_OWN = frozenset(('id', 'domains', 'client_id', 'client_secret',
+                          'keys'))
+
+
 class OpenIDConnect(AuthN):
 
     def get_domain_from_acr(self, acr_values: Union[List[str], str]) -> str:
@@ -54,29 +133,19 @@ class OpenIDConnect(AuthN):
 
         raise ValueError('Domain is not set in acr parameter')
 
-    async def create_provider(self, domain: str) -> AbstractProvider:
-        protocol = self.request.app['config'].get(
-            'authn.oidc.provider_protocol', 'https')
-        url = '{}://{}/.well-known/openid-configuration'.format(
-            protocol, domain)
-        logger.debug('Getting configuration from %s', url)
-        async with ClientSession() as session:
-            try:
-                async with session.get(url) as resp:
-                    if resp.status == 200:
-                        endpoint_cnf = await resp.json()
-                    else:
-                        raise ConfigurationError(
-                            'Can\'t get configuration from {}: '
-                            'response code is {}'.format(url, resp.status))
-            except ClientError as e:
-                raise ConfigurationError(
-                    'Can\'t get configuration from {}: {}'.format(url, str(e)))
+    @property
+    def discovery_ttl(self) -> Tuple[float, float]:
+        '''Default and minimal time to live of cached configuration.'''
+        settings = get_settings()
+        return (settings.discovery_ttl, settings.discovery_min_ttl)
 
-        if not isinstance(endpoint_cnf, dict):
-            raise ConfigurationError('Invalid response while geting '
-                                     'configuration for {}'.format(domain))
-        logger.debug('Configuration for provider:\n%s', pformat(endpoint_cnf))
+    def get_configuration_url(self, domain: str) -> str:
+        return '{}://{}/.well-known/openid-configuration'.format(
+            get_settings().provider_protocol, domain)
+
+    async def create_provider(self, domain: str) -> AbstractProvider:
+        url = self.get_configuration_url(domain)
+        endpoint_cnf = dict(await discovery.get(url, *self.discovery_ttl))
 
         # Set domain for endpoint
         endpoint_cnf['domains'] = [domain]
@@ -98,12 +167,44 @@ class OpenIDConnect(AuthN):
 
         return await self.request.app['store'].providers.create(**endpoint_cnf)
 
+    async def refresh_provider(self, provider: AbstractProvider,
+                               domain: str) -> None:
+        '''Updates provider with fresh configuration document.'''
+        url = self.get_configuration_url(domain)
+        try:
+            endpoint_cnf = await discovery.get(url, *self.discovery_ttl)
+        except ConfigurationError as e:
+            logger.warning('Can\'t refresh provider %s: %s', provider, e)
+            return
+        for attr in fields(provider):
+            if attr.name in endpoint_cnf and attr.name not in PROVIDER_OWN:
+                setattr(provider, attr.name, endpoint_cnf[attr.name])
+        await store.providers.put(provider)
+
     async def get_provider(self, domain: str) -> AbstractProvider:
+        providers = store.providers
+
+        async def get_or_create():
+            # Provider could be created while we were waiting
+            try:
+                return await providers.get_by_domain(domain)
+            except KeyError:
+                return await self.create_provider(domain)
+
         try:
-            provider = await self.request.app['store'].providers.get_by_domain(
-                domain)
+            provider = await providers.get_by_domain(domain)
         except KeyError:
-            provider = await self.create_provider(domain)
+            # Concurrent requests for unknown domain wait for one
+            # discovery instead of creating duplicate providers
+            return await provider_flight.do(domain, get_or_create)
+
+        if not discovery.is_fresh(self.get_configuration_url(domain)):
+            logger.debug('Refreshing configuration of %s in background',
+                         domain)
+            provider_flight.start(
+                ('refresh', domain),
+                lambda: self.refresh_provider(provider, domain))
+
         return provider
 
     async def link_user_with_oidc(self, user_id, provider_id, subject):
@@ -118,7 +219,7 @@ class OpenIDConnect(AuthN):
     def endpoint_uri(self) -> str:
         return '{}://{}{}'.format(
             self.request.scheme, self.request.host,
-            self.request.app['config'].get('http_server.endpoints.oidc.path'))
+            get_settings().oidc_path)
 
     async def authenticate(self, params: MultiDict):
         request = self.request
@@ -158,7 +259,7 @@ class OpenIDConnect(AuthN):
             logger.warning('Error getting provider configuration: %s', e)
             reason = str(e)
             raise HTTPSeeOther('{}?{}'.format(
-                request.app['config'].get('http_server.endpoints.login.path'),
+                get_settings().login_path,
                 urlencode({
                     'error':
                         'bigur_oidc_provider_error',
@@ -196,7 +297,7 @@ class OpenIDConnect(AuthN):
 
     async def get(self) -> Response:
         request = self.request
-        config = self.request.app['config']
+        settings = get_settings()
 
         # Decode state parameter
         if 'state' not in request.query:
@@ -225,11 +326,14 @@ class OpenIDConnect(AuthN):
             logger.debug('Id token provided in state, checking authn')
 
             # Check cookie
-            cookie = request.cookies.get(config.get('authn.cookie.id_name'))
+            cookie = request.cookies.get(settings.cookie_id_name)
             if cookie:
                 logger.debug('Found authn cookie %s', cookie)
-                key = request.app['cookie_key']
-                userid: str = decrypt(key, urlsafe_b64decode(cookie))
+                try:
+                    userid: str = cookie_cache.decrypt(
+                        request.app['cookie_key'], cookie)
+                except ValueError:
+                    raise HTTPBadRequest(reason='Can\'t decode cookie')
                 await self.link_user_with_oidc(userid, provider.id,
                                                state['t']['sub'])
                 return Response(
@@ -245,7 +349,7 @@ class OpenIDConnect(AuthN):
         def error_redirect(reason, source: Exception = None):
             logger.warning('Redirecting with error: %s', reason)
             exc = HTTPSeeOther('{}?{}'.format(
-                request.app['config'].get('http_server.endpoints.login.path'),
+                get_settings().login_path,
                 urlencode({
                     'error':
                         'bigur_oidc_provider_error',
@@ -282,24 +386,23 @@ class OpenIDConnect(AuthN):
             error_redirect('Invalid client credentials', e)
 
         logger.debug('Getting id_token from %s', token_endpoint)
-        async with ClientSession() as session:
-            try:
-                data = {
-                    'redirect_uri': self.endpoint_uri,
-                    'code': code,
-                    'client_id': client_id,
-                    'client_secret': client_secret,
-                    'grant_type': 'authorization_code'
-                }
-                async with session.post(token_endpoint, data=data) as resp:
-                    if resp.status != 200:
-                        body = await resp.text()
-                        logger.error('Invalid response from provider: %s', body)
-                        error_redirect('Can\'t obtain token from provider')
-                    token_obj = await resp.json()
-
-            except ClientError as e:
-                error_redirect('Can\'t obtain token', e)
+        try:
+            data = {
+                'redirect_uri': self.endpoint_uri,
+                'code': code,
+                'client_id': client_id,
+                'client_secret': client_secret,
+                'grant_type': 'authorization_code'
+            }
+            async with http_client.post(token_endpoint, data=data) as resp:
+                if resp.status != 200:
+                    body = await resp.text()
+                    logger.error('Invalid response from provider: %s', body)
+                    error_redirect('Can\'t obtain token from provider')
+                token_obj = await resp.json()
+
+        except REQUEST_ERRORS as e:
+            error_redirect('Can\'t obtain token', e)
 
         if not isinstance(token_obj, dict):
             error_redirect('Invalid response from provider')
@@ -316,37 +419,41 @@ class OpenIDConnect(AuthN):
         except DecodeError as e:
             error_redirect('Can\'t decode token', e)
 
-        try:
-            alg = get_default_algorithms()[header['alg']]
-        except KeyError as e:
-            logger.error('Algorythm %s is not supported', header['alg'])
-            error_redirect('Key algorytm not supported', e)
+        if header.get('alg') not in get_default_algorithms():
+            logger.error('Algorythm %s is not supported', header.get('alg'))
+            error_redirect('Key algorytm not supported')
 
+        kid = header.get('kid')
         try:
-            key = provider.get_key(header['kid'])
+            key = provider.get_verification_key(kid)
         except KeyError:
             # Key not found, update provider's keys
             try:
                 await provider.update_keys()
-                key = provider.get_key(header['kid'])
-            except (ClientError, KeyError, TypeError) as e:
+                key = provider.get_verification_key(kid)
+            except REQUEST_ERRORS + (KeyError, TypeError) as e:
                 logger.warning(str(e))
-                error_redirect(
-                    'Can\'t get key with kid'
-                    ' {}'.format(header['kid']), e)
-
-        try:
-            key = alg.from_jwk(dumps(key))
+                error_redirect('Can\'t get key with kid {}'.format(kid), e)
+            except InvalidKeyError as e:
+                error_redirect('Can\'t decode key', e)
         except InvalidKeyError as e:
             error_redirect('Can\'t decode key', e)
+        else:
+            if provider.keys_expired():
+                provider.refresh_keys()
 
         try:
-            # XXX: hardcoded token encryption algorithm
+            # Algorithm must be announced by provider and be asymmetric,
+            # so public key can't be used as HMAC secret
             payload = decode(
                 token_obj['id_token'],
                 key,
                 audience=client_id,
-                algorithms=['RS256'])
+                algorithms=[
+                    x for x in
+                    provider.get_id_token_signing_alg_values_supported()
+                    if x in ASYMMETRIC_ALGORITHMS
+                ])
         except DecodeError as e:
             error_redirect('Can\'t decode token', e)
 
@@ -369,11 +476,11 @@ class OpenIDConnect(AuthN):
             template = 'oidc_user_not_exists.j2'
             context = {
                 'login_endpoint':
-                    config.get('http_server.endpoints.login.path'),
+                    settings.login_path,
                 'registration_endpoint':
-                    config.get('http_server.endpoints.registration.path'),
+                    settings.registration_path,
                 'next':
-                    config.get('http_server.endpoints.oidc.path'),
+                    settings.oidc_path,
                 'state':
                     urlsafe_b64encode(
                         crypt(request.app['cookie_key'],
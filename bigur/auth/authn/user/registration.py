@@ -13,6 +13,8 @@ from aiohttp.web_exceptions import HTTPBadRequest
 from aiohttp_jinja2 import render_template
 from multidict import MultiDict, MultiDictProxy
 
+from bigur.auth.config import get_settings
+from bigur.auth.password import set_password
 from bigur.auth.utils import asdict, parse_accept, choice_content_type
 
 from bigur.auth.authn.user.base import AuthN
@@ -27,14 +29,14 @@ class Registration(AuthN):
 
     async def get(self) -> Response:
         request = self.request
+        settings = get_settings()
         context = {
             'endpoint':
-                request.app['config'].get(
-                    'http_server.endpoints.registration.path'),
+                settings.registration_path,
             'query':
                 request.query,
             'prefix':
-                request.app['config'].get('http_server.static.prefix', '/')
+                settings.static_prefix
         }
         logger.debug('Context: %s', context)
         return render_template('registration_form.j2', request, context)
@@ -69,11 +71,11 @@ class Registration(AuthN):
         user = await self.request.app['store'].users.create(
             **{
                 'username': form.get('username'),
-                'password': form.get('password'),
                 'given_name': form.get('given_name'),
                 'patronymic': form.get('patronymic'),
                 'family_name': form.get('family_name')
             })
+        await set_password(user, form.get('password'))
         await self.request.app['store'].users.put(user)
 
         if 'next' in form:
@@ -1,3 +1,11 @@
+'''Authentication of end user by bearer access token (RFC 6750) in
+`Authorization` header. Token is verified by
+:attr:`~bigur.auth.key_jar.KeyJar.verifier`, which picks public key by
+token's `kid`, accepts only access tokens of this issuer (not ID tokens,
+signed by the same keys) and remembers verified tokens until they
+expire, so repeated requests with the same token don't verify its
+signature.'''
+
 __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
@@ -8,26 +16,45 @@ from urllib.parse import urlencode
 from aiohttp.web import HTTPSeeOther
 from multidict import MultiDict
 
-from bigur.auth.oauth2.token import RSAJWT
+from bigur.auth.config import get_settings
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.oauth2.exceptions import InvalidToken
 
 from bigur.auth.authn.user.base import AuthN
 
 logger = getLogger(__name__)
 
 
+def parse_authorization(header: str) -> str:
+    '''Returns token from value of `Authorization` header, raises
+    :exc:`~bigur.auth.oauth2.exceptions.InvalidToken` if it is not
+    bearer token.'''
+    scheme, _, credentials = header.strip().partition(' ')
+    credentials = credentials.strip()
+    if scheme.lower() != 'bearer' or not credentials:
+        raise InvalidToken('Bearer token required.')
+    return credentials
+
+
 class Token(AuthN):
+    '''End-user bearer token authentication'''
 
     async def authenticate(self, params: MultiDict):
         request = self.request
 
-        token_bytes = request.headers.get('Authorization', '')
-        token_bytes = token_bytes.lstrip('Bearer').strip()
-        user_id = RSAJWT.decode(request.app['jwt_keys'][0], token_bytes)
+        try:
+            token = parse_authorization(
+                request.headers.get('Authorization', ''))
+            claims = KeyJar.instance().verifier.verify(token)
+            user_id = claims.get('sub')
+            if not isinstance(user_id, str):
+                raise InvalidToken('Token has no subject.')
 
-        if user_id is None:
-            reason = 'Invalid token'
+        except InvalidToken as exc:
+            reason = exc.description
+            logger.debug('Bearer token rejected: %s', reason)
             raise HTTPSeeOther('{}?{}'.format(
-                request.app['config'].get('http_server.endpoints.login.path'),
+                get_settings().login_path,
                 urlencode({
                     'error':
                         'bigur_token_error',
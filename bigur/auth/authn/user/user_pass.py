@@ -11,6 +11,8 @@ from aiohttp.web_exceptions import (HTTPBadRequest, HTTPSeeOther)
 from aiohttp_jinja2 import render_template
 from multidict import MultiDict
 
+from bigur.auth.config import get_settings
+from bigur.auth.password import verify_password
 from bigur.auth.store import store
 from bigur.auth.utils import choice_content_type, parse_accept
 
@@ -28,20 +30,20 @@ class UserPass(AuthN):
         request = self.request
         logger.debug('Redirecting to login form')
         raise HTTPSeeOther(location='{}?{}'.format(
-            request.app['config'].get('http_server.endpoints.login.path'),
+            get_settings().login_path,
             urlencode({
                 'next': '{}?{}'.format(request.path, urlencode(params))
             })))
 
     async def get(self) -> Response:
-        config = self.request.app['config']
+        settings = get_settings()
         query = self.request.query
         context = {
-            'endpoint': config.get('http_server.endpoints.login.path'),
+            'endpoint': settings.login_path,
             'query': query,
             'error': query.get('error'),
             'error_description': query.get('error_description'),
-            'prefix': config.get('http_server.static.prefix', '/')
+            'prefix': settings.static_prefix
         }
         logger.debug('Returning login form')
         return render_template('login_form.j2', self.request, context)
@@ -104,13 +106,13 @@ class UserPass(AuthN):
             logger.debug('Try to find user %s in store', username)
 
             try:
-                user = store.users.get_by_username(username)
+                user = await store.users.get_by_username(username)
             except KeyError:
                 logger.warning('User %s not found', username)
                 error = 'bigur_invalid_login'
                 error_description = 'Invalid login or password'
             else:
-                if user.verify_password(password):
+                if await verify_password(user, password, store.users):
                     # Login successful
                     logger.debug('Login for user %s successful', username)
 
@@ -150,8 +152,7 @@ class UserPass(AuthN):
             # Show form
             context = {
                 'endpoint':
-                    self.request.app['config'].get(
-                        'http_server.endpoints.login.path'),
+                    get_settings().login_path,
                 'query':
                     form,
                 'error':
@@ -159,6 +160,6 @@ class UserPass(AuthN):
                 'error_description':
                     error_description,
                 'prefix':
-                    request.app['config'].get('http_server.static.prefix', '/')
+                    get_settings().static_prefix
             }
             return render_template('login_form.j2', self.request, context)
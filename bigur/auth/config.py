@@ -2,6 +2,118 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+
 from kaptan import Kaptan
 
 config = Kaptan(handler='yaml')
+
+#: Functions called after configuration is reloaded, e.g. to drop
+#: caches of values computed from configuration.
+reload_callbacks: List[Callable[[], None]] = []
+
+_MISSING = object()
+
+
+class Settings(NamedTuple):
+    '''Configuration values, used while processing requests. It is
+    built and validated once (see :meth:`from_config`), so request
+    handlers read attributes instead of looking up dotted keys in
+    configuration.'''
+
+    cookie_secure: bool
+    cookie_session_name: str
+    cookie_id_name: str
+    cookie_max_age: Optional[int]
+    cookie_legacy_cbc: bool
+    login_path: str
+    registration_path: Optional[str]
+    oidc_path: Optional[str]
+    authorize_path: Optional[str]
+    token_path: Optional[str]
+    introspection_path: Optional[str]
+    revocation_path: Optional[str]
+    userinfo_path: Optional[str]
+    jwks_path: Optional[str]
+    static_prefix: str
+    issuer: Optional[str]
+    provider_protocol: str
+    discovery_ttl: float
+    discovery_min_ttl: float
+    jwks_max_age: int
+    well_known_max_age: int
+
+    @classmethod
+    def from_config(cls, cfg: Kaptan) -> 'Settings':
+        '''Returns settings from configuration `cfg`, raises
+        :exc:`ValueError` if value has invalid type.'''
+        values = []
+        for name, key, types, default in SETTINGS:
+            value = cfg.get(key, default)
+            if value is _MISSING:
+                raise ValueError(
+                    'Configuration parameter {} is required'.format(key))
+            if value is not None and not isinstance(value, types):
+                raise ValueError(
+                    'Configuration parameter {} has invalid type {}'.format(
+                        key,
+                        type(value).__name__))
+            values.append(value)
+        return cls(*values)
+
+
+# Settings' attributes: name, key in configuration, types, default value
+SETTINGS: Tuple[Tuple[str, str, Any, Any], ...] = (
+    ('cookie_secure', 'authn.cookie.secure', bool, False),
+    ('cookie_session_name', 'authn.cookie.session_name', str, 'sid'),
+    ('cookie_id_name', 'authn.cookie.id_name', str, 'uid'),
+    ('cookie_max_age', 'authn.cookie.max_age', int, None),
+    ('cookie_legacy_cbc', 'authn.cookie.legacy_cbc', bool, True),
+    ('login_path', 'http_server.endpoints.login.path', str, _MISSING),
+    ('registration_path', 'http_server.endpoints.registration.path', str,
+     None),
+    ('oidc_path', 'http_server.endpoints.oidc.path', str, None),
+    ('authorize_path', 'http_server.endpoints.authorize.path', str, None),
+    ('token_path', 'http_server.endpoints.token.path', str, None),
+    ('introspection_path', 'http_server.endpoints.introspection.path', str,
+     None),
+    ('revocation_path', 'http_server.endpoints.revocation.path', str, None),
+    ('userinfo_path', 'http_server.endpoints.userinfo.path', str, None),
+    ('jwks_path', 'http_server.endpoints.jwks.path', str, None),
+    ('static_prefix', 'http_server.static.prefix', str, '/'),
+    ('issuer', 'oidc.iss', str, None),
+    ('provider_protocol', 'authn.oidc.provider_protocol', str, 'https'),
+    ('discovery_ttl', 'authn.oidc.discovery_ttl', (int, float), 3600),
+    ('discovery_min_ttl', 'authn.oidc.discovery_min_ttl', (int, float), 60),
+    ('jwks_max_age', 'http_server.endpoints.jwks.max_age', int, 3600),
+    ('well_known_max_age', 'http_server.endpoints.well-known.max_age', int,
+     3600),
+)
+
+assert tuple(x[0] for x in SETTINGS) == Settings._fields
+
+_settings: Optional[Settings] = None
+
+
+def get_settings() -> Settings:
+    '''Returns current settings.'''
+    if _settings is None:
+        raise ValueError('Settings not initialized')
+    return _settings
+
+
+def set_settings(settings: Settings) -> None:
+    '''Replaces current settings.'''
+    global _settings  # pylint: disable=global-statement
+    _settings = settings
+
+
+def reload(filename: str) -> None:
+    '''Reload configuration from file. New configuration is validated
+    before it is applied, settings are replaced at once.'''
+    new_config = Kaptan(handler='yaml').import_config(filename)
+    settings = Settings.from_config(new_config)
+    config.configuration_data = new_config.configuration_data
+    set_settings(settings)
+    for callback in reload_callbacks:
+        callback()
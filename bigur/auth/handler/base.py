@@ -2,18 +2,15 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
-from dataclasses import fields
 from collections import defaultdict
 from logging import getLogger
-from re import sub as re_sub
-from typing import Any, Dict, List, Type, Union
+from typing import Any, Awaitable, Dict, List, Type, Union
 from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
 
 from aiohttp.web import Response as HTTPResponse, View, json_response
 from aiohttp.web_exceptions import (HTTPException, HTTPBadRequest,
                                     HTTPInternalServerError, HTTPUnauthorized)
 from multidict import MultiDict
-from rx import Observable
 
 from bigur.auth.authn import authenticate_client, authenticate_end_user
 from bigur.auth.oauth2.exceptions import (
@@ -23,6 +20,7 @@ from bigur.auth.oauth2.exceptions import (
     ServerError,
 )
 from bigur.auth.oauth2.context import Context
+from bigur.auth.oauth2.request import get_binder
 from bigur.auth.oauth2.response import OAuth2Response
 from bigur.auth.utils import asdict
 
@@ -31,10 +29,14 @@ logger = getLogger(__name__)
 
 class OAuth2Handler(View):
 
+    #: Authenticate end user before processing request. Token endpoint
+    #: is called by client, which is authenticated by its credentials.
+    end_user_authn: bool = True
+
     def get_request_class(self, params: MultiDict) -> Type:
         raise NotImplementedError('Method must be implemented in child class')
 
-    def create_stream(self, context: Context) -> Observable:
+    def create_stream(self, context: Context) -> Awaitable[OAuth2Response]:
         raise NotImplementedError('Method must be implemented in child class')
 
     def get_response_mode(self, context: Context) -> str:
@@ -55,37 +57,25 @@ class OAuth2Handler(View):
             logger.error('OAuth2 response is not set')
             oauth2_response = ServerError('Internal server error.')
 
-        # Initialize respones parameters.
-        response_params: Dict[str, Any] = {}
-
-        if isinstance(oauth2_response, OAuth2Response):
-            response_params = asdict(oauth2_response)
-        elif isinstance(oauth2_response, OAuth2Error):
-            class_name = type(oauth2_response).__name__
-            error_code = re_sub(
-                '([a-z0-9])([A-Z])',
-                r'\1_\2',
-                re_sub(
-                    '(.)([A-Z][a-z]+)',
-                    r'\1_\2',
-                    class_name,
-                ),
-            ).lower()
-            response_params['error'] = error_code.lower()
-            response_params['error_description'] = str(oauth2_response.args[0])
-
         # Detect response mode
         response_mode = self.get_response_mode(context)
 
         # Process json response
         if response_mode == 'json':
-            if isinstance(oauth2_response, InvalidClient):
-                response_status = 401
-            elif isinstance(oauth2_response, OAuth2Error):
-                response_status = 400
-            else:
-                response_status = 200
-            return json_response(response_params, status=response_status)
+            if isinstance(oauth2_response, OAuth2Error):
+                return HTTPResponse(
+                    body=oauth2_response.to_json(),
+                    status=oauth2_response.status,
+                    content_type='application/json',
+                    charset='utf-8')
+            return json_response(asdict(oauth2_response))
+
+        # Initialize respones parameters.
+        response_params: Dict[str, Any]
+        if isinstance(oauth2_response, OAuth2Error):
+            response_params = oauth2_response.to_dict()
+        else:
+            response_params = asdict(oauth2_response)
 
         # Process 401 exceptions
         if isinstance(oauth2_response, InvalidClient):
@@ -150,11 +140,8 @@ class OAuth2Handler(View):
         http_request = self.request
 
         # Rebuild parameters without value, as in RFC 6794 sec. 3.1
-        new_params = MultiDict()
-        for k, v in params.items():
-            if v:
-                new_params.add(k, v)
-        params = new_params
+        if not all(params.values()):
+            params = MultiDict((k, v) for k, v in params.items() if v)
 
         logger.debug('Request params: %s', params)
 
@@ -163,7 +150,9 @@ class OAuth2Handler(View):
 
         try:
             # Authenticate end user
-            context.owner = await authenticate_end_user(http_request, params)
+            if self.end_user_authn:
+                await authenticate_end_user(http_request, params)
+                context.owner = http_request['user']
 
             # Authenticate client
             context.client = await authenticate_client(http_request, params)
@@ -172,12 +161,7 @@ class OAuth2Handler(View):
             request_class = self.get_request_class(params)
 
             # Create OAuth2 request
-            kwargs = {}
-            request_fields = {f.name for f in fields(request_class)}
-            for k, v in params.items():
-                if k in request_fields:
-                    kwargs[k] = v
-            context.oauth2_request = request_class(**kwargs)
+            context.oauth2_request = get_binder(request_class).bind(params)
 
             # Prepare response
             oauth2_response = await self.create_stream(context)
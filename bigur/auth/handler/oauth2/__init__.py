@@ -5,4 +5,6 @@ __licence__ = 'For license information see LICENSE'
 # flake8: noqa
 
 from .authorize import AuthorizationHandler
+from .introspect import IntrospectionHandler
+from .revoke import RevocationHandler
 from .token import TokenHandler
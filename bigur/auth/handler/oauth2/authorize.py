@@ -2,15 +2,15 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
-from typing import Type
+from typing import Awaitable, Type
 
 from aiohttp.web import Response as HTTPResponse
 from multidict import MultiDict
-from rx import Observable
 
 from bigur.auth.handler.base import OAuth2Handler
 from bigur.auth.oauth2.context import Context
 from bigur.auth.oauth2.endpoint import get_authorization_stream
+from bigur.auth.oauth2.response import OAuth2Response
 from bigur.auth.oauth2.grant.authorization_code import (
     AuthorizationRequest,
     InvalidAuthorizationRequest,
@@ -28,7 +28,7 @@ class AuthorizationHandler(OAuth2Handler):
                 return TokenRequest
         return InvalidAuthorizationRequest
 
-    def create_stream(self, context: Context) -> Observable:
+    def create_stream(self, context: Context) -> Awaitable[OAuth2Response]:
         return get_authorization_stream(context)
 
     def get_response_mode(self, context: Context) -> str:
@@ -0,0 +1,36 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from typing import Awaitable, Type
+
+from aiohttp.web import Response
+from multidict import MultiDict
+
+from bigur.auth.handler.base import OAuth2Handler
+from bigur.auth.oauth2.context import Context
+from bigur.auth.oauth2.endpoint.revocation import (
+    RevocationRequest,
+    RevocationResponse,
+    get_revocation_stream,
+)
+
+
+class RevocationHandler(OAuth2Handler):
+    '''Token revocation endpoint (RFC 7009). Caller is authenticated
+    as client.'''
+
+    end_user_authn = False
+
+    def get_request_class(self, params: MultiDict) -> Type:
+        return RevocationRequest
+
+    def create_stream(self,
+                      context: Context) -> Awaitable[RevocationResponse]:
+        return get_revocation_stream(context)
+
+    def get_response_mode(self, context: Context) -> str:
+        return 'json'
+
+    async def post(self) -> Response:
+        return await self.handle(await self.request.post())
@@ -2,30 +2,36 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
-from typing import Type
+from typing import Awaitable, Type
 
 from aiohttp.web import Response
 from multidict import MultiDict
-from rx import Observable
 
 from bigur.auth.handler.base import OAuth2Handler
 from bigur.auth.oauth2.context import Context
 from bigur.auth.oauth2.grant.authorization_code import (
     AccessTokenRequest,
+    AccessTokenResponse,
     InvalidAccessTokenRequest,
 )
+from bigur.auth.oauth2.grant.refresh_token import RefreshTokenRequest
 from bigur.auth.oauth2.endpoint.token import get_token_stream
 
 
 class TokenHandler(OAuth2Handler):
 
+    end_user_authn = False
+
     def get_request_class(self, params: MultiDict) -> Type:
         if 'grant_type' in params:
             if params['grant_type'] == 'authorization_code':
                 return AccessTokenRequest
+            if params['grant_type'] == 'refresh_token':
+                return RefreshTokenRequest
         return InvalidAccessTokenRequest
 
-    def create_stream(self, context: Context) -> Observable:
+    def create_stream(self,
+                      context: Context) -> Awaitable[AccessTokenResponse]:
         return get_token_stream(context)
 
     def get_response_mode(self, context: Context) -> str:
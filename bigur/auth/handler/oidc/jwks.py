@@ -2,33 +2,35 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
-from base64 import urlsafe_b64encode
-from hashlib import sha1
 from logging import getLogger
 
-from aiohttp.web import View, json_response
+from aiohttp.web import Response, View
 from aiohttp_cors import CorsViewMixin, ResourceOptions, custom_cors
 
+from bigur.auth.config import get_settings
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.utils import etag_matches
+
 logger = getLogger(__name__)
 
 
 class JWKSHandler(View, CorsViewMixin):
-    '''Handler returns public JWKs.'''
+    '''Handler returns public JWKs. Key set is serialized by
+    :class:`~bigur.auth.key_jar.KeyJar` when keys are loaded.'''
 
     @custom_cors({'*': ResourceOptions()})
     async def get(self):
-        result = []
-        for private_key in self.request.app['jwt_keys']:
-            key = private_key.public_key()
-            numbers = key.public_numbers()
-            e = numbers.e.to_bytes(4, 'big').lstrip(b'\x00')
-            n = numbers.n.to_bytes(int(key.key_size / 8), 'big').lstrip(b'\x00')
-            result.append({
-                'e': urlsafe_b64encode(e).decode('utf-8'),
-                'kty': 'RSA',
-                'alg': 'RSA256',
-                'n': urlsafe_b64encode(n).decode('utf-8'),
-                'use': 'sig',
-                'kid': sha1(n).hexdigest()
-            })
-        return json_response({'keys': result})
+        key_jar = KeyJar.instance()
+        etag = key_jar.jwks_etag
+        headers = {
+            'ETag': etag,
+            'Cache-Control': 'public, max-age={}'.format(
+                get_settings().jwks_max_age),
+        }
+        if etag_matches(etag, self.request.headers.get('If-None-Match')):
+            return Response(status=304, headers=headers)
+        return Response(
+            body=key_jar.jwks,
+            content_type='application/json',
+            charset='utf-8',
+            headers=headers)
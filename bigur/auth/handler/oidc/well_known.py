@@ -2,34 +2,48 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
-from aiohttp.web import View, json_response
+from json import dumps
+from typing import Any, Dict, Sequence, Tuple
+
+from aiohttp.web import Response, View
 from aiohttp_cors import CorsViewMixin, ResourceOptions, custom_cors
 
+from bigur.auth.config import Settings, get_settings, reload_callbacks
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.utils import LRUCache, etag_matches, make_etag
 
-class WellKnownHandler(View, CorsViewMixin):
 
-    @custom_cors({'*': ResourceOptions(allow_headers='*')})
-    async def get(self):
-        req = self.request
-        config = req.app['config']
+class WellKnownHandler(View, CorsViewMixin):
+    '''OpenID provider configuration document. Document depends only on
+    settings, algorithms of signing keys, scheme and host, so it is
+    serialized once for each of them.'''
 
-        root = req.scheme + '://' + req.host
+    #: Serialized documents and their tags by (settings, algorithms,
+    #: scheme, host).
+    documents: LRUCache[Tuple[Any, Tuple[str, ...], str, str],
+                        Tuple[bytes, str]] = LRUCache(maxsize=64)
 
+    @staticmethod
+    def create_document(settings: Settings, root: str,
+                        algorithms: Sequence[str] = ('RS256',)
+                        ) -> Dict[str, Any]:
         result = {}
-        result['issuer'] = config.get('oidc.iss')
+        result['issuer'] = settings.issuer
+
+        result['authorization_endpoint'] = root + settings.authorize_path
+        result['token_endpoint'] = root + settings.token_path
 
-        result['authorization_endpoint'] = root + config.get(
-            'http_server.endpoints.authorize.path')
-        result['token_endpoint'] = root + config.get(
-            'http_server.endpoints.token.path')
+        if settings.introspection_path:
+            result['introspection_endpoint'] = (root +
+                                                settings.introspection_path)
 
-        userinfo_endpoint = config.get('http_server.endpoints.'
-                                       'userinfo.path', None)
-        if userinfo_endpoint:
-            result['userinfo_endpoint'] = root + userinfo_endpoint
+        if settings.revocation_path:
+            result['revocation_endpoint'] = root + settings.revocation_path
 
-        result['jwks_uri'] = root + config.get(
-            'http_server.endpoints.jwks.path')
+        if settings.userinfo_path:
+            result['userinfo_endpoint'] = root + settings.userinfo_path
+
+        result['jwks_uri'] = root + settings.jwks_path
 
         result['response_types_supported'] = [
             'code',
@@ -40,6 +54,39 @@ class WellKnownHandler(View, CorsViewMixin):
 
         result['response_modes_supported'] = ['query', 'fragment']
         result['subject_types_supported'] = ['public']
-        result['id_token_signing_alg_values_supported'] = ['RS256']
+        result['id_token_signing_alg_values_supported'] = list(algorithms)
+
+        return result
+
+    @custom_cors({'*': ResourceOptions(allow_headers='*')})
+    async def get(self):
+        req = self.request
+        settings = get_settings()
+
+        algorithms = KeyJar.instance().algorithms
+
+        key = (settings, algorithms, req.scheme, req.host)
+        cached = self.documents.get(key)
+        if cached is None:
+            body = dumps(self.create_document(
+                settings, req.scheme + '://' + req.host,
+                algorithms)).encode('utf-8')
+            cached = (body, make_etag(body))
+            self.documents.set(key, cached)
+        body, etag = cached
+
+        headers = {
+            'ETag': etag,
+            'Cache-Control': 'public, max-age={}'.format(
+                settings.well_known_max_age),
+        }
+        if etag_matches(etag, req.headers.get('If-None-Match')):
+            return Response(status=304, headers=headers)
+        return Response(
+            body=body,
+            content_type='application/json',
+            charset='utf-8',
+            headers=headers)
+
 
-        return json_response(result)
+reload_callbacks.append(WellKnownHandler.documents.clear)
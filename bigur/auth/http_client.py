@@ -0,0 +1,95 @@
+'''Application-wide HTTP client for requests to upstream OpenID
+providers. All requests share one :class:`aiohttp.ClientSession`, so
+connections are kept alive and reused, DNS lookups are cached.'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Business group for development management'
+__licence__ = 'For license information see LICENSE'
+
+import asyncio
+from logging import getLogger
+from typing import Optional
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+
+logger = getLogger(__name__)
+
+#: Exceptions of failed request: connection and protocol errors and
+#: exceeded timeouts, which are not :exc:`aiohttp.ClientError`.
+REQUEST_ERRORS = (ClientError, asyncio.TimeoutError)
+
+
+class HTTPClient:
+    '''Pooled HTTP client. Session is created on :meth:`start` (or
+    on first use) and must be closed with :meth:`stop`.
+
+    :param int limit: total number of simultaneous connections
+    :param int limit_per_host: number of simultaneous connections to
+        one host
+    :param float keepalive_timeout: seconds to keep idle connection
+    :param int ttl_dns_cache: seconds to cache resolved addresses
+    :param float connect_timeout: connection timeout in seconds
+    :param float timeout: total timeout of request in seconds'''
+
+    def __init__(self,
+                 limit: int = 100,
+                 limit_per_host: int = 10,
+                 keepalive_timeout: float = 30,
+                 ttl_dns_cache: int = 300,
+                 connect_timeout: float = 5,
+                 timeout: float = 30):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.connect_timeout = connect_timeout
+        self.timeout = timeout
+        self._session: Optional[ClientSession] = None
+
+    def configure(self, **kwargs) -> None:
+        '''Set parameters from `http_client` configuration section,
+        takes effect on next :meth:`start`.'''
+        for name, value in kwargs.items():
+            if not hasattr(self, name) or name.startswith('_'):
+                raise TypeError('Unknown HTTP client parameter {}'.format(name))
+            setattr(self, name, value)
+
+    def _create_session(self) -> ClientSession:
+        logger.debug('Creating HTTP client session')
+        connector = TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.ttl_dns_cache,
+            use_dns_cache=True)
+        return ClientSession(
+            connector=connector,
+            timeout=ClientTimeout(
+                total=self.timeout, sock_connect=self.connect_timeout))
+
+    async def start(self) -> None:
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+
+    async def stop(self) -> None:
+        if self._session is not None:
+            logger.debug('Closing HTTP client session')
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> ClientSession:
+        '''Shared session, created lazily if client is not started.'''
+        if self._session is None or self._session.closed:
+            logger.warning('HTTP client is not started, starting it now')
+            self._session = self._create_session()
+        return self._session
+
+    def get(self, url, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.session.post(url, **kwargs)
+
+
+http_client = HTTPClient()
@@ -1,27 +1,145 @@
+'''Signing keys. Every key has time `not_before`, after which it can
+sign tokens, and is in one of states (separately for keys of each
+algorithm):
+
+* :data:`NEXT` - key is published in JSON web key set, but is not used
+  yet, so relying parties get it with key set before first token signed
+  by it;
+* :data:`CURRENT` - key signs tokens, it is key with latest
+  `not_before` in the past;
+* :data:`RETIRING` - key is replaced, but is published until tokens
+  signed by it expire.
+
+States depend on time only, so processes loading the same key files
+agree on them without communication. Keys for rotation are generated to
+directory, file name is key's `not_before` timestamp.'''
+
 __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
-from hashlib import sha1
+from asyncio import CancelledError, Task, create_task, sleep
+from json import dumps
 from logging import getLogger
-from typing import Dict
+from os import link, listdir, replace, stat, unlink
+from os.path import dirname, join, normpath
+from tempfile import mkstemp
+from time import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.backends.openssl.rsa import RSAPrivateKeyWithSerialization
 from cryptography.hazmat.primitives.serialization import (
     Encoding,
     PrivateFormat,
     NoEncryption,
     load_pem_private_key,
 )
-from cryptography.hazmat.primitives.asymmetric.rsa import generate_private_key
 
-from bigur.auth.config import config
+from bigur.auth.config import config, get_settings, reload_callbacks
+from bigur.auth.oauth2.token import MAX_TOKEN_LIFETIME
+from bigur.auth.revocation import revoked_tokens
+from bigur.auth.signer import (
+    ALGORITHMS,
+    PrivateKey,
+    PublicKey,
+    Signer,
+    SigningBackend,
+    generate_key,
+    key_id,
+)
+from bigur.auth.utils import make_etag
+from bigur.auth.verifier import TokenVerifier
 
 logger = getLogger(__name__)
 
+#: Key is published, but does not sign tokens yet.
+NEXT = 'next'
+#: Key signs tokens.
+CURRENT = 'current'
+#: Key is replaced, but is published while its tokens are valid.
+RETIRING = 'retiring'
+
+
+class KeyEntry:
+    '''Key in jar.
+
+    :param signer: signer with the key
+    :param float not_before: time after which key can sign tokens
+    :param str path: file key is loaded from'''
+
+    __slots__ = ('signer', 'public_key', 'not_before', 'path', 'stamp',
+                 'state', 'retire_at')
+
+    def __init__(self,
+                 signer: Signer,
+                 not_before: float = 0.0,
+                 path: Optional[str] = None,
+                 stamp: Optional[Tuple[int, int]] = None):
+        self.signer = signer
+        self.public_key: PublicKey = signer.key.public_key()
+        self.not_before = not_before
+        self.path = path
+        #: Modification time and size of file, unchanged file is not
+        #: loaded again.
+        self.stamp = stamp
+        self.state = CURRENT
+        self.retire_at: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return '<KeyEntry kid={} state={} not_before={}>'.format(
+            self.signer.kid, self.state, self.not_before)
+
+
+def _issuer() -> Optional[str]:
+    try:
+        return get_settings().issuer
+    except ValueError:
+        # Settings are not initialized, e.g. keys are used by a tool
+        return None
+
+
+def private_bytes(key: PrivateKey) -> bytes:
+    return key.private_bytes(
+        encoding=Encoding.PEM,
+        format=PrivateFormat.PKCS8,
+        encryption_algorithm=NoEncryption(),
+    )
+
+
+def write_key(filename: str, key: PrivateKey,
+              exclusive: bool = False) -> bool:
+    '''Writes `key` to temporary file and moves it to `filename`, so
+    readers never see partially written file. If `exclusive` is set,
+    existing file is not replaced and `False` is returned.'''
+    fd, tmp = mkstemp(dir=dirname(filename) or '.', suffix='.tmp')
+    try:
+        with open(fd, 'wb') as fh_key:
+            fh_key.write(private_bytes(key))
+        if not exclusive:
+            replace(tmp, filename)
+            return True
+        try:
+            link(tmp, filename)
+        except FileExistsError:
+            return False
+        return True
+    finally:
+        try:
+            unlink(tmp)
+        except FileNotFoundError:
+            pass
+
 
 class KeyJar:
+    '''Storage of JWT private keys. For each key
+    :class:`~bigur.auth.signer.Signer` is created once, when key loaded.
+
+    Keys can be replaced by :meth:`reload` and :meth:`rotate` while
+    serving requests: new set of keys is built aside and replaces
+    previous one at once.
+
+    :param keys: private keys, if not set keys will be loaded from files
+        listed in `oauth2.jwt_keys` configuration parameter'''
 
     __instance: 'KeyJar' = None
 
@@ -31,55 +149,401 @@ class KeyJar:
             cls.__instance = KeyJar()
         return cls.__instance
 
+    @classmethod
+    def settings_reloaded(cls) -> None:
+        '''Called after configuration is reloaded: tokens of old issuer
+        are not accepted any more.'''
+        key_jar = cls.__instance
+        if key_jar is not None:
+            key_jar.verifier.issuer = _issuer()
+            key_jar.verifier.clear()
+
     @staticmethod
-    def key_id(private_key: RSAPrivateKeyWithSerialization):
-        public_key = private_key.public_key()
-        numbers = public_key.public_numbers()
-        n = numbers.n.to_bytes(
-            int(public_key.key_size / 8),
-            'big',
-        ).lstrip(b'\x00')
-        return sha1(n).hexdigest()
-
-    def __init__(self):
-        self._keys: Dict[str, RSAPrivateKeyWithSerialization] = {}
-        self.load_keys()
+    def key_id(private_key: PrivateKey):
+        return key_id(private_key)
+
+    def __init__(
+            self,
+            keys: Optional[Iterable[PrivateKey]] = None,
+    ):
+        self._entries: Dict[str, KeyEntry] = {}
+        self._current: Dict[str, KeyEntry] = {}
+        self._algorithms: Tuple[str, ...] = ()
+        self._next_update = float('inf')
+        self._retired: List[str] = []
+        self._jwks: bytes = b''
+        self._jwks_etag: str = ''
+        self.backend = SigningBackend()
+
+        self.directory: Optional[str] = None
+        self.interval: Optional[float] = None
+        self.publish_delay = 3600.0
+        self.retain: Optional[float] = MAX_TOKEN_LIFETIME
+        self.check_interval = 60.0
+        self.key_size = 2048
+        self.algorithm: Optional[str] = None
+        self._rotator: Optional[Task] = None
+
+        #: Verifier of access tokens, signed by keys of this jar and
+        #: issued by this server.
+        self.verifier = TokenVerifier({},
+                                      issuer=_issuer(),
+                                      revocations=revoked_tokens,
+                                      access_token=True)
+
+        if keys is None:
+            self.load_keys()
+        else:
+            for key in keys:
+                self.add_key(key)
 
         type(self).__instance = self
 
-    def load_keys(self):
-        backend = default_backend()
-        filenames = config.get('oauth2.jwt_keys', [])
-        for jwt_key_file in filenames:
+    def configure(self,
+                  directory: Optional[str] = None,
+                  interval: Optional[float] = None,
+                  publish_delay: Optional[float] = None,
+                  retain: Optional[float] = None,
+                  check_interval: Optional[float] = None,
+                  key_size: Optional[int] = None,
+                  algorithm: Optional[str] = None) -> None:
+        '''Set parameters of rotation from `oauth2.key_rotation`
+        configuration section and load keys from `directory`.
+
+        :param str directory: directory of rotated keys
+        :param float interval: seconds each key signs tokens, keys are
+            not generated if not set
+        :param float publish_delay: seconds new key is published before
+            use, it must be not less than time relying parties cache key
+            set
+        :param float retain: seconds replaced key is published, default
+            is the longest token lifetime
+        :param float check_interval: seconds between reloads of keys
+        :param int key_size: size of generated RSA keys
+        :param str algorithm: algorithm of generated keys and of tokens
+            signed without explicit algorithm, default is algorithm of
+            first loaded key'''
+        if directory is not None:
+            self.directory = normpath(directory)
+        if interval is not None:
+            self.interval = interval
+        if publish_delay is not None:
+            self.publish_delay = publish_delay
+        if retain is not None:
+            self.retain = retain
+        if check_interval is not None:
+            self.check_interval = check_interval
+        if key_size is not None:
+            self.key_size = key_size
+        if algorithm is not None:
+            if algorithm not in ALGORITHMS:
+                raise ValueError('Unsupported algorithm {}'.format(algorithm))
+            self.algorithm = algorithm
+        if self.interval is not None and self.publish_delay >= self.interval:
+            raise ValueError('Rotation interval must be greater than '
+                             'publish delay')
+        self.reload()
+
+    @property
+    def keys(self) -> List[PrivateKey]:
+        return [x.signer.key for x in self._entries.values()]
+
+    @property
+    def algorithms(self) -> Tuple[str, ...]:
+        '''Algorithms of keys, which sign tokens, default first.'''
+        self._check_update()
+        return self._algorithms
+
+    def states(self) -> Dict[str, str]:
+        '''Returns states of keys by key id.'''
+        self._check_update()
+        return {kid: x.state for kid, x in self._entries.items()}
+
+    def add_key(self,
+                key: PrivateKey,
+                not_before: float = 0.0) -> Signer:
+        '''Adds `key`, which can sign tokens after `not_before`. Of keys
+        with the same `not_before` the first added one is used.'''
+        signer = Signer(key)
+        entries = dict(self._entries)
+        entries[signer.kid] = KeyEntry(signer, not_before)
+        self._set_entries(entries)
+        return signer
+
+    def update(self, now: Optional[float] = None) -> None:
+        '''Update states of keys, drop keys which are retired.'''
+        self._set_entries(self._entries, now)
+
+    def _check_update(self) -> None:
+        if time() >= self._next_update:
+            self.update()
+
+    def _set_entries(self,
+                     entries: Dict[str, KeyEntry],
+                     now: Optional[float] = None) -> None:
+        if now is None:
+            now = time()
+
+        groups: Dict[str, List[KeyEntry]] = {}
+        for entry in entries.values():
+            groups.setdefault(entry.signer.alg, []).append(entry)
+
+        currents: Dict[str, KeyEntry] = {}
+        for alg, group in groups.items():
+            current = None
+            for entry in group:
+                if entry.not_before <= now and (
+                        current is None or
+                        entry.not_before > current.not_before):
+                    current = entry
+            if current is None:
+                # All keys are in future, sign with the nearest one
+                current = min(group, key=lambda x: x.not_before)
+            currents[alg] = current
+
+        kept: Dict[str, KeyEntry] = {}
+        next_update = float('inf')
+        for kid, entry in entries.items():
+            current = currents[entry.signer.alg]
+            if entry is current:
+                entry.state, entry.retire_at = CURRENT, None
+            elif entry.not_before > current.not_before:
+                entry.state, entry.retire_at = NEXT, None
+                next_update = min(next_update, entry.not_before)
+            else:
+                # Key is retired after key replaced it is used longer
+                # than any token lives
+                replaced = [
+                    x.not_before for x in groups[entry.signer.alg]
+                    if entry.not_before < x.not_before <= current.not_before
+                ]
+                retire_at = None
+                if replaced and self.retain is not None:
+                    retire_at = min(replaced) + self.retain
+                    if retire_at <= now:
+                        logger.info('Key %s is retired', kid)
+                        if (entry.path is not None and
+                                dirname(entry.path) == self.directory):
+                            self._retired.append(entry.path)
+                        continue
+                    next_update = min(next_update, retire_at)
+                entry.state, entry.retire_at = RETIRING, retire_at
+            kept[kid] = entry
+
+        for alg, current in currents.items():
+            if current is not self._current.get(alg):
+                logger.info('Signing %s tokens with key %s', alg,
+                            current.signer.kid)
+        algorithms = list(currents)
+        if self.algorithm in currents:
+            algorithms.remove(self.algorithm)
+            algorithms.insert(0, self.algorithm)
+
+        changed = list(kept) != list(self._entries)
+        self._entries = kept
+        self._current = currents
+        self._algorithms = tuple(algorithms)
+        self._next_update = next_update
+        self.verifier.keys = {
+            kid: x.public_key for kid, x in kept.items()
+        }
+        if changed or not self._jwks:
+            self._build_jwks()
+
+    def _build_jwks(self) -> None:
+        body = dumps(
+            {'keys': [x.signer.jwk() for x in self._entries.values()]},
+            separators=(',', ':')).encode('utf-8')
+        # Body and its tag are replaced together
+        self._jwks, self._jwks_etag = body, make_etag(body)
+
+    @property
+    def jwks(self) -> bytes:
+        '''Serialized JSON web key set with public keys.'''
+        self._check_update()
+        return self._jwks
+
+    @property
+    def jwks_etag(self) -> str:
+        '''Strong entity tag of :attr:`jwks`.'''
+        self._check_update()
+        return self._jwks_etag
+
+    def get_signer(self,
+                   kid: Optional[str] = None,
+                   alg: Optional[str] = None) -> Signer:
+        '''Returns signer for key with `kid`, or signer for current key
+        of algorithm `alg` (default algorithm if not set), if `kid` is
+        not set.'''
+        self._check_update()
+        if kid is not None:
+            return self._entries[kid].signer
+        if not self._algorithms:
+            raise KeyError('No jwt keys loaded')
+        try:
+            return self._current[alg or self._algorithms[0]].signer
+        except KeyError:
+            raise KeyError('No {} keys loaded'.format(alg))
+
+    async def start(self, backend: Optional[SigningBackend] = None) -> None:
+        '''Start signing `backend` (inline if not set) with loaded keys
+        and task, which reloads and rotates keys.'''
+        await self.stop()
+        if backend is not None:
+            self.backend = backend
+        await self.backend.start(x.signer for x in self._entries.values())
+        if self.directory is not None:
+            self._rotator = create_task(self.rotator())
+
+    async def stop(self) -> None:
+        if self._rotator is not None:
+            self._rotator.cancel()
+            try:
+                await self._rotator
+            except CancelledError:
+                pass
+            self._rotator = None
+        await self.backend.stop()
+
+    async def sign(self,
+                   payload: Dict[str, Any],
+                   kid: Optional[str] = None,
+                   alg: Optional[str] = None) -> bytes:
+        '''Returns token with `payload`, signed by signing backend with
+        key `kid` or current key of `alg` (see :meth:`get_signer`).'''
+        return await self.backend.sign(self.get_signer(kid, alg), payload)
+
+    async def rotator(self) -> None:
+        while True:
+            try:
+                self.reload()
+                self.rotate()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Error while rotating keys')
+            await sleep(self.check_interval)
+
+    def rotate(self, now: Optional[float] = None) -> Optional[Signer]:
+        '''Generates key for the next period of rotation, when it is
+        `publish_delay` seconds before period starts, and removes files
+        of retired keys. Periods start at multiples of `interval`, so
+        processes sharing keys directory generate key with the same file
+        name, and only one of them is written.
+
+        :returns: signer for generated key'''
+        if now is None:
+            now = time()
+        self.update(now)
+
+        retired, self._retired = self._retired, []
+        for filename in set(retired):
+            logger.info('Removing retired key %s', filename)
             try:
-                with open(jwt_key_file, 'rb') as fh_jwt_read:
-                    key = load_pem_private_key(
-                        fh_jwt_read.read(),
-                        password=None,
-                        backend=backend,
-                    )
-                    self._keys[self.key_id(key)] = key
+                unlink(filename)
+            except FileNotFoundError:
+                pass
 
+        if self.directory is None or self.interval is None:
+            return None
+
+        interval = self.interval
+        alg = self.algorithm or 'RS256'
+        if not self._entries:
+            not_before = now // interval * interval
+        else:
+            not_before = (now // interval + 1) * interval
+            if not_before - now > self.publish_delay or any(
+                    x.not_before >= not_before
+                    for x in self._entries.values()):
+                return None
+
+        key = generate_key(alg, self.key_size)
+        filename = join(self.directory, '{:d}.pem'.format(int(not_before)))
+        if not write_key(filename, key, exclusive=True):
+            # Key is generated by another process
+            self.reload()
+            return None
+        logger.info('Generated %s key %s, it signs tokens from %d', alg,
+                    key_id(key), not_before)
+        entries = dict(self._entries)
+        signer = Signer(key)
+        entries[signer.kid] = KeyEntry(signer, not_before, filename,
+                                       self._file_stamp(filename))
+        self._set_entries(entries, now)
+        return signer
+
+    @staticmethod
+    def _file_stamp(filename: str) -> Tuple[int, int]:
+        info = stat(filename)
+        return info.st_mtime_ns, info.st_size
+
+    def _read_files(self) -> List[Tuple[str, float]]:
+        files = [(x, 0.0) for x in config.get('oauth2.jwt_keys', [])]
+        if self.directory is not None:
+            try:
+                names = sorted(listdir(self.directory))
             except OSError as exc:
+                logger.error('Error while read keys directory: %s', exc)
+                names = []
+            for name in names:
+                if not name.endswith('.pem'):
+                    continue
+                try:
+                    not_before = float(name[:-4])
+                except ValueError:
+                    logger.warning('Skipping key file %s: name is not '
+                                   'timestamp', name)
+                    continue
+                files.append((join(self.directory, name), not_before))
+        return files
+
+    def reload(self) -> None:
+        '''Loads key files, listed in `oauth2.jwt_keys` configuration
+        parameter and from rotation directory. Files, which are not
+        changed, are not loaded again. Keys are replaced only after all
+        files are read.'''
+        backend = default_backend()
+        loaded = {x.path: x for x in self._entries.values() if x.path}
+        entries = {
+            kid: x for kid, x in self._entries.items() if x.path is None
+        }
+        for filename, not_before in self._read_files():
+            try:
+                stamp = self._file_stamp(filename)
+                entry = loaded.get(filename)
+                if entry is None or entry.stamp != stamp:
+                    with open(filename, 'rb') as fh_jwt_read:
+                        key = load_pem_private_key(
+                            fh_jwt_read.read(),
+                            password=None,
+                            backend=backend,
+                        )
+                    entry = KeyEntry(Signer(key), not_before, filename, stamp)
+            except (OSError, ValueError) as exc:
                 logger.error('Error while load jwt key file: %s', exc)
+                entry = loaded.get(filename)
+                if entry is None:
+                    continue
+            entries.setdefault(entry.signer.kid, entry)
+        self._set_entries(entries)
 
-        if not self._keys:
-            logger.warning('No jwt keys, generate new one...')
-            for filename in filenames:
-                key = generate_private_key(
-                    public_exponent=65537,
-                    key_size=2048,
-                    backend=backend,
-                )
-                self._keys[self.key_id(key)] = key
+    def load_keys(self):
+        self.reload()
 
+        if not self._entries:
+            logger.warning('No jwt keys, generate new one...')
+            entries = {}
+            for filename in config.get('oauth2.jwt_keys', []):
+                key = generate_key(self.algorithm or 'RS256', self.key_size)
                 try:
-                    with open(filename, 'w') as fh_jwt_write:
-                        pem = key.private_bytes(
-                            encoding=Encoding.PEM,
-                            format=PrivateFormat.TraditionalOpenSSL,
-                            encryption_algorithm=NoEncryption(),
-                        )
-                        fh_jwt_write.write(pem.decode('utf-8'))
+                    write_key(filename, key)
                 except OSError as e:
                     logger.error('Error while save generated key: %s', e)
+                    path, stamp = None, None
+                else:
+                    path, stamp = filename, self._file_stamp(filename)
+                signer = Signer(key)
+                entries[signer.kid] = KeyEntry(signer, 0.0, path, stamp)
+            self._set_entries(entries)
+
+
+reload_callbacks.append(KeyJar.settings_reloaded)
@@ -2,18 +2,20 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Business group for development management'
 __licence__ = 'For license information see LICENSE'
 
-from uuid import uuid4
 from logging import getLogger
 from typing import Callable, Optional
 
 from aiohttp.web import Request, Response, middleware
 from aiohttp.web_exceptions import HTTPException
 
+from bigur.auth.config import get_settings
+from bigur.auth.session import Session, sessions
+
 logger = getLogger(__name__)
 
 
 def set_cookie(request: Request, response: Response, name: str, value: str):
-    if request.app['config'].get('authn.cookie.secure'):
+    if get_settings().cookie_secure:
         cookie_secure: Optional[str] = 'yes'
     else:
         cookie_secure = None
@@ -23,22 +25,33 @@ def set_cookie(request: Request, response: Response, name: str, value: str):
 
 @middleware
 async def session(request: Request, handler: Callable) -> Response:
-    cookie_name: str = request.app['config'].get('authn.cookie.session_name')
+    cookie_name: str = get_settings().cookie_session_name
 
     sid: Optional[str] = request.cookies.get(cookie_name)
-    if sid is None:
-        sid = uuid4().hex
-        logger.debug('Generate new session id: %s', sid)
+    user_session: Optional[Session] = None
+    if sid is not None:
+        user_session = await sessions.get(sid)
+    if user_session is None:
+        # Session is saved only when it gets state (e.g. user logs in),
+        # so anonymous requests don't fill the store and evict sessions
+        # of logged in users.
+        user_session = Session()
+        logger.debug('Generate new session id: %s', user_session.sid)
     else:
         logger.debug('Session id is: %s', sid)
-    request['sid'] = sid
+    request['sid'] = user_session.sid
+    request['session'] = user_session
 
     try:
         response = await handler(request)
     except HTTPException as e:
+        if user_session.modified:
+            await sessions.put(user_session)
         set_cookie(request, e, cookie_name, request['sid'])
         raise
     else:
+        if user_session.modified:
+            await sessions.put(user_session)
         set_cookie(request, response, cookie_name, request['sid'])
 
     return response
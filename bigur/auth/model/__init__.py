@@ -9,5 +9,6 @@ from .base import Object
 from .access_code import AccessCode
 from .client import Client
 from .provider import Provider
+from .refresh_token import RefreshToken
 from .scope import Scope
 from .user import User, Human
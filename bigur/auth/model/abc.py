@@ -3,7 +3,7 @@ __copyright__ = '(c) 2016-2019 Business group for development management'
 __licence__ = 'For license information see LICENSE'
 
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Union
+from typing import Any, Awaitable, Dict, List, Optional, Union
 
 
 class PasswordMixin(ABC):
@@ -93,6 +93,11 @@ class AbstractProvider(AbstractObject):
         '''Return list of supported scopes.'''
         raise NotImplementedError
 
+    @abstractmethod
+    def get_id_token_signing_alg_values_supported(self) -> List[str]:
+        '''Return list of algorithms of ID tokens.'''
+        raise NotImplementedError
+
     @abstractmethod
     async def update_keys(self) -> None:
         '''Download keys from `jwks_uri` and prepare to store them into db.'''
@@ -102,3 +107,18 @@ class AbstractProvider(AbstractObject):
     async def get_key(self, kid: str) -> Dict[str, str]:
         '''Return key with `kid`.'''
         raise NotImplementedError
+
+    @abstractmethod
+    def get_verification_key(self, kid: str) -> Any:
+        '''Return parsed public key with `kid`.'''
+        raise NotImplementedError
+
+    @abstractmethod
+    def keys_expired(self) -> bool:
+        '''Return `True` if keys should be refreshed.'''
+        raise NotImplementedError
+
+    @abstractmethod
+    def refresh_keys(self) -> Awaitable[None]:
+        '''Start update of keys in background.'''
+        raise NotImplementedError
@@ -3,13 +3,16 @@ __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import List
+from datetime import datetime, timedelta
+from typing import List, Optional
 from uuid import uuid4
 
 from bigur.auth.model.abc import AbstractAccessCode
 from bigur.auth.model.base import Object
 
+#: Access code lifetime.
+EXPIRE_SECONDS = 60 * 10
+
 
 @dataclass
 class AccessCode(Object, AbstractAccessCode):
@@ -19,8 +22,35 @@ class AccessCode(Object, AbstractAccessCode):
     #: Scopes which will be used when generate token by this code.
     scopes: List[str] = field(default_factory=list)
 
+    #: Client, to which code is issued.
+    client_id: Optional[str] = None
+
+    #: Resource owner, who authorized client.
+    user_id: Optional[str] = None
+
+    #: Redirection URI from authorization request, token request must
+    #: contain the same value (RFC 6749, sec. 4.1.3).
+    redirect_uri: Optional[str] = None
+
+    #: OpenID Connect nonce, copied to ID token.
+    nonce: Optional[str] = None
+
     #: Timestamp when code generated.
     created: datetime = field(default_factory=datetime.now)
 
+    #: Timestamp after which code can't be used, by default
+    #: :data:`EXPIRE_SECONDS` after creation.
+    expires: Optional[datetime] = None
+
     #: True if this code already used.
     used: bool = field(default=False)
+
+    def __post_init__(self):
+        if self.expires is None:
+            self.expires = self.created + timedelta(seconds=EXPIRE_SECONDS)
+        super().__post_init__()
+
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        if now is None:
+            now = datetime.now()
+        return self.expires < now
@@ -3,10 +3,11 @@ __copyright__ = '(c) 2016-2019 Business group for development management'
 __licence__ = 'For license information see LICENSE'
 
 from dataclasses import InitVar, dataclass, field
-from hashlib import sha512
 from typing import Optional, Union
 from uuid import uuid4
 
+from bigur.auth.password import get_hasher, verify
+
 
 @dataclass
 class Object:
@@ -25,7 +26,8 @@ class PasswordMixin:
     #: Client's password, init var only, not saved in instance.
     password: InitVar[Optional[str]] = None
 
-    #: Client's password hash.
+    #: Client's password hash, prefixed with hasher's name and parameters
+    #: (see :mod:`bigur.auth.password`).
     crypt: Optional[str] = field(init=False, repr=False, default=None)
 
     #: Client's password hash salt.
@@ -39,22 +41,22 @@ class PasswordMixin:
             self.crypt = None
         super().__post_init__()
 
-    @staticmethod
-    def _get_hash(salt: str, password: str) -> str:
-        return sha512((password + salt).encode('utf-8')).hexdigest()
-
     def set_password(self, password: str):
         if password is None:
             self.salt = None
             self.crypt = None
         else:
             self.salt = uuid4().hex
-            self.crypt = self._get_hash(self.salt, password)
+            self.crypt = get_hasher().hash(password, self.salt)
 
     def verify_password(self, password: str) -> bool:
         if self.salt and self.crypt:
-            return self.crypt == self._get_hash(self.salt, password)
+            return verify(password, self.salt, self.crypt)
         return False
 
+    def needs_rehash(self) -> bool:
+        '''Returns `True` if password hashed not by current hasher.'''
+        return bool(self.crypt) and get_hasher().needs_update(self.crypt)
+
     def has_password(self) -> bool:
         return self.salt and self.crypt
@@ -26,6 +26,10 @@ class ClientMixin(Object):
     #: List of allowed redirect URIs.
     redirect_uris: Optional[List[str]] = None
 
+    #: Algorithm of ID tokens, issued to client (OpenID Connect Dynamic
+    #: Client Registration, sec. 2), default algorithm if not set.
+    id_token_signed_response_alg: Optional[str] = None
+
 
 @dataclass
 class Client(PasswordMixin, ClientMixin):
@@ -2,13 +2,61 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Business group for development management'
 __licence__ = 'For license information see LICENSE'
 
+from asyncio import Future
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from json import dumps
+from logging import getLogger
+from time import monotonic
+from typing import Any, ClassVar, Dict, List, Optional, Tuple
 
-from aiohttp import ClientSession
+from jwt.algorithms import get_default_algorithms
+from jwt.exceptions import InvalidKeyError
 
+from bigur.auth.http_client import REQUEST_ERRORS, http_client
 from bigur.auth.model.abc import AbstractProvider
 from bigur.auth.model.base import Object
+from bigur.auth.utils import SingleFlight, parse_cache_control
+
+logger = getLogger(__name__)
+
+# Algorithms, used for parsing of JWK by key type
+JWK_PARSERS = {'RSA': 'RS256', 'EC': 'ES256'}
+
+#: Keys by kid, parsed keys by kid and max-age of key set
+KeySet = Tuple[Dict[str, Dict[str, str]], Dict[str, Any], Optional[float]]
+
+# Downloads of key sets by jwks_uri, shared by providers with the same
+# jwks_uri
+keys_flight: SingleFlight[KeySet] = SingleFlight()
+
+# Background refreshes by provider
+refresh_flight: SingleFlight[None] = SingleFlight()
+
+
+def parse_jwk(jwk: Dict[str, str]) -> Any:
+    '''Returns public key object for JWK.'''
+    try:
+        alg = get_default_algorithms()[JWK_PARSERS[jwk['kty']]]
+    except KeyError:
+        raise InvalidKeyError('Unsupported key type {}'.format(
+            jwk.get('kty')))
+    return alg.from_jwk(dumps(jwk))
+
+
+async def fetch_keys(jwks_uri: str) -> KeySet:
+    '''Downloads JSON web key set and parses keys of it.'''
+    async with http_client.get(jwks_uri) as response:
+        keys = {x['kid']: x for x in (await response.json())['keys']}
+        max_age = parse_cache_control(response.headers.get('Cache-Control'))
+
+    parsed = {}
+    for kid, jwk in keys.items():
+        try:
+            parsed[kid] = parse_jwk(jwk)
+        except (InvalidKeyError, ValueError, TypeError) as e:
+            logger.warning('Can\'t parse key %s of %s: %s', kid, jwks_uri, e)
+
+    return keys, parsed, max_age
 
 
 @dataclass
@@ -32,6 +80,26 @@ class Provider(Object, AbstractProvider):
     domains: List[str] = field(default_factory=list)
     keys: Optional[Dict[str, Dict[str, str]]] = None
 
+    #: Time to live of keys, if JWKS response has no `Cache-Control`.
+    keys_ttl: ClassVar[float] = 3600
+
+    #: Minimal time to live of keys.
+    keys_min_ttl: ClassVar[float] = 60
+
+    def __post_init__(self):
+        super().__post_init__()
+        # Parsed keys by kid, not stored in database
+        self._verification_keys: Dict[str, Any] = {}
+        self._keys_expires: float = 0.0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Parsed keys can't be pickled, they are parsed again after
+        # provider is loaded from database
+        state = self.__dict__.copy()
+        state['_verification_keys'] = {}
+        state['_keys_expires'] = 0.0
+        return state
+
     def get_authorization_endpoint(self):
         return self.authorization_endpoint
 
@@ -48,6 +116,12 @@ class Provider(Object, AbstractProvider):
             return []
         return self.scopes_supported
 
+    def get_id_token_signing_alg_values_supported(self):
+        # RS256 must be supported by all providers
+        if not self.id_token_signing_alg_values_supported:
+            return ['RS256']
+        return self.id_token_signing_alg_values_supported
+
     def get_client_id(self):
         return self.client_id
 
@@ -59,11 +133,47 @@ class Provider(Object, AbstractProvider):
             return self.keys[kid]
         raise KeyError('Key with kid {} not found'.format(kid))
 
+    def get_verification_key(self, kid: str) -> Any:
+        '''Returns parsed public key with `kid`. Keys are parsed once and
+        cached.'''
+        try:
+            return self._verification_keys[kid]
+        except KeyError:
+            key = parse_jwk(self.get_key(kid))
+            self._verification_keys[kid] = key
+            return key
+
+    def keys_expired(self, now: Optional[float] = None) -> bool:
+        return self._keys_expires <= (monotonic() if now is None else now)
+
+    async def _fetch_keys(self) -> None:
+        keys, parsed, max_age = await keys_flight.do(
+            self.jwks_uri, lambda: fetch_keys(self.jwks_uri))
+
+        ttl = self.keys_ttl if max_age is None else max(
+            max_age, self.keys_min_ttl)
+
+        # Replace all at once, so concurrent requests see either old or
+        # new keys, parsed keys are copied as providers cache keys parsed
+        # later in them
+        self.keys, self._verification_keys = keys, dict(parsed)
+        self._keys_expires = monotonic() + ttl
+
     async def update_keys(self):
-        async with ClientSession() as session:
-            async with session.get(self.jwks_uri) as response:
-                keys = (await response.json())['keys']
-                self.keys = {x['kid']: x for x in keys}
+        '''Downloads and parses keys, concurrent downloads of the same
+        `jwks_uri` are coalesced and applied to every waiting provider.'''
+        await self._fetch_keys()
+
+    def refresh_keys(self) -> Future:
+        '''Starts update of keys in background.'''
+
+        async def refresh():
+            try:
+                await self._fetch_keys()
+            except REQUEST_ERRORS + (KeyError, TypeError, ValueError) as e:
+                logger.warning('Can\'t refresh keys of %s: %s', self, e)
+
+        return refresh_flight.start(id(self), refresh)
 
     def __str__(self):
         return '<{}({})>'.format(type(self).__name__, self.id)
@@ -0,0 +1,70 @@
+'''Refresh tokens. Token string is given to client only, store keeps
+its hash, so tokens can't be stolen from store. Every refresh issues new
+token of the same family, previous token is marked as used; presenting
+used token means that token was stolen, so whole family is revoked.'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from hashlib import sha256
+from secrets import token_urlsafe
+from time import time
+from typing import Optional, Tuple
+
+#: Refresh token lifetime.
+EXPIRE_SECONDS = 60 * 60 * 24 * 30
+
+
+def generate_token() -> str:
+    '''Returns new random token string.'''
+    return token_urlsafe(32)
+
+
+def hash_token(token: str) -> bytes:
+    '''Returns id of token, under which token is stored.'''
+    return sha256(token.encode('utf-8')).digest()
+
+
+class RefreshToken:
+    '''Stored refresh token. There can be a lot of them, so this is
+    compact record with slots instead of dataclass.
+
+    :param bytes id: hash of token string (see :func:`hash_token`)
+    :param str family: id of family, shared by tokens rotated from the
+        same token
+    :param str user_id: resource owner
+    :param str client_id: client, to which token is issued
+    :param scopes: granted scopes
+    :param float expires: timestamp, after which token can't be used,
+        by default :data:`EXPIRE_SECONDS` from now
+    :param bool used: `True` if token is already rotated'''
+
+    __slots__ = ('id', 'family', 'user_id', 'client_id', 'scopes', 'expires',
+                 'used')
+
+    def __init__(self,
+                 id: bytes,  # pylint: disable=redefined-builtin
+                 family: str,
+                 user_id: str,
+                 client_id: str,
+                 scopes: Tuple[str, ...] = (),
+                 expires: Optional[float] = None,
+                 used: bool = False):
+        self.id = id
+        self.family = family
+        self.user_id = user_id
+        self.client_id = client_id
+        self.scopes = tuple(scopes)
+        self.expires = (time() + EXPIRE_SECONDS
+                        if expires is None else expires)
+        self.used = used
+
+    def __repr__(self) -> str:
+        return '<RefreshToken family={} user_id={} used={}>'.format(
+            self.family, self.user_id, self.used)
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        if now is None:
+            now = time()
+        return self.expires < now
@@ -8,14 +8,14 @@ from typing import Optional
 from aiohttp.web import Request as HTTPRequest
 from multidict import MultiDict
 
-from bigur.auth.model import Client, User
+from bigur.auth.model import AccessCode, Client, RefreshToken
 from bigur.auth.oauth2.request import OAuth2Request
 
 
 @dataclass
 class Context:
-    #: Resource owner
-    owner: Optional[User] = None
+    #: Resource owner's id
+    owner: Optional[str] = None
 
     #: Client for request
     client: Optional[Client] = None
@@ -28,3 +28,9 @@ class Context:
 
     #: OAuth2 request params
     oauth2_request: Optional[OAuth2Request] = None
+
+    #: Access code, redeemed by token request
+    access_code: Optional[AccessCode] = None
+
+    #: Refresh token, rotated by token request
+    refresh_token: Optional[RefreshToken] = None
@@ -0,0 +1,94 @@
+'''Token introspection endpoint (RFC 7662). Access tokens are checked by
+verifier of key jar, refresh tokens are looked up in store.'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Awaitable, List, Optional, Union
+
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.model.refresh_token import hash_token
+from bigur.auth.oauth2.context import Context
+from bigur.auth.oauth2.exceptions import InvalidRequest, InvalidToken
+from bigur.auth.oauth2.request import OAuth2Request
+from bigur.auth.oauth2.response import OAuth2Response
+from bigur.auth.pipeline import Pipeline
+from bigur.auth.store import store
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class IntrospectionRequest(OAuth2Request):
+    token: Optional[str] = None
+    token_type_hint: Optional[str] = None
+    client_id: Optional[str] = None
+
+
+@dataclass
+class IntrospectionResponse(OAuth2Response):
+    active: bool = False
+    scope: Optional[str] = None
+    client_id: Optional[str] = None
+    token_type: Optional[str] = None
+    exp: Optional[int] = None
+    iat: Optional[int] = None
+    sub: Optional[str] = None
+    aud: Optional[Union[str, List[str]]] = None
+    iss: Optional[str] = None
+
+
+def introspect_access_token(token: str) -> IntrospectionResponse:
+    try:
+        claims = KeyJar.instance().verifier.verify(token)
+    except InvalidToken as exc:
+        logger.debug('Inactive access token: %s', exc)
+        return IntrospectionResponse()
+    scope = claims.get('scope')
+    return IntrospectionResponse(
+        active=True,
+        scope=' '.join(scope) if isinstance(scope, list) else scope,
+        client_id=claims.get('client_id'),
+        token_type='Bearer',
+        exp=claims.get('exp'),
+        iat=claims.get('iat'),
+        sub=claims.get('sub'),
+        aud=claims.get('aud'),
+        iss=claims.get('iss'))
+
+
+async def introspect_refresh_token(token: str) -> IntrospectionResponse:
+    try:
+        refresh_token = await store.refresh_tokens.get(hash_token(token))
+    except KeyError:
+        return IntrospectionResponse()
+    if refresh_token.used or refresh_token.is_expired():
+        return IntrospectionResponse()
+    return IntrospectionResponse(
+        active=True,
+        scope=' '.join(refresh_token.scopes) or None,
+        client_id=refresh_token.client_id,
+        exp=int(refresh_token.expires),
+        sub=refresh_token.user_id)
+
+
+async def introspect(context: Context) -> IntrospectionResponse:
+    '''Returns state of token. Access tokens are JWS, refresh tokens
+    have no dots, so `token_type_hint` is not needed.'''
+    token = context.oauth2_request.token
+    if not token:
+        raise InvalidRequest('Parameter `token\' required.')
+    if '.' in token:
+        return introspect_access_token(token)
+    return await introspect_refresh_token(token)
+
+
+introspection_pipeline = Pipeline(introspect)
+
+
+def get_introspection_stream(
+        context: Context) -> Awaitable[IntrospectionResponse]:
+    return introspection_pipeline(context)
@@ -0,0 +1,84 @@
+'''Token revocation endpoint (RFC 7009). Access token's id is added to
+:data:`~bigur.auth.revocation.revoked_tokens`, refresh token is revoked
+with its family.'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Awaitable, Optional
+
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.model.refresh_token import hash_token
+from bigur.auth.oauth2.context import Context
+from bigur.auth.oauth2.exceptions import (
+    InvalidRequest,
+    InvalidToken,
+    UnauthorizedClient,
+)
+from bigur.auth.oauth2.request import OAuth2Request
+from bigur.auth.oauth2.response import OAuth2Response
+from bigur.auth.pipeline import Pipeline
+from bigur.auth.revocation import revoked_tokens
+from bigur.auth.store import store
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class RevocationRequest(OAuth2Request):
+    token: Optional[str] = None
+    token_type_hint: Optional[str] = None
+    client_id: Optional[str] = None
+
+
+@dataclass
+class RevocationResponse(OAuth2Response):
+    pass
+
+
+def revoke_access_token(token: str, client_id: str) -> None:
+    try:
+        claims = KeyJar.instance().verifier.verify(token)
+    except InvalidToken as exc:
+        logger.debug('Access token is not revoked: %s', exc)
+        return
+    if claims.get('client_id') != client_id:
+        raise UnauthorizedClient('Token was issued to another client.')
+    jti = claims.get('jti')
+    if jti is None:
+        logger.warning('Access token without id can\'t be revoked')
+        return
+    revoked_tokens.revoke(jti, claims['exp'])
+
+
+async def revoke_refresh_token(token: str, client_id: str) -> None:
+    try:
+        refresh_token = await store.refresh_tokens.get(hash_token(token))
+    except KeyError:
+        return
+    if refresh_token.client_id != client_id:
+        raise UnauthorizedClient('Token was issued to another client.')
+    await store.refresh_tokens.revoke_family(refresh_token.family)
+
+
+async def revoke(context: Context) -> RevocationResponse:
+    '''Revokes token. Invalid and unknown tokens are ignored, as
+    required by RFC 7009, sec. 2.2.'''
+    token = context.oauth2_request.token
+    if not token:
+        raise InvalidRequest('Parameter `token\' required.')
+    if '.' in token:
+        revoke_access_token(token, context.client.id)
+    else:
+        await revoke_refresh_token(token, context.client.id)
+    return RevocationResponse()
+
+
+revocation_pipeline = Pipeline(revoke)
+
+
+def get_revocation_stream(context: Context) -> Awaitable[RevocationResponse]:
+    return revocation_pipeline(context)
@@ -2,21 +2,43 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
-from rx import Observable
-from rx import operators as op, return_value
+from typing import Awaitable
 
-from bigur.auth.utils import call_async
 from bigur.auth.oauth2.context import Context
-from bigur.auth.oauth2.grant.authorization_code import get_token_by_code
+from bigur.auth.oauth2.grant.authorization_code import (
+    AccessTokenResponse,
+    get_token_by_code,
+)
+from bigur.auth.oauth2.grant.refresh_token import refresh_token_grant
 from bigur.auth.oauth2.validators import (
     validate_grant_type,
     validate_code,
+    validate_refresh_token,
+)
+from bigur.auth.pipeline import Pipeline
+
+GRANTS = {
+    'authorization_code': Pipeline(
+        validate_code,
+        get_token_by_code,
+    ),
+    'refresh_token': Pipeline(
+        validate_refresh_token,
+        refresh_token_grant,
+    ),
+}
+
+
+async def select_grant(context: Context) -> AccessTokenResponse:
+    '''Runs pipeline of requested grant type.'''
+    return await GRANTS[context.oauth2_request.grant_type](context)
+
+
+token_pipeline = Pipeline(
+    validate_grant_type,
+    select_grant,
 )
 
 
-def get_token_stream(context: Context) -> Observable:
-    return return_value(context).pipe(
-        op.map(validate_grant_type),
-        op.flat_map(call_async(validate_code)),
-        op.flat_map(call_async(get_token_by_code)),
-    )
+def get_token_stream(context: Context) -> Awaitable[AccessTokenResponse]:
+    return token_pipeline(context)
@@ -2,6 +2,16 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Business group for development management'
 __licence__ = 'For license information see LICENSE'
 
+from json import dumps
+from re import sub as re_sub
+from typing import Dict
+
+
+def error_code_from_name(name: str) -> str:
+    '''Returns snake case error code for exception class name.'''
+    return re_sub('([a-z0-9])([A-Z])', r'\1_\2',
+                  re_sub('(.)([A-Z][a-z]+)', r'\1_\2', name)).lower()
+
 
 class HTTPRequestError(Exception):
     '''Base class for errors, that must response as 400 Bad Request.'''
@@ -12,7 +22,40 @@ class InvalidRedirectionURI(HTTPRequestError):
 
 
 class OAuth2Error(Exception):
-    '''Base class for OAuth2 errors.'''
+    '''Base class for OAuth2 errors. Error code and beginning of JSON
+    response are computed once, when subclass is created.'''
+
+    #: Error code (RFC 6749, sec. 4.1.2.1 and 5.2), built from class name
+    #: if not set in class.
+    error_code: str = 'server_error'
+
+    #: HTTP status of JSON response.
+    status: int = 400
+
+    _json_prefix: bytes = b'{"error":"server_error","error_description":'
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'error_code' not in cls.__dict__:
+            cls.error_code = error_code_from_name(cls.__name__)
+        cls._json_prefix = '{{"error":{},"error_description":'.format(
+            dumps(cls.error_code)).encode('utf-8')
+
+    @property
+    def description(self) -> str:
+        return str(self.args[0]) if self.args else ''
+
+    def to_dict(self) -> Dict[str, str]:
+        '''Returns response parameters.'''
+        return {
+            'error': self.error_code,
+            'error_description': self.description
+        }
+
+    def to_json(self) -> bytes:
+        '''Returns serialized JSON response.'''
+        return b''.join((self._json_prefix,
+                         dumps(self.description).encode('utf-8'), b'}'))
 
 
 class InvalidRequest(OAuth2Error):
@@ -33,6 +76,8 @@ class InvalidClient(OAuth2Error):
     include the "WWW-Authenticate" response header field
     matching the authentication scheme used by the client.'''
 
+    status = 401
+
 
 class UnauthorizedClient(OAuth2Error):
     '''The client is not authorized to request an access token
@@ -80,3 +125,12 @@ class TemporaryUnavailable(OAuth2Error):
     of the server.  (This error code is needed because a 503
     Service Unavailable HTTP status code cannot be returned
     to the client via an HTTP redirect.)'''
+
+    error_code = 'temporarily_unavailable'
+
+
+class InvalidToken(OAuth2Error):
+    '''The access token provided is expired, revoked, malformed, or
+    invalid for other reasons (RFC 6750, sec. 3.1).'''
+
+    status = 401
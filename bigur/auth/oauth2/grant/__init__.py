@@ -9,3 +9,4 @@ from .implicit import implicit_grant
 from .resource_owner_password_credentials import (
     resource_owner_password_credentials_grant)
 from .client_credentials import client_credentials_grant
+from .refresh_token import refresh_token_grant
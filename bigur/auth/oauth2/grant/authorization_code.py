@@ -4,13 +4,24 @@ __licence__ = 'For license information see LICENSE'
 
 from dataclasses import dataclass, field
 from logging import getLogger
-from typing import Optional, Set
+from time import time
+from typing import List, Optional, Set
+from uuid import uuid4
 
+from bigur.auth.config import get_settings
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.model.refresh_token import generate_token, hash_token
 from bigur.auth.store import store
 
 from bigur.auth.oauth2.context import Context
+from bigur.auth.oauth2.grant.implicit import OAuth2RSAJWT
 from bigur.auth.oauth2.request import OAuth2Request
 from bigur.auth.oauth2.response import OAuth2Response
+from bigur.auth.oauth2.token import (
+    ACCESS_TOKEN_EXPIRE_SECONDS,
+    ID_TOKEN_EXPIRE_SECONDS,
+)
+from bigur.auth.oidc.grant.implicit import IDToken, token_hash
 
 logger = getLogger(__name__)
 
@@ -57,15 +68,91 @@ class AccessTokenResponse(OAuth2Response):
     expires_in: Optional[int] = None
     refresh_token: Optional[str] = None
     scope: Optional[str] = None
+    id_token: Optional[str] = None
 
 
 async def authorization_code_grant(
         context: Context) -> AuthorizationCodeResponse:
+    request = context.oauth2_request
     access_code = await store.access_codes.create(
-        scopes=context.oauth2_request.scope)
+        scopes=request.scope,
+        client_id=context.client.id,
+        user_id=context.owner,
+        redirect_uri=request.redirect_uri,
+        nonce=getattr(request, 'nonce', None))
     return AuthorizationCodeResponse(
-        code=access_code.code, state=context.oauth2_request.state)
+        code=access_code.code, state=request.state)
+
+
+async def create_token_response(
+        user_id: str,
+        client_id: str,
+        scopes: List[str],
+        nonce: Optional[str] = None,
+        family: Optional[str] = None,
+        id_token_alg: Optional[str] = None,
+        refresh_scopes: Optional[List[str]] = None) -> AccessTokenResponse:
+    '''Issues access token and refresh token of `family` (new family if
+    not set). Refresh token is granted `refresh_scopes`, `scopes` if not
+    set. If `openid` scope is granted, ID token is issued too, signed
+    with `id_token_alg` (client's registered algorithm) if there is key
+    for it.'''
+    now = int(time())
+    key_jar = KeyJar.instance()
+    token = OAuth2RSAJWT(
+        sub=user_id,
+        scope=list(scopes),
+        iss=get_settings().issuer,
+        jti=uuid4().hex,
+        client_id=client_id,
+        iat=now,
+        exp=now + ACCESS_TOKEN_EXPIRE_SECONDS)
+    access_token = (await key_jar.sign(token.payload())).decode('ascii')
+
+    id_token = None
+    if 'openid' in scopes:
+        try:
+            signer = key_jar.get_signer(alg=id_token_alg)
+        except KeyError:
+            logger.warning('No %s key for ID token, using default',
+                           id_token_alg)
+            signer = key_jar.get_signer()
+        claims = IDToken(
+            iss=get_settings().issuer,
+            sub=user_id,
+            aud=client_id,
+            iat=now,
+            exp=now + ID_TOKEN_EXPIRE_SECONDS,
+            nonce=nonce,
+            at_hash=token_hash(access_token.encode('ascii'), signer.alg))
+        id_token = (await key_jar.sign(claims.payload(),
+                                       kid=signer.kid)).decode('ascii')
+
+    refresh_token = generate_token()
+    await store.refresh_tokens.create(
+        id=hash_token(refresh_token),
+        family=family or uuid4().hex,
+        user_id=user_id,
+        client_id=client_id,
+        scopes=scopes if refresh_scopes is None else refresh_scopes)
+
+    return AccessTokenResponse(
+        access_token=access_token,
+        token_type='Bearer',
+        expires_in=ACCESS_TOKEN_EXPIRE_SECONDS,
+        refresh_token=refresh_token,
+        scope=' '.join(scopes) or None,
+        id_token=id_token)
 
 
 async def get_token_by_code(context: Context) -> AccessTokenResponse:
-    return AccessTokenResponse()
+    '''Issues tokens for code, redeemed by
+    :func:`~bigur.auth.oauth2.validators.validate_code`.'''
+    access_code = context.access_code
+    assert access_code is not None, 'Code is not redeemed, validate it first!'
+    return await create_token_response(
+        access_code.user_id,
+        access_code.client_id,
+        access_code.scopes,
+        nonce=access_code.nonce,
+        id_token_alg=context.client.id_token_signed_response_alg)
@@ -4,12 +4,16 @@ __licence__ = 'For license information see LICENSE'
 
 from dataclasses import dataclass, field
 from logging import getLogger
+from time import time
 from typing import List, Optional, Set
+from uuid import uuid4
 
+from bigur.auth.config import get_settings
+from bigur.auth.key_jar import KeyJar
 from bigur.auth.oauth2.context import Context
 from bigur.auth.oauth2.request import OAuth2Request
 from bigur.auth.oauth2.response import OAuth2Response
-from bigur.auth.oauth2.token import RSAJWT
+from bigur.auth.oauth2.token import ACCESS_TOKEN_EXPIRE_SECONDS, RSAJWT
 
 logger = getLogger(__name__)
 
@@ -33,6 +37,11 @@ class OAuth2TokenResponse(OAuth2Response):
 class OAuth2RSAJWT(RSAJWT):
     sub: str
     scope: List[str]
+    iss: Optional[str] = None
+    jti: Optional[str] = None
+    client_id: Optional[str] = None
+    iat: Optional[int] = None
+    exp: Optional[int] = None
 
 
 async def implicit_grant(context: Context) -> OAuth2Response:
@@ -41,9 +50,19 @@ async def implicit_grant(context: Context) -> OAuth2Response:
     assert context.owner is not None, (
         'Resource owner is not set, do auth first!')
 
-    request.access_token = OAuth2RSAJWT(
-        sub=context.owner, scope=list(request.scope))
+    now = int(time())
+    token = OAuth2RSAJWT(
+        sub=context.owner,
+        scope=list(request.scope),
+        iss=get_settings().issuer,
+        jti=uuid4().hex,
+        client_id=request.client_id,
+        iat=now,
+        exp=now + ACCESS_TOKEN_EXPIRE_SECONDS)
+
+    # Encoded token is kept for at_hash of ID token
+    request.access_token = (await KeyJar.instance().sign(
+        token.payload())).decode('ascii')
 
-    return OAuth2TokenResponse(
-        access_token=request.access_token.encode(context.jwt_keys[0]),
-        state=request.state)
+    return OAuth2TokenResponse(access_token=request.access_token,
+                               state=request.state)
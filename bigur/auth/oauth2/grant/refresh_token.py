@@ -0,0 +1,55 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import Optional, Set
+
+from bigur.auth.oauth2.context import Context
+from bigur.auth.oauth2.grant.authorization_code import (
+    AccessTokenResponse,
+    create_token_response,
+)
+from bigur.auth.oauth2.request import OAuth2Request
+from bigur.auth.store import store
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class RefreshTokenRequest(OAuth2Request):
+    grant_type: Optional[str] = None
+    refresh_token: Optional[str] = None
+    scope: Set[str] = field(default_factory=set)
+    client_id: Optional[str] = None
+
+
+async def refresh_token_grant(context: Context) -> AccessTokenResponse:
+    '''Issues new tokens for refresh token, rotated by
+    :func:`~bigur.auth.oauth2.validators.validate_refresh_token`. New
+    refresh token belongs to the same family. Requested scope, checked
+    by validator, narrows scope of access token only: new refresh token
+    keeps originally granted scope (RFC 6749, section 6). If tokens
+    can't be issued, rotated token is released, so client can retry.'''
+    logger.debug('OAuth2 refresh token grant')
+    refresh_token = context.refresh_token
+    assert refresh_token is not None, (
+        'Refresh token is not rotated, validate it first!')
+
+    scopes = list(refresh_token.scopes)
+    requested = context.oauth2_request.scope
+    if requested:
+        scopes = [x for x in scopes if x in requested]
+
+    try:
+        return await create_token_response(
+            refresh_token.user_id,
+            refresh_token.client_id,
+            scopes,
+            family=refresh_token.family,
+            id_token_alg=context.client.id_token_signed_response_alg,
+            refresh_scopes=list(refresh_token.scopes))
+    except BaseException:
+        await store.refresh_tokens.release(refresh_token.id)
+        raise
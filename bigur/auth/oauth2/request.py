@@ -3,15 +3,62 @@ __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
 from dataclasses import dataclass, fields
-from typing import Set
+from typing import Dict, FrozenSet, Set, Type
+
+from multidict import MultiDict
+
+
+class RequestBinder:
+    '''Builds request object from HTTP parameters. Binder is created once
+    per request class (see :func:`get_binder`), so fields of class are
+    inspected only once.
+
+    :param request_class: dataclass of request'''
+
+    __slots__ = ('request_class', 'fields', 'set_fields')
+
+    def __init__(self, request_class: Type['OAuth2Request']):
+        self.request_class = request_class
+
+        #: Names of parameters accepted by request.
+        self.fields: FrozenSet[str] = frozenset(
+            x.name for x in fields(request_class) if x.init)
+
+        #: Names of space-delimited parameters, which are split into sets.
+        self.set_fields: FrozenSet[str] = frozenset(
+            x.name for x in fields(request_class) if x.type == Set[str])
+
+    def bind(self, params: MultiDict) -> 'OAuth2Request':
+        '''Returns request with parameters of request class from `params`,
+        unknown and empty parameters are dropped.'''
+        accepted = self.fields
+        set_fields = self.set_fields
+        kwargs = {}
+        for k, v in params.items():
+            if v and k in accepted:
+                if k in set_fields:
+                    v = {x for x in v.split() if x}
+                kwargs[k] = v
+        return self.request_class(**kwargs)
+
+
+_binders: Dict[type, RequestBinder] = {}
+
+
+def get_binder(request_class: Type['OAuth2Request']) -> RequestBinder:
+    '''Returns cached binder for `request_class`.'''
+    try:
+        return _binders[request_class]
+    except KeyError:
+        binder = _binders[request_class] = RequestBinder(request_class)
+        return binder
 
 
 @dataclass
 class OAuth2Request:
 
     def __post_init__(self):
-        keys = {x.name for x in fields(self) if x.type == Set[str]}
-        for key in keys:
+        for key in get_binder(type(self)).set_fields:
             value = getattr(self, key, None)
             if value is None:
                 setattr(self, key, set())
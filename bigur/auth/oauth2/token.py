@@ -3,18 +3,21 @@ __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
 from dataclasses import dataclass
-from hashlib import sha1
 from typing import Dict, List, Union
 
-from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
-from cryptography.hazmat.primitives.serialization import (Encoding,
-                                                          PrivateFormat,
-                                                          PublicFormat,
-                                                          NoEncryption)
-from jwt import encode as jwt_encode, decode as jwt_decode
-
+from bigur.auth.signer import PrivateKey, Signer
 from bigur.auth.utils import asdict
 
+#: Access token lifetime.
+ACCESS_TOKEN_EXPIRE_SECONDS = 60 * 60
+
+#: ID token lifetime.
+ID_TOKEN_EXPIRE_SECONDS = 60 * 10
+
+#: Longest lifetime of signed tokens, signing key is kept at least this
+#: time after it is replaced.
+MAX_TOKEN_LIFETIME = max(ACCESS_TOKEN_EXPIRE_SECONDS, ID_TOKEN_EXPIRE_SECONDS)
+
 
 @dataclass
 class Token:
@@ -36,28 +39,12 @@ class JWT(BearerToken):
 @dataclass
 class RSAJWT(JWT):
 
-    @classmethod
-    def decode(cls, private_key: RSAPrivateKey, token_bytes: str) -> str:
-        public_bytes = private_key.public_key().public_bytes(
-            encoding=Encoding.PEM, format=PublicFormat.SubjectPublicKeyInfo)
-        token = jwt_decode(
-            token_bytes, public_bytes, algorithms=['RS256'], verify=False)
-        return token['sub']
-
-    def encode(self, private_key: RSAPrivateKey) -> bytes:
-        private_bytes = private_key.private_bytes(
-            encoding=Encoding.PEM,
-            format=PrivateFormat.TraditionalOpenSSL,
-            encryption_algorithm=NoEncryption())
-
-        public_key = private_key.public_key()
-        numbers = public_key.public_numbers()
-        n = numbers.n.to_bytes(int(public_key.key_size / 8),
-                               'big').lstrip(b'\x00')
-
-        kid = sha1(n).hexdigest()
-
-        payload = self.payload()
+    def encode(self, key: Union[Signer, PrivateKey]) -> bytes:
+        '''Returns signed token.
 
-        return jwt_encode(
-            payload, private_bytes, algorithm='RS256', headers={'kid': kid})
+        :param key: :class:`~bigur.auth.signer.Signer` (e.g. from
+            :meth:`~bigur.auth.key_jar.KeyJar.get_signer`) or private key,
+            for which signer will be created on every call'''
+        if not isinstance(key, Signer):
+            key = Signer(key)
+        return key.sign(self.payload())
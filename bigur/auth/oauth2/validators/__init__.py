@@ -10,5 +10,6 @@ __licence__ = 'For license information see LICENSE'
 from .code import validate_code
 from .grant_type import validate_grant_type
 from .redirect_uri import validate_redirect_uri
+from .refresh_token import validate_refresh_token
 from .response_type import validate_response_type
 from .scope import validate_scope
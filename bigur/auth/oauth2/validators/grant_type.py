@@ -10,7 +10,7 @@ def validate_grant_type(context: Context) -> Context:
     grant_type = context.oauth2_request.grant_type
     if not grant_type:
         raise InvalidRequest('Parameter `grant_type\' required.')
-    if grant_type not in {'authorization_code'}:
+    if grant_type not in {'authorization_code', 'refresh_token'}:
         raise UnsupportedGrantType(
             'Grant type `{}\' is not supported.'.format(grant_type))
     return context
@@ -0,0 +1,37 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from bigur.auth.model.refresh_token import hash_token
+from bigur.auth.oauth2.context import Context
+from bigur.auth.oauth2.exceptions import (InvalidRequest, InvalidGrant,
+                                          InvalidScope)
+from bigur.auth.store import store
+
+
+async def validate_refresh_token(context: Context) -> Context:
+    token = context.oauth2_request.refresh_token
+    if not token:
+        raise InvalidRequest('Parameter `refresh_token\' required.')
+
+    token_id = hash_token(token)
+    requested = context.oauth2_request.scope
+    if requested:
+        # Checked before rotation, so request with invalid scope does not
+        # use up the token (RFC 6749, sec. 6)
+        try:
+            stored = await store.refresh_tokens.get(token_id)
+        except KeyError as e:
+            raise InvalidGrant('Invalid refresh token provided.') from e
+        if not requested.issubset(stored.scopes):
+            raise InvalidScope('Requested scope exceeds granted scope.')
+
+    try:
+        context.refresh_token = await store.refresh_tokens.rotate(
+            token_id, context.client.id)
+    except KeyError as e:
+        raise InvalidGrant('Invalid refresh token provided.') from e
+    except ValueError as e:
+        raise InvalidGrant(str(e)) from e
+
+    return context
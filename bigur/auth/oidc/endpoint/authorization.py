@@ -2,12 +2,10 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
+from asyncio import gather
 from dataclasses import asdict, dataclass
 from logging import getLogger
-from typing import Any, Dict, List
-
-from rx import Observable, just, from_list
-from rx import operators as op
+from typing import Any, Awaitable, Dict, List
 
 from bigur.auth.oauth2.grant import (
     authorization_code_grant as oauth2_authorization_code_grant,
@@ -15,6 +13,7 @@ from bigur.auth.oauth2.grant import (
 )
 from bigur.auth.oauth2.grant.implicit import OAuth2TokenResponse
 from bigur.auth.oauth2.exceptions import InvalidRequest
+from bigur.auth.oauth2.response import OAuth2Response
 from bigur.auth.oauth2.validators import (
     validate_redirect_uri,)
 from bigur.auth.oidc.grant import implicit_grant
@@ -24,47 +23,55 @@ from bigur.auth.oidc.validators import (
     validate_response_type,
     validate_scope,
 )
-
-from bigur.auth.utils import call_async
+from bigur.auth.pipeline import Pipeline
 
 logger = getLogger(__name__)
 
+FLOWS = {
+    'code': oauth2_authorization_code_grant,
+    'token': oauth2_implicit_grant,
+}
+
 
 @dataclass
 class AuthorizationResponse(IDTokenResponse, OAuth2TokenResponse):
     pass
 
 
-def select_flows(request: OIDCRequest) -> Observable:
-    observables: List[Observable] = []
-    for response_type in sorted(
-            request.response_type, key=lambda x: x == 'id_token' and 1 or 0):
-        if response_type == 'code':
-            observables.append(
-                just(request).pipe(
-                    op.flat_map(call_async(oauth2_authorization_code_grant))))
-        elif response_type == 'token':
-            observables.append(
-                just(request).pipe(
-                    op.flat_map(call_async(oauth2_implicit_grant))))
-        elif response_type == 'id_token':
-            observables.append(
-                just(request).pipe(op.flat_map(call_async(implicit_grant))))
+async def select_flows(request: OIDCRequest) -> AuthorizationResponse:
+    '''Runs flows for all response types. OAuth2 flows are independent
+    and run concurrently, ID token is issued after them, because it
+    may contain hash of access token.'''
+    flows: List[Awaitable[OAuth2Response]] = []
+    id_token = False
+    for response_type in request.response_type:
+        if response_type == 'id_token':
+            id_token = True
+        elif response_type in FLOWS:
+            flows.append(FLOWS[response_type](request))
         else:
+            for flow in flows:
+                flow.close()
             raise InvalidRequest('Invalid response_type parameter')
-    return from_list(observables)
 
+    responses = list(await gather(*flows)) if flows else []
+    if id_token:
+        responses.append(await implicit_grant(request))
 
-def get_authorization_stream(request: OIDCRequest) -> Observable:
     response_params: Dict[str, Any] = {}
+    for response in responses:
+        response_params.update(asdict(response))
+    return AuthorizationResponse(**response_params)
+
+
+authorization_pipeline = Pipeline(
+    validate_redirect_uri,
+    validate_response_type,
+    validate_scope,
+    select_flows,
+)
+
 
-    # yapf: disable
-    return just(request).pipe(
-        op.flat_map(call_async(validate_redirect_uri)),
-        op.flat_map(call_async(validate_response_type)),
-        op.flat_map(call_async(validate_scope)),
-        op.flat_map(select_flows),
-        op.merge_all(),
-        op.do_action(lambda x: response_params.update(asdict(x))),
-        op.last(),
-        op.map(lambda x: AuthorizationResponse(**response_params)))
+def get_authorization_stream(
+        request: OIDCRequest) -> Awaitable[AuthorizationResponse]:
+    return authorization_pipeline(request)
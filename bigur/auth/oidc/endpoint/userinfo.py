@@ -3,9 +3,7 @@ __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
 from dataclasses import dataclass
-
-from rx import Observable, just
-from rx import operators as op
+from typing import Awaitable
 
 from bigur.auth.oauth2.request import OAuth2Request
 from bigur.auth.oauth2.response import OAuth2Response
@@ -21,7 +19,8 @@ class UserInfoResponse(OAuth2Response):
     sub: str
 
 
-def get_user_info_stream(request: UserInfoRequest) -> Observable:
+def get_user_info_stream(
+        request: UserInfoRequest) -> Awaitable[UserInfoResponse]:
     pass
 
 
@@ -4,15 +4,16 @@ __licence__ = 'For license information see LICENSE'
 
 from base64 import urlsafe_b64encode
 from dataclasses import asdict, dataclass
-from hashlib import sha256
+from hashlib import sha256, sha512
 from logging import getLogger
 from pprint import pformat
 from time import time
 from typing import Optional
 
+from bigur.auth.key_jar import KeyJar
 from bigur.auth.oauth2.request import OAuth2Request
 from bigur.auth.oauth2.response import OAuth2Response
-from bigur.auth.oauth2.token import RSAJWT
+from bigur.auth.oauth2.token import ID_TOKEN_EXPIRE_SECONDS, RSAJWT
 
 logger = getLogger(__name__)
 
@@ -27,6 +28,14 @@ class IDTokenResponse(OAuth2Response):
         return 'fragment'
 
 
+def token_hash(token: bytes, alg: str) -> str:
+    '''Returns `at_hash` of `token` for ID token signed with `alg`: left
+    half of SHA-256 digest, of SHA-512 digest for EdDSA.'''
+    digest = (sha512 if alg == 'EdDSA' else sha256)(token).digest()
+    return urlsafe_b64encode(
+        digest[:len(digest) // 2]).decode('ascii').rstrip('=')
+
+
 @dataclass
 class IDToken(RSAJWT):
     iss: str
@@ -49,14 +58,18 @@ async def implicit_grant(request: OAuth2Request) -> IDTokenResponse:
         aud=str(request.client_id),
         nonce=request.nonce,
         iat=int(time()),
-        exp=int(time()) + 600)
+        exp=int(time()) + ID_TOKEN_EXPIRE_SECONDS)
+
+    key_jar = KeyJar.instance()
+    signer = key_jar.get_signer()
 
+    # Hash of access token, encoded and returned by OAuth2 implicit grant
     if request.access_token is not None:
-        encoded_token = request.access_token.encode(request.jwt_keys[0])
-        token.at_hash = urlsafe_b64encode(
-            sha256(encoded_token).digest()[:16]).decode('utf-8').rstrip('=')
+        token.at_hash = token_hash(request.access_token.encode('ascii'),
+                                   signer.alg)
 
     logger.debug('Token payload:\n%s', pformat(asdict(token)))
 
     return IDTokenResponse(
-        id_token=token.encode(request.jwt_keys[0]), state=request.state)
+        id_token=await key_jar.sign(token.payload(), kid=signer.kid),
+        state=request.state)
@@ -0,0 +1,258 @@
+'''Password hashing. Hashers are pluggable: hash string stored in
+:attr:`~bigur.auth.model.base.PasswordMixin.crypt` starts with hasher
+name and its parameters, e.g. `scrypt$n=16384,r=8,p=1$...`, so
+passwords hashed with old hasher or parameters still can be verified
+and are upgraded on successful login. Hashes without prefix are
+legacy salted SHA-512.'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Business group for development management'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import Semaphore, get_running_loop
+from base64 import b64decode, b64encode
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import scrypt, sha512
+from hmac import compare_digest
+from logging import getLogger
+from os import cpu_count
+from typing import Any, Dict, Optional, Tuple, Type
+
+try:
+    from argon2.low_level import Type as Argon2Type, hash_secret_raw
+except ImportError:  # pragma: no cover
+    hash_secret_raw = None
+
+logger = getLogger(__name__)
+
+
+class Hasher:
+    '''Base class for password hashers.'''
+
+    #: Name of hasher, prefix of hash string.
+    name: str
+
+    def __init__(self, **params):
+        self.params: Dict[str, int] = params
+
+    @property
+    def prefix(self) -> str:
+        return '{}${}$'.format(
+            self.name,
+            ','.join('{}={}'.format(k, v) for k, v in self.params.items()))
+
+    @classmethod
+    def parse(cls, crypt: str) -> Tuple[str, Dict[str, int], str]:
+        '''Returns hasher's name, parameters and hash from hash string.'''
+        name, params, value = crypt.split('$', 2)
+        pairs = (x.split('=') for x in params.split(',') if x)
+        return name, {k: int(v) for k, v in pairs}, value
+
+    def derive(self, password: str, salt: str, **params) -> bytes:
+        raise NotImplementedError
+
+    def hash(self, password: str, salt: str) -> str:
+        '''Returns hash string with current parameters.'''
+        return self.prefix + b64encode(
+            self.derive(password, salt, **self.params)).decode('ascii')
+
+    def verify(self, password: str, salt: str, crypt: str) -> bool:
+        '''Verifies `password` against `crypt`, created by this hasher with
+        any parameters.'''
+        _, params, value = self.parse(crypt)
+        return compare_digest(
+            self.derive(password, salt, **params), b64decode(value))
+
+    def needs_update(self, crypt: str) -> bool:
+        '''Returns `True` if `crypt` was created by another hasher or
+        with other parameters.'''
+        return not crypt.startswith(self.prefix)
+
+
+class SHA512Hasher(Hasher):
+    '''Legacy single round salted SHA-512. Use it only for verifying
+    old hashes.'''
+
+    name = 'sha512'
+
+    @property
+    def prefix(self) -> str:
+        return ''
+
+    def hash(self, password: str, salt: str) -> str:
+        return sha512((password + salt).encode('utf-8')).hexdigest()
+
+    def verify(self, password: str, salt: str, crypt: str) -> bool:
+        return compare_digest(crypt, self.hash(password, salt))
+
+    def needs_update(self, crypt: str) -> bool:
+        return '$' in crypt
+
+
+class ScryptHasher(Hasher):
+    '''Memory-hard scrypt from :mod:`hashlib`.
+
+    :param int n: CPU/memory cost
+    :param int r: block size
+    :param int p: parallelization'''
+
+    name = 'scrypt'
+
+    def __init__(self, n: int = 2**14, r: int = 8, p: int = 1):
+        super().__init__(n=n, r=r, p=p)
+
+    def derive(self, password: str, salt: str, **params) -> bytes:
+        return scrypt(
+            password.encode('utf-8'),
+            salt=salt.encode('utf-8'),
+            maxmem=256 * params['n'] * params['r'],
+            dklen=32,
+            **params)
+
+
+class Argon2Hasher(Hasher):
+    '''Argon2id, requires `argon2-cffi` package.
+
+    :param int t: time cost
+    :param int m: memory cost in KiB
+    :param int p: parallelism'''
+
+    name = 'argon2id'
+
+    def __init__(self, t: int = 2, m: int = 65536, p: int = 2):
+        if hash_secret_raw is None:
+            raise ImportError('argon2-cffi package required for argon2')
+        super().__init__(t=t, m=m, p=p)
+
+    def derive(self, password: str, salt: str, **params) -> bytes:
+        return hash_secret_raw(
+            password.encode('utf-8'),
+            salt.encode('utf-8'),
+            time_cost=params['t'],
+            memory_cost=params['m'],
+            parallelism=params['p'],
+            hash_len=32,
+            type=Argon2Type.ID)
+
+
+HASHERS: Dict[str, Type[Hasher]] = {
+    SHA512Hasher.name: SHA512Hasher,
+    ScryptHasher.name: ScryptHasher,
+    Argon2Hasher.name: Argon2Hasher,
+    'argon2': Argon2Hasher,
+}
+
+_hasher: Hasher = ScryptHasher()
+_verifiers: Dict[str, Hasher] = {SHA512Hasher.name: SHA512Hasher()}
+
+
+def get_hasher() -> Hasher:
+    '''Returns hasher used for new passwords.'''
+    return _hasher
+
+
+def set_hasher(name: str, **params) -> Hasher:
+    '''Set hasher for new passwords.
+
+    :param str name: `scrypt`, `argon2` or `sha512`
+    :param params: hasher parameters'''
+    global _hasher  # pylint: disable=global-statement
+    _hasher = HASHERS[name](**params)
+    return _hasher
+
+
+def verify(password: str, salt: str, crypt: str) -> bool:
+    '''Verifies password with hasher, which created `crypt`. Returns
+    `False` if that hasher is unknown or not installed.'''
+    name = crypt.split('$', 1)[0] if '$' in crypt else SHA512Hasher.name
+    try:
+        hasher = _verifiers[name]
+    except KeyError:
+        try:
+            hasher = _verifiers[name] = HASHERS[name]()
+        except KeyError:
+            logger.error('Unknown password hasher %s', name)
+            return False
+        except ImportError as exc:
+            logger.error('Password hasher %s is not available: %s', name,
+                         exc)
+            return False
+    return hasher.verify(password, salt, crypt)
+
+
+class PasswordVerifier:
+    '''Runs password hashing in bounded thread pool, so event loop is
+    not blocked.
+
+    :param int workers: number of threads, default is number of CPUs
+    :param int concurrency: maximum of concurrent verifications, rest
+        are waiting'''
+
+    def __init__(self,
+                 workers: Optional[int] = None,
+                 concurrency: Optional[int] = None):
+        self.workers = workers or cpu_count() or 1
+        self.concurrency = concurrency or self.workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix='password')
+        self._semaphore: Optional[Semaphore] = None
+
+    async def run(self, func, *args) -> Any:
+        if self._semaphore is None:
+            self._semaphore = Semaphore(self.concurrency)
+        async with self._semaphore:
+            return await get_running_loop().run_in_executor(
+                self._executor, func, *args)
+
+    async def verify(self, obj, password: str, collection=None) -> bool:
+        '''Verifies password of `obj` (see
+        :class:`~bigur.auth.model.base.PasswordMixin`). If password is
+        correct, but hashed with old hasher, it is rehashed and `obj` is
+        saved into `collection`.'''
+        if not await self.run(obj.verify_password, password):
+            return False
+        if obj.needs_rehash():
+            logger.debug('Upgrading password hash for %s', obj.id)
+            await self.run(obj.set_password, password)
+            if collection is not None:
+                await collection.put(obj)
+        return True
+
+    async def set_password(self, obj, password: Optional[str]) -> None:
+        await self.run(obj.set_password, password)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+_verifier: Optional[PasswordVerifier] = None
+
+
+def get_verifier() -> PasswordVerifier:
+    global _verifier  # pylint: disable=global-statement
+    if _verifier is None:
+        _verifier = PasswordVerifier()
+    return _verifier
+
+
+def configure(hasher: str = ScryptHasher.name,
+              params: Optional[Dict[str, int]] = None,
+              workers: Optional[int] = None,
+              concurrency: Optional[int] = None) -> None:
+    '''Configure hashing from `authn.password` configuration section.'''
+    global _verifier  # pylint: disable=global-statement
+    set_hasher(hasher, **(params or {}))
+    if _verifier is not None:
+        _verifier.close()
+    _verifier = PasswordVerifier(workers=workers, concurrency=concurrency)
+
+
+async def verify_password(obj, password: str, collection=None) -> bool:
+    '''Verifies password in thread pool, see
+    :meth:`PasswordVerifier.verify`.'''
+    return await get_verifier().verify(obj, password, collection)
+
+
+async def set_password(obj, password: Optional[str]) -> None:
+    '''Sets password in thread pool.'''
+    await get_verifier().set_password(obj, password)
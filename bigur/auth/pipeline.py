@@ -0,0 +1,40 @@
+'''Request processing pipelines. Pipeline is a sequence of stages,
+built once per endpoint: each stage gets result of the previous one.'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import iscoroutinefunction
+from typing import Any, Awaitable, Callable, Tuple, Union
+
+Stage = Callable[[Any], Union[Any, Awaitable[Any]]]
+
+
+class Pipeline:
+    '''Runs stages one by one with plain `await`, without creating
+    tasks. Coroutine functions are awaited, other functions are called.
+    Exception raised by stage stops pipeline and is propagated to
+    caller.
+
+    :param stages: functions to call'''
+
+    __slots__ = ('stages', '_steps')
+
+    def __init__(self, *stages: Stage):
+        self.stages: Tuple[Stage, ...] = stages
+        self._steps: Tuple[Tuple[Stage, bool], ...] = tuple(
+            (x, iscoroutinefunction(x)) for x in stages)
+
+    def __repr__(self) -> str:
+        return '<{}({})>'.format(
+            type(self).__name__,
+            ', '.join(getattr(x, '__name__', repr(x)) for x in self.stages))
+
+    async def __call__(self, value: Any) -> Any:
+        for stage, is_async in self._steps:
+            if is_async:
+                value = await stage(value)
+            else:
+                value = stage(value)
+        return value
@@ -0,0 +1,339 @@
+'''Revoked access tokens. Access tokens are self-contained JWTs, so
+revocation is a list of their ids (`jti`), checked on every
+verification. Revoked id is needed only until token expires, so ids
+are kept in hash sets partitioned by token expiration time: whole
+partition is dropped when its tokens expire, and memory is proportional
+to number of live revocations.
+
+List is kept in process memory. Worker processes share revocations
+through SQLite database: every process writes its revocations to the
+database and reads ones of other processes periodically, lookups are
+done in memory.'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import CancelledError, Task, create_task, get_running_loop, sleep
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+from heapq import heappop, heappush
+from logging import getLogger
+from math import ceil, log
+from sqlite3 import Connection, Error as SQLiteError, connect
+from time import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+logger = getLogger(__name__)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS revocations ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+    ' jti TEXT NOT NULL,'
+    ' exp REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS revocations_exp ON revocations (exp)',
+)
+
+
+class BloomFilter:
+    '''Set membership test without false negatives and with
+    `error_rate` of false positives, while it holds at most `capacity`
+    keys. Keys can't be removed, filter is rebuilt instead.
+
+    :param int capacity: expected number of keys
+    :param float error_rate: probability of false positive'''
+
+    __slots__ = ('capacity', 'size', 'hashes', 'count', '_bits')
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.size = max(64, ceil(-capacity * log(error_rate) / log(2)**2))
+        self.hashes = max(1, round(self.size / capacity * log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> Iterator[int]:
+        digest = blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        size = self.size
+        return ((first + i * second) % size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        bits = self._bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        for position in self._positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class RevocationList:
+    '''Ids of revoked tokens in hash sets (buckets), each holds ids of
+    tokens expiring in the same `bucket_width` seconds. Token's `exp`
+    claim selects bucket, so lookup is one dict and one set lookup.
+    Expired buckets are dropped while processing calls, without
+    background task.
+
+    Optional Bloom filter in front of buckets answers for most of not
+    revoked tokens without touching buckets. In memory sets are as fast
+    as the filter, so it is off by default.
+
+    :param float bucket_width: seconds of expiration time per bucket
+    :param bool bloom: use Bloom filter
+    :param int capacity: initial capacity of Bloom filter, it is rebuilt
+        with larger capacity when filled
+    :param float error_rate: false positive rate of Bloom filter
+    :param str path: SQLite database shared with other processes, list
+        is not shared if not set
+    :param float sync_interval: seconds between exchanges of revocations
+        with database, revocation made by other process is seen after
+        this delay'''
+
+    def __init__(self,
+                 bucket_width: float = 60.0,
+                 bloom: bool = False,
+                 capacity: int = 1024,
+                 error_rate: float = 0.001,
+                 path: Optional[str] = None,
+                 sync_interval: float = 1.0):
+        self.bucket_width = bucket_width
+        self.bloom = bloom
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.path = path
+        self.sync_interval = sync_interval
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._db: Optional[Connection] = None
+        self._syncer: Optional[Task] = None
+        self.clear()
+
+    def configure(self,
+                  bucket_width: Optional[float] = None,
+                  bloom: Optional[bool] = None,
+                  capacity: Optional[int] = None,
+                  error_rate: Optional[float] = None,
+                  path: Optional[str] = None,
+                  sync_interval: Optional[float] = None) -> None:
+        '''Set parameters from `oauth2.revocation` configuration section,
+        list is cleared.'''
+        if bucket_width is not None:
+            self.bucket_width = bucket_width
+        if bloom is not None:
+            self.bloom = bloom
+        if capacity is not None:
+            self.capacity = capacity
+        if error_rate is not None:
+            self.error_rate = error_rate
+        if path is not None:
+            self.path = path
+        if sync_interval is not None:
+            self.sync_interval = sync_interval
+        self.clear()
+
+    def clear(self) -> None:
+        self._buckets: Dict[int, Set[str]] = {}
+        self._expiry: List[int] = []
+        self._filter: Optional[BloomFilter] = None
+        self._live = 0
+        self._next_reap = float('inf')
+        self._reaped = 0
+        # Revocations not written to database yet and id of last read
+        # database row
+        self._pending: List[Tuple[str, float]] = []
+        self._last_id = 0
+        if self.bloom:
+            self._filter = BloomFilter(self.capacity, self.error_rate)
+
+    def __len__(self) -> int:
+        return self._live
+
+    def revoke(self, jti: str, exp: float,
+               now: Optional[float] = None) -> bool:
+        '''Revoke token with id `jti`, expiring at `exp`. Returns `False`
+        if token is already expired, so there is nothing to revoke.'''
+        if now is None:
+            now = time()
+        if exp <= now:
+            return False
+        if self._add(jti, exp) and self.path is not None:
+            self._pending.append((jti, exp))
+        return True
+
+    def _add(self, jti: str, exp: float) -> bool:
+        # Returns False if id is already in list
+        number = int(exp // self.bucket_width)
+        bucket = self._buckets.get(number)
+        if bucket is None:
+            bucket = self._buckets[number] = set()
+            heappush(self._expiry, number)
+            self._next_reap = self._bucket_end(self._expiry[0])
+        elif jti in bucket:
+            return False
+        bucket.add(jti)
+        self._live += 1
+
+        bloom = self._filter
+        if bloom is not None:
+            if bloom.count >= bloom.capacity:
+                self._rebuild_filter()
+            else:
+                bloom.add(jti)
+        return True
+
+    def is_revoked(self,
+                   jti: Optional[str],
+                   exp: Optional[float],
+                   now: Optional[float] = None) -> bool:
+        '''Returns `True` if token with id `jti` and expiration time
+        `exp` is revoked.'''
+        if not self._live or jti is None or exp is None:
+            return False
+        if now is None:
+            now = time()
+        if now >= self._next_reap:
+            self.reap(now)
+        bloom = self._filter
+        if bloom is not None and jti not in bloom:
+            return False
+        bucket = self._buckets.get(int(exp // self.bucket_width))
+        return bucket is not None and jti in bucket
+
+    def reap(self, now: Optional[float] = None) -> int:
+        '''Drop buckets of expired tokens.
+
+        :returns: number of dropped ids'''
+        if now is None:
+            now = time()
+        expiry = self._expiry
+        count = 0
+        while expiry and self._bucket_end(expiry[0]) <= now:
+            count += len(self._buckets.pop(heappop(expiry)))
+        self._next_reap = (self._bucket_end(expiry[0])
+                           if expiry else float('inf'))
+        if count:
+            self._live -= count
+            self._reaped += count
+            if self._filter is not None:
+                self._rebuild_filter()
+            logger.debug('Dropped %d expired revocations', count)
+        return count
+
+    def _bucket_end(self, number: int) -> float:
+        # Bucket is dropped when its latest token expires
+        return (number + 1) * self.bucket_width
+
+    def _rebuild_filter(self) -> None:
+        bloom = BloomFilter(max(self.capacity, self._live * 2),
+                            self.error_rate)
+        for bucket in self._buckets.values():
+            for jti in bucket:
+                bloom.add(jti)
+        self._filter = bloom
+
+    def stats(self) -> Dict[str, int]:
+        '''Returns number of `live` revocations, number of `buckets` and
+        total number of ids `reaped` after tokens expired.'''
+        return {
+            'live': self._live,
+            'buckets': len(self._buckets),
+            'reaped': self._reaped
+        }
+
+    def _connect(self) -> Connection:
+        if self._db is None:
+            logger.debug('Opening revocations database %s', self.path)
+            self._db = connect(self.path, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            for statement in SCHEMA:
+                self._db.execute(statement)
+        return self._db
+
+    def _close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _exchange(self, pending: List[Tuple[str, float]], last_id: int,
+                  now: float) -> List[Tuple[int, str, float]]:
+        db = self._connect()
+        db.execute('BEGIN')
+        try:
+            db.executemany('INSERT INTO revocations (jti, exp) VALUES (?, ?)',
+                           pending)
+            db.execute('DELETE FROM revocations WHERE exp <= ?', (now,))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return db.execute(
+            'SELECT id, jti, exp FROM revocations WHERE id > ?'
+            ' ORDER BY id', (last_id,)).fetchall()
+
+    async def sync(self) -> int:
+        '''Writes revocations of this process to database and reads ones
+        made by other processes.
+
+        :returns: number of read revocations, which were not in list'''
+        pending, self._pending = self._pending, []
+        try:
+            rows = await get_running_loop().run_in_executor(
+                self._executor, self._exchange, pending, self._last_id,
+                time())
+        except BaseException:
+            self._pending[:0] = pending
+            raise
+        count = 0
+        now = time()
+        for row_id, jti, exp in rows:
+            self._last_id = row_id
+            if exp > now and self._add(jti, exp):
+                count += 1
+        if count:
+            logger.debug('Read %d revocations, stats: %s', count,
+                         self.stats())
+        return count
+
+    async def syncer(self) -> None:
+        while True:
+            await sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except SQLiteError as e:
+                logger.error('Error while syncing revocations: %s', e)
+
+    async def start(self) -> None:
+        '''Called on application startup, loads revocations from database
+        and starts their periodical exchange, if list is shared.'''
+        if self.path is not None and self._syncer is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='revocations')
+            await self.sync()
+            self._syncer = create_task(self.syncer())
+
+    async def stop(self) -> None:
+        '''Called on application shutdown, writes pending revocations.'''
+        if self._syncer is not None:
+            self._syncer.cancel()
+            try:
+                await self._syncer
+            except CancelledError:
+                pass
+            self._syncer = None
+            try:
+                await self.sync()
+            finally:
+                await get_running_loop().run_in_executor(
+                    self._executor, self._close)
+                self._executor.shutdown()
+                self._executor = None
+
+
+#: Revoked tokens, checked by verifier of
+#: :class:`~bigur.auth.key_jar.KeyJar`.
+revoked_tokens = RevocationList()
@@ -0,0 +1,15 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+# flake8: noqa
+
+from bigur.auth.store import DatabaseProxy
+
+from .abc import SessionStore
+from .memory import MemorySessionStore
+from .model import Session
+from .sqlite import SQLiteSessionStore
+
+#: Application's session store, set with :meth:`set_store`.
+sessions = DatabaseProxy()
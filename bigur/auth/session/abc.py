@@ -0,0 +1,106 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from abc import ABC, abstractmethod
+from asyncio import CancelledError, Task, create_task, sleep
+from logging import getLogger
+from typing import Callable, Dict, List, Optional
+
+from bigur.auth.session.model import Session
+
+logger = getLogger(__name__)
+
+#: Functions called with user id after sessions of user are revoked,
+#: e.g. to drop cached authentication of user.
+revoke_callbacks: List[Callable[[str], None]] = []
+
+
+class SessionStore(ABC):
+    '''Session store. Expired sessions are not returned by :meth:`get`
+    and are removed by :meth:`reap`, which is called periodically by
+    background task, started with :meth:`start`.
+
+    :param float ttl: seconds session lives
+    :param bool sliding: prolong session on every access
+    :param float reap_interval: seconds between removing of expired
+        sessions
+    :param int reap_batch: maximum of sessions removed at once, before
+        giving control back to event loop'''
+
+    def __init__(self,
+                 ttl: float = 86400,
+                 sliding: bool = True,
+                 reap_interval: float = 1.0,
+                 reap_batch: int = 1000):
+        self.ttl = ttl
+        self.sliding = sliding
+        self.reap_interval = reap_interval
+        self.reap_batch = reap_batch
+        self._reaper: Optional[Task] = None
+
+    @abstractmethod
+    async def get(self, sid: str) -> Optional[Session]:
+        '''Returns active session or `None` if session not found or
+        expired.'''
+        raise NotImplementedError
+
+    @abstractmethod
+    async def put(self, session: Session) -> Session:
+        '''Saves session. New session expires after :attr:`ttl`.'''
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, sid: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def revoke(self, user_id: str) -> int:
+        '''Deletes all sessions of user, returns number of deleted
+        sessions. Implementations call :meth:`revoked` after that.'''
+        raise NotImplementedError
+
+    def revoked(self, user_id: str) -> None:
+        '''Calls :data:`revoke_callbacks` for user.'''
+        for callback in revoke_callbacks:
+            callback(user_id)
+
+    @abstractmethod
+    async def reap(self, limit: int = 1000,
+                   now: Optional[float] = None) -> int:
+        '''Removes at most `limit` expired sessions, returns number of
+        removed sessions.'''
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+    async def reaper(self) -> None:
+        while True:
+            try:
+                count = await self.reap(self.reap_batch)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error('Error while reaping sessions: %s', e)
+                count = 0
+            if count:
+                logger.debug('Reaped %d sessions, stats: %s', count,
+                             self.stats())
+            if count < self.reap_batch:
+                await sleep(self.reap_interval)
+            else:
+                await sleep(0)
+
+    async def start(self) -> None:
+        '''Called on application startup, starts reaper.'''
+        if self._reaper is None:
+            self._reaper = create_task(self.reaper())
+
+    async def stop(self) -> None:
+        '''Called on application shutdown, stops reaper.'''
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except CancelledError:
+                pass
+            self._reaper = None
@@ -0,0 +1,128 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from collections import OrderedDict
+from time import time
+from typing import Dict, Optional, Set
+
+from bigur.auth.session.abc import SessionStore
+from bigur.auth.session.model import Session
+
+
+class MemorySessionStore(SessionStore):
+    '''Sessions in memory. Sessions are kept ordered by expiration time:
+    all sessions live the same :attr:`ttl`, so session is moved to the
+    end when it is prolonged. Lookup, prolongation, eviction and reaping
+    of each session cost O(1).
+
+    :param int maxsize: maximum number of sessions, session which
+        expires first is evicted (with sliding expiration it is least
+        recently used session)
+
+    See :class:`~bigur.auth.session.abc.SessionStore` for the rest of
+    parameters.'''
+
+    def __init__(self, maxsize: int = 100000, **kwargs):
+        super().__init__(**kwargs)
+        self.maxsize = maxsize
+        self._sessions: 'OrderedDict[str, Session]' = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        self._users: Dict[str, str] = {}
+        self._reaped = 0
+        self._evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _index(self, session: Session) -> None:
+        # Session can be changed in place, so indexed user id is kept
+        user_id = self._users.get(session.sid)
+        if user_id == session.user_id:
+            return
+        if user_id is not None:
+            self._unindex(session.sid)
+        if session.user_id is not None:
+            self._users[session.sid] = session.user_id
+            self._by_user.setdefault(session.user_id, set()).add(session.sid)
+
+    def _unindex(self, sid: str) -> None:
+        user_id = self._users.pop(sid, None)
+        if user_id is not None:
+            sids = self._by_user[user_id]
+            sids.discard(sid)
+            if not sids:
+                del self._by_user[user_id]
+
+    def _remove(self, sid: str) -> None:
+        del self._sessions[sid]
+        self._unindex(sid)
+
+    async def get(self, sid: str) -> Optional[Session]:
+        session = self._sessions.get(sid)
+        if session is None:
+            return None
+        now = time()
+        if session.expires <= now:
+            self._remove(sid)
+            return None
+        if self.sliding:
+            session.expires = now + self.ttl
+            self._sessions.move_to_end(sid)
+        return session
+
+    async def put(self, session: Session) -> Session:
+        now = time()
+        old = self._sessions.get(session.sid)
+        if old is None or self.sliding:
+            session.expires = now + self.ttl
+        else:
+            session.expires = old.expires
+        self._sessions[session.sid] = session
+        if old is None or self.sliding:
+            self._sessions.move_to_end(session.sid)
+        self._index(session)
+        session.modified = False
+
+        while len(self._sessions) > self.maxsize:
+            sid, _ = self._sessions.popitem(last=False)
+            self._unindex(sid)
+            self._evicted += 1
+        return session
+
+    async def delete(self, sid: str) -> None:
+        if sid in self._sessions:
+            self._remove(sid)
+
+    async def revoke(self, user_id: str) -> int:
+        sids = self._by_user.pop(user_id, set())
+        for sid in sids:
+            del self._sessions[sid]
+            del self._users[sid]
+        self.revoked(user_id)
+        return len(sids)
+
+    async def reap(self, limit: int = 1000,
+                   now: Optional[float] = None) -> int:
+        if now is None:
+            now = time()
+        sessions = self._sessions
+        count = 0
+        while sessions and count < limit:
+            session = next(iter(sessions.values()))
+            if session.expires > now:
+                break
+            self._remove(session.sid)
+            count += 1
+        self._reaped += count
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        '''Returns store counters: `live` is number of sessions held,
+        `reaped` and `evicted` are total numbers of expired and evicted
+        sessions.'''
+        return {
+            'live': len(self._sessions),
+            'reaped': self._reaped,
+            'evicted': self._evicted
+        }
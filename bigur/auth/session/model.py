@@ -0,0 +1,34 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from dataclasses import dataclass, field
+from time import time
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+
+@dataclass
+class Session:
+    '''User agent's session, identified by `sid` cookie.'''
+
+    #: Session id.
+    sid: str = field(default_factory=lambda: uuid4().hex)
+
+    #: Id of authenticated user.
+    user_id: Optional[str] = None
+
+    #: Arbitrary JSON serializable session data.
+    data: Dict[str, Any] = field(default_factory=dict)
+
+    #: Timestamp when session created.
+    created: float = field(default_factory=time)
+
+    #: Timestamp after which session is expired, set by store.
+    expires: float = 0.0
+
+    #: True if session must be saved at the end of request.
+    modified: bool = field(default=False, compare=False, repr=False)
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        return self.expires <= (time() if now is None else now)
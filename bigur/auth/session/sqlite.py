@@ -0,0 +1,159 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from json import dumps, loads
+from logging import getLogger
+from sqlite3 import Connection, connect
+from time import time
+from typing import Any, Dict, Optional
+
+from bigur.auth.session.abc import SessionStore
+from bigur.auth.session.model import Session
+
+logger = getLogger(__name__)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS sessions ('
+    ' sid TEXT PRIMARY KEY,'
+    ' user_id TEXT,'
+    ' data TEXT NOT NULL,'
+    ' created REAL NOT NULL,'
+    ' expires REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)',
+    'CREATE INDEX IF NOT EXISTS sessions_user_id ON sessions (user_id)',
+)
+
+
+class SQLiteSessionStore(SessionStore):
+    '''Sessions in SQLite database, survive restart of server. Queries
+    are run in dedicated thread, so event loop is not blocked by disk
+    I/O. Lookup is done by primary key.
+
+    :param str path: database file
+    :param float touch_interval: with sliding expiration, session's
+        expiration time is written only if it moves more than this
+        number of seconds, so not every request writes to disk
+
+    See :class:`~bigur.auth.session.abc.SessionStore` for the rest of
+    parameters.'''
+
+    def __init__(self,
+                 path: str = 'sessions.sqlite',
+                 touch_interval: float = 60,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.touch_interval = touch_interval
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='sessions')
+        self._db: Optional[Connection] = None
+        self._reaped = 0
+
+    def _connect(self) -> Connection:
+        if self._db is None:
+            logger.debug('Opening sessions database %s', self.path)
+            self._db = connect(self.path, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                self._db.execute(statement)
+        return self._db
+
+    def _close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    async def _run(self, func, *args) -> Any:
+        return await get_running_loop().run_in_executor(
+            self._executor, func, *args)
+
+    def _get(self, sid: str) -> Optional[Session]:
+        db = self._connect()
+        row = db.execute(
+            'SELECT user_id, data, created, expires FROM sessions'
+            ' WHERE sid = ?', (sid,)).fetchone()
+        if row is None:
+            return None
+        now = time()
+        session = Session(sid=sid,
+                          user_id=row[0],
+                          data=loads(row[1]),
+                          created=row[2],
+                          expires=row[3])
+        if session.expires <= now:
+            db.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+            return None
+        if self.sliding:
+            expires = now + self.ttl
+            if expires - session.expires > self.touch_interval:
+                db.execute('UPDATE sessions SET expires = ? WHERE sid = ?',
+                           (expires, sid))
+            session.expires = expires
+        return session
+
+    def _put(self, session: Session) -> Session:
+        db = self._connect()
+        expires = time() + self.ttl
+        if self.sliding:
+            session.expires = expires
+        else:
+            row = db.execute('SELECT expires FROM sessions WHERE sid = ?',
+                             (session.sid,)).fetchone()
+            session.expires = expires if row is None else row[0]
+        db.execute(
+            'INSERT OR REPLACE INTO sessions'
+            ' (sid, user_id, data, created, expires)'
+            ' VALUES (?, ?, ?, ?, ?)',
+            (session.sid, session.user_id, dumps(session.data),
+             session.created, session.expires))
+        session.modified = False
+        return session
+
+    def _delete(self, sid: str) -> None:
+        self._connect().execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def _revoke(self, user_id: str) -> int:
+        return self._connect().execute(
+            'DELETE FROM sessions WHERE user_id = ?', (user_id,)).rowcount
+
+    def _reap(self, limit: int, now: float) -> int:
+        return self._connect().execute(
+            'DELETE FROM sessions WHERE rowid IN'
+            ' (SELECT rowid FROM sessions WHERE expires <= ? LIMIT ?)',
+            (now, limit)).rowcount
+
+    async def get(self, sid: str) -> Optional[Session]:
+        return await self._run(self._get, sid)
+
+    async def put(self, session: Session) -> Session:
+        return await self._run(self._put, session)
+
+    async def delete(self, sid: str) -> None:
+        await self._run(self._delete, sid)
+
+    async def revoke(self, user_id: str) -> int:
+        count = await self._run(self._revoke, user_id)
+        self.revoked(user_id)
+        return count
+
+    async def reap(self, limit: int = 1000,
+                   now: Optional[float] = None) -> int:
+        count = await self._run(self._reap, limit,
+                                time() if now is None else now)
+        self._reaped += count
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        return {'reaped': self._reaped}
+
+    async def start(self) -> None:
+        await self._run(self._connect)
+        await super().start()
+
+    async def stop(self) -> None:
+        await super().stop()
+        await self._run(self._close)
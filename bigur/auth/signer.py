@@ -0,0 +1,323 @@
+'''JSON web signature creation and signing backends.'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import get_running_loop
+from concurrent.futures import (Executor, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+from hashlib import sha1
+from json import dumps
+from os import cpu_count
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric.ec import (
+    ECDSA,
+    SECP256R1,
+    EllipticCurvePrivateKey,
+    EllipticCurvePublicKey,
+    generate_private_key as generate_ec_key,
+)
+from cryptography.hazmat.primitives.asymmetric.ed25519 import (
+    Ed25519PrivateKey,
+    Ed25519PublicKey,
+)
+from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
+from cryptography.hazmat.primitives.asymmetric.rsa import (
+    RSAPrivateKey,
+    RSAPublicKey,
+    generate_private_key as generate_rsa_key,
+)
+from cryptography.hazmat.primitives.asymmetric.utils import (
+    decode_dss_signature,
+)
+from cryptography.hazmat.primitives.hashes import SHA256
+from cryptography.hazmat.primitives.serialization import (
+    Encoding,
+    NoEncryption,
+    PrivateFormat,
+    PublicFormat,
+    load_pem_private_key,
+)
+from jwt.utils import base64url_encode
+
+from bigur.auth.oauth2.exceptions import TemporaryUnavailable
+
+PrivateKey = Union[RSAPrivateKey, EllipticCurvePrivateKey, Ed25519PrivateKey]
+PublicKey = Union[RSAPublicKey, EllipticCurvePublicKey, Ed25519PublicKey]
+
+#: Supported signing algorithms: RSA with SHA-256, ECDSA with P-256 and
+#: SHA-256, EdDSA with Ed25519 (RFC 8037).
+ALGORITHMS = ('RS256', 'ES256', 'EdDSA')
+
+#: Size of ES256 signature part (r and s).
+ES256_SIZE = 32
+
+
+def key_algorithm(key: Union[PrivateKey, PublicKey]) -> str:
+    '''Returns signing algorithm of private or public `key`, raises
+    :exc:`ValueError` if key is not supported.'''
+    if isinstance(key, (RSAPrivateKey, RSAPublicKey)):
+        return 'RS256'
+    if isinstance(key, (EllipticCurvePrivateKey, EllipticCurvePublicKey)):
+        if not isinstance(key.curve, SECP256R1):
+            raise ValueError('Unsupported curve {}'.format(key.curve.name))
+        return 'ES256'
+    if isinstance(key, (Ed25519PrivateKey, Ed25519PublicKey)):
+        return 'EdDSA'
+    raise ValueError('Unsupported key type {}'.format(type(key).__name__))
+
+
+def generate_key(alg: str = 'RS256', key_size: int = 2048) -> PrivateKey:
+    '''Returns new private key for `alg`, `key_size` is used for RSA
+    keys only.'''
+    if alg == 'RS256':
+        return generate_rsa_key(
+            public_exponent=65537, key_size=key_size,
+            backend=default_backend())
+    if alg == 'ES256':
+        return generate_ec_key(SECP256R1(), default_backend())
+    if alg == 'EdDSA':
+        return Ed25519PrivateKey.generate()
+    raise ValueError('Unsupported algorithm {}'.format(alg))
+
+
+def _b64(value: bytes) -> str:
+    return base64url_encode(value).decode('ascii')
+
+
+def public_jwk(public_key: PublicKey) -> Dict[str, str]:
+    '''Returns key type and parameters of JWK for `public_key`
+    (RFC 7518, sec. 6 and RFC 8037, sec. 2).'''
+    if isinstance(public_key, RSAPublicKey):
+        numbers = public_key.public_numbers()
+        return {
+            'kty': 'RSA',
+            'n': _b64(numbers.n.to_bytes(int(public_key.key_size / 8),
+                                         'big').lstrip(b'\x00')),
+            'e': _b64(numbers.e.to_bytes(4, 'big').lstrip(b'\x00')),
+        }
+    if isinstance(public_key, EllipticCurvePublicKey):
+        numbers = public_key.public_numbers()
+        return {
+            'kty': 'EC',
+            'crv': 'P-256',
+            'x': _b64(numbers.x.to_bytes(ES256_SIZE, 'big')),
+            'y': _b64(numbers.y.to_bytes(ES256_SIZE, 'big')),
+        }
+    if isinstance(public_key, Ed25519PublicKey):
+        return {
+            'kty': 'OKP',
+            'crv': 'Ed25519',
+            'x': _b64(public_key.public_bytes(Encoding.Raw,
+                                              PublicFormat.Raw)),
+        }
+    raise ValueError('Unsupported key type {}'.format(
+        type(public_key).__name__))
+
+
+def key_id(private_key: PrivateKey) -> str:
+    '''Returns key id: SHA-1 hash of RSA public key's modulus, of EC
+    public point or of Ed25519 public key.'''
+    public_key = private_key.public_key()
+    if isinstance(public_key, RSAPublicKey):
+        numbers = public_key.public_numbers()
+        value = numbers.n.to_bytes(
+            int(public_key.key_size / 8),
+            'big',
+        ).lstrip(b'\x00')
+    elif isinstance(public_key, EllipticCurvePublicKey):
+        value = public_key.public_bytes(Encoding.X962,
+                                        PublicFormat.UncompressedPoint)
+    else:
+        value = public_key.public_bytes(Encoding.Raw, PublicFormat.Raw)
+    return sha1(value).hexdigest()
+
+
+class Signer:
+    '''Token signer. It is created once per key and holds loaded key,
+    precomputed key id and encoded JWS header, so signing a token costs
+    only payload serialization and signature. Algorithm is selected by
+    key type (see :data:`ALGORITHMS`).
+
+    :param private_key: RSA, EC P-256 or Ed25519 private key'''
+
+    def __init__(self, private_key: PrivateKey):
+        self.key = private_key
+        self.alg = key_algorithm(private_key)
+        self.kid = key_id(private_key)
+        header = {'alg': self.alg, 'kid': self.kid, 'typ': 'JWT'}
+        self._header = base64url_encode(
+            dumps(header, separators=(',', ':'),
+                  sort_keys=True).encode('utf-8'))
+        self._padding = PKCS1v15()
+        self._hash = SHA256()
+        self._ecdsa = ECDSA(self._hash)
+        self._sign = {
+            'RS256': self._sign_rsa,
+            'ES256': self._sign_ec,
+            'EdDSA': private_key.sign,
+        }[self.alg]
+
+    def _sign_rsa(self, data: bytes) -> bytes:
+        return self.key.sign(data, self._padding, self._hash)
+
+    def _sign_ec(self, data: bytes) -> bytes:
+        # JWS signature is r and s of fixed size, not DER sequence
+        r, s = decode_dss_signature(self.key.sign(data, self._ecdsa))
+        return r.to_bytes(ES256_SIZE, 'big') + s.to_bytes(ES256_SIZE, 'big')
+
+    def jwk(self) -> Dict[str, str]:
+        '''Returns public key as JWK (RFC 7517).'''
+        params = public_jwk(self.key.public_key())
+        jwk = {
+            'kty': params.pop('kty'),
+            'alg': self.alg,
+            'use': 'sig',
+            'kid': self.kid,
+        }
+        jwk.update(params)
+        return jwk
+
+    def sign(self, payload: Dict[str, Any]) -> bytes:
+        '''Returns JWS compact serialization of `payload`.'''
+        signing_input = b'.'.join((
+            self._header,
+            base64url_encode(
+                dumps(payload, separators=(',', ':')).encode('utf-8')),
+        ))
+        signature = self._sign(signing_input)
+        return b'.'.join((signing_input, base64url_encode(signature)))
+
+
+class SigningBackend:
+    '''Backend signs tokens inline, in event loop thread.'''
+
+    async def start(self, signers: Iterable[Signer]) -> None:
+        '''Prepare backend for signing with `signers`.'''
+
+    async def stop(self) -> None:
+        '''Release backend's resources.'''
+
+    async def sign(self, signer: Signer, payload: Dict[str, Any]) -> bytes:
+        return signer.sign(payload)
+
+
+# Signers, loaded in worker process of ProcessPoolExecutor.
+_worker_signers: Dict[str, Signer] = {}
+
+
+def _load_worker_signer(pem: bytes) -> Signer:
+    signer = Signer(
+        load_pem_private_key(pem, password=None, backend=default_backend()))
+    _worker_signers[signer.kid] = signer
+    return signer
+
+
+def _init_worker(pems: List[bytes]) -> None:
+    for pem in pems:
+        _load_worker_signer(pem)
+
+
+def _worker_sign(kid: str, payload: Dict[str, Any],
+                 pem: Optional[bytes] = None) -> bytes:
+    try:
+        signer = _worker_signers[kid]
+    except KeyError:
+        if pem is None:
+            raise
+        signer = _load_worker_signer(pem)
+    return signer.sign(payload)
+
+
+class ExecutorSigningBackend(SigningBackend):
+    '''Backend signs tokens in thread or process pool, so event loop
+    is not blocked by RSA operations. Process pool workers load keys
+    once, on worker start.
+
+    :param str executor: `thread` or `process`
+    :param int workers: number of workers, default is number of CPUs
+    :param int queue: maximum number of tokens waiting for signing, if
+        exceeded :exc:`~bigur.auth.oauth2.exceptions.TemporaryUnavailable`
+        raised'''
+
+    def __init__(self,
+                 executor: str = 'process',
+                 workers: Optional[int] = None,
+                 queue: int = 1000):
+        if executor not in ('thread', 'process'):
+            raise ValueError('Invalid executor {}'.format(executor))
+        self.executor = executor
+        self.workers = workers or cpu_count()
+        self.queue = queue
+        self._pool: Optional[Executor] = None
+        self._pems: Dict[str, bytes] = {}
+        self._pending = 0
+
+    async def start(self, signers: Iterable[Signer]) -> None:
+        if self.executor == 'process':
+            for signer in signers:
+                self._pems[signer.kid] = signer.key.private_bytes(
+                    encoding=Encoding.PEM,
+                    format=PrivateFormat.PKCS8,
+                    encryption_algorithm=NoEncryption())
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(list(self._pems.values()),))
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix='signer')
+
+    async def stop(self) -> None:
+        pool = self._pool
+        if pool is not None:
+            self._pool = None
+            # Waiting for workers in default executor, so event loop keeps
+            # serving other requests while pool shuts down.
+            await get_running_loop().run_in_executor(None, pool.shutdown)
+
+    def stats(self) -> Dict[str, int]:
+        '''Returns number of tokens waiting for signing.'''
+        return {'pending': self._pending}
+
+    async def sign(self, signer: Signer, payload: Dict[str, Any]) -> bytes:
+        if self._pool is None:
+            return signer.sign(payload)
+
+        if self._pending >= self.queue:
+            raise TemporaryUnavailable('Token signing queue is full.')
+
+        loop = get_running_loop()
+        self._pending += 1
+        try:
+            if self.executor == 'thread':
+                return await loop.run_in_executor(self._pool, signer.sign,
+                                                  payload)
+            try:
+                return await loop.run_in_executor(self._pool, _worker_sign,
+                                                  signer.kid, payload)
+            except KeyError:
+                # Key is added after workers start.
+                pem = self._pems.get(signer.kid)
+                if pem is None:
+                    pem = self._pems[signer.kid] = signer.key.private_bytes(
+                        encoding=Encoding.PEM,
+                        format=PrivateFormat.PKCS8,
+                        encryption_algorithm=NoEncryption())
+                return await loop.run_in_executor(self._pool, _worker_sign,
+                                                  signer.kid, payload, pem)
+        finally:
+            self._pending -= 1
+
+
+def create_backend(backend: str = 'inline', **kwargs) -> SigningBackend:
+    '''Create signing backend from `oauth2.signing` configuration section.
+
+    :param str backend: `inline`, `thread` or `process`
+    :param kwargs: parameters of :class:`ExecutorSigningBackend`'''
+    if backend == 'inline':
+        return SigningBackend()
+    return ExecutorSigningBackend(executor=backend, **kwargs)
@@ -5,6 +5,7 @@ __licence__ = 'For license information see LICENSE'
 # flake8: noqa
 
 from .memory import Memory
+from .sqlite import SQLite
 
 
 class DatabaseProxy:
@@ -16,14 +17,14 @@ class DatabaseProxy:
         self._store = instance
 
     def __getattr__(self, name):
-        if not self._store:
+        if self._store is None:
             raise ValueError('Store not initialized')
         return getattr(self._store, name)
 
     def __setattr__(self, name, value):
         if name == '_store':
             super().__setattr__(name, value)
-        elif not self._store:
+        elif self._store is None:
             raise ValueError('Store not initialized')
         else:
             setattr(self._store, name, value)
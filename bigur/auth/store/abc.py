@@ -3,7 +3,7 @@ __copyright__ = '(c) 2016-2019 Business group for development management'
 __licence__ = 'For license information see LICENSE'
 
 from abc import ABC, abstractmethod
-from typing import TypeVar, Generic
+from typing import Generic, Optional, TypeVar
 
 T = TypeVar('T')
 K = TypeVar('K')
@@ -26,6 +26,10 @@ class Collection(Generic[T, K], ABC):
     async def put(self, obj: T) -> T:
         raise NotImplementedError
 
+    @abstractmethod
+    async def delete(self, key: K) -> None:
+        raise NotImplementedError
+
 
 class ProvidersCollection(Collection[T, K]):
 
@@ -37,7 +41,7 @@ class ProvidersCollection(Collection[T, K]):
 class UsersCollection(Collection[T, K]):
 
     @abstractmethod
-    def get_by_username(self, username: str) -> T:
+    async def get_by_username(self, username: str) -> T:
         raise NotImplementedError
 
     @abstractmethod
@@ -63,7 +67,50 @@ class ScopesCollection(Collection[T, K]):
 class AccessCodeCollection(Collection[T, K]):
 
     @abstractmethod
-    def get_by_code(self, code: str) -> T:
+    async def get_by_code(self, code: str) -> T:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def consume(self,
+                      code: str,
+                      client_id: str,
+                      redirect_uri: Optional[str] = None) -> T:
+        '''Redeems access code: finds it, checks that it is not used
+        or expired and was issued to `client_id` with `redirect_uri`,
+        marks it as used. Implementation must do it atomically, so only
+        one of concurrent calls with the same code succeeds.
+
+        :returns: redeemed code
+        :raises KeyError: if code not found
+        :raises ValueError: if code can't be redeemed'''
+        raise NotImplementedError
+
+
+class RefreshTokenCollection(Collection[T, K]):
+
+    @abstractmethod
+    async def rotate(self, token_id: K, client_id: str) -> T:
+        '''Marks refresh token as used, if it is not used or expired
+        and was issued to `client_id`. If token is already used, revokes
+        its family. Implementation must do it atomically, so token can be
+        rotated only once.
+
+        :returns: rotated token
+        :raises KeyError: if token not found
+        :raises ValueError: if token can't be rotated'''
+        raise NotImplementedError
+
+    @abstractmethod
+    async def release(self, token_id: K) -> None:
+        '''Marks rotated token as not used, if new tokens could not be
+        issued, so client can retry with it.'''
+        raise NotImplementedError
+
+    @abstractmethod
+    async def revoke_family(self, family: str) -> int:
+        '''Removes all tokens of `family`.
+
+        :returns: number of removed tokens'''
         raise NotImplementedError
 
 
@@ -74,7 +121,14 @@ class Store(ABC):
     scopes: ScopesCollection
     clients: ClientsCollection
     access_codes: AccessCodeCollection
+    refresh_tokens: RefreshTokenCollection
 
     @abstractmethod
     def __init__(self):
         raise NotImplementedError
+
+    async def start(self) -> None:
+        '''Called on application startup, starts background tasks.'''
+
+    async def stop(self) -> None:
+        '''Called on application shutdown, stops background tasks.'''
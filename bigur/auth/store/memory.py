@@ -2,7 +2,12 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Business group for development management'
 __licence__ = 'For license information see LICENSE'
 
-from typing import Any, Dict, List
+from asyncio import CancelledError, Task, create_task, sleep
+from heapq import heappop, heappush
+from logging import getLogger
+from time import time
+from typing import (Any, Callable, Dict, Hashable, List, Optional, Set,
+                    Tuple)
 from uuid import uuid4
 
 from bigur.auth.model import (
@@ -13,16 +18,91 @@ from bigur.auth.model import (
     Client,
     Scope,
     AccessCode,
+    RefreshToken,
 )
 from bigur.auth.store import abc
 
+logger = getLogger(__name__)
+
+
+class Index:
+    '''Secondary index of memory collection. Maps keys, extracted from
+    object by `extract` function, to ids of objects having the key, in
+    order they were indexed. Keys need not be unique.
+
+    :param extract: function returns tuple of object's keys'''
+
+    def __init__(self, extract: Callable[[Any], Tuple[Hashable, ...]]):
+        self.extract = extract
+        # Dicts with None values are sets, which keep insertion order
+        self._ids: Dict[Hashable, Dict[str, None]] = {}
+        self._keys: Dict[str, Tuple[Hashable, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _discard(self, key: Hashable, obj_id: str) -> None:
+        ids = self._ids.get(key)
+        if ids is not None:
+            ids.pop(obj_id, None)
+            if not ids:
+                del self._ids[key]
+
+    def update(self, obj: Object) -> None:
+        '''Index object, drop keys that object does not have anymore.'''
+        keys = self.extract(obj)
+        for key in self._keys.get(obj.id, ()):
+            if key not in keys:
+                self._discard(key, obj.id)
+        for key in keys:
+            self._ids.setdefault(key, {})[obj.id] = None
+        if keys:
+            self._keys[obj.id] = keys
+        else:
+            self._keys.pop(obj.id, None)
+
+    def remove(self, obj_id: str) -> None:
+        '''Drop all keys of object with `obj_id`.'''
+        for key in self._keys.pop(obj_id, ()):
+            self._discard(key, obj_id)
+
+    def get(self, key: Hashable) -> Tuple[str, ...]:
+        '''Returns ids of objects for `key`, empty if not found.'''
+        return tuple(self._ids.get(key, ()))
+
 
 class Collection(abc.Collection[Object, str]):
 
     def __init__(self, store: abc.Store):
         self._db: Dict[str, Any] = dict()
+        self._indexes: List[Index] = []
         super().__init__(store)
 
+    def create_index(self, extract: Callable[[Any], Tuple[Hashable,
+                                                          ...]]) -> Index:
+        '''Create index, maintained by :meth:`put` and :meth:`delete`.'''
+        index = Index(extract)
+        for obj in self._db.values():
+            index.update(obj)
+        self._indexes.append(index)
+        return index
+
+    def lookup(self, index: Index, key: Hashable) -> Object:
+        '''Returns first indexed object with `key` of `index`. Object can
+        be changed in place without :meth:`put`, so key is checked against
+        object, and if no indexed object has the key, objects are scanned
+        and found one is reindexed. Only lookups of missing keys cost a
+        scan.'''
+        for obj_id in index.get(key):
+            obj = self._db[obj_id]
+            if key in index.extract(obj):
+                return obj
+        for obj in self._db.values():
+            if key in index.extract(obj):
+                index.update(obj)
+                return obj
+        raise KeyError(key)
+
     async def get(self, key: str) -> Object:
         return self._db[key]
 
@@ -30,25 +110,43 @@ class Collection(abc.Collection[Object, str]):
         if obj.id is None:
             obj.id = uuid4().hex
         self._db[obj.id] = obj
+        for index in self._indexes:
+            index.update(obj)
         return obj
 
+    async def delete(self, key: str) -> None:
+        del self._db[key]
+        for index in self._indexes:
+            index.remove(key)
+
 
 class ProvidersCollection(Collection, abc.ProvidersCollection[Provider, str]):
 
+    def __init__(self, store: abc.Store):
+        super().__init__(store)
+        self._by_domain = self.create_index(
+            lambda x: tuple(getattr(x, 'domains', None) or ()))
+
     async def create(self, **kwargs) -> Provider:
         provider = Provider(**kwargs)
         await self.put(provider)
         return provider
 
     async def get_by_domain(self, domain: str) -> Provider:
-        for v in self._db.values():
-            if domain in getattr(v, 'domains', []):
-                return v
-        raise KeyError('Provider for domain {} not found'.format(domain))
+        try:
+            return self.lookup(self._by_domain, domain)
+        except KeyError:
+            raise KeyError('Provider for domain {} not found'.format(domain))
 
 
 class UsersCollection(Collection, abc.UsersCollection[User, str]):
 
+    def __init__(self, store: abc.Store):
+        super().__init__(store)
+        self._by_username = self.create_index(lambda x: (x.username,))
+        self._by_oidp = self.create_index(
+            lambda x: tuple((x.oidc_accounts or {}).items()))
+
     async def create(self, *, human=True, **kwargs) -> User:
         if human:
             user = Human(**kwargs)
@@ -57,17 +155,17 @@ class UsersCollection(Collection, abc.UsersCollection[User, str]):
         await self.put(user)
         return user
 
-    def get_by_username(self, username: str) -> User:
-        for v in self._db.values():
-            if v.username == username:
-                return v
-        raise KeyError('User not found')
+    async def get_by_username(self, username: str) -> User:
+        try:
+            return self.lookup(self._by_username, username)
+        except KeyError:
+            raise KeyError('User not found')
 
     async def get_by_oidp(self, provider_id: str, user_id: str) -> User:
-        for v in self._db.values():
-            if v.oidc_accounts and v.oidc_accounts.get(provider_id) == user_id:
-                return v
-        raise KeyError('User not found')
+        try:
+            return self.lookup(self._by_oidp, (provider_id, user_id))
+        except KeyError:
+            raise KeyError('User not found')
 
 
 class ClientsCollection(Collection, abc.ClientsCollection[Client, str]):
@@ -80,22 +178,36 @@ class ClientsCollection(Collection, abc.ClientsCollection[Client, str]):
 
 class ScopesCollection(Collection, abc.ClientsCollection[Scope, str]):
 
+    def __init__(self, store: abc.Store):
+        super().__init__(store)
+        self._by_code = self.create_index(lambda x: (x.code,))
+
     async def create(self, **kwargs) -> Scope:
         scope = Scope(**kwargs)
         await self.put(scope)
         return scope
 
     async def get_by_code(self, code: str) -> Scope:
-        for v in self._db.values():
-            if v.code == code:
-                return v
-        raise KeyError('Scope not found.')
+        try:
+            return self.lookup(self._by_code, code)
+        except KeyError:
+            raise KeyError('Scope not found.')
 
     async def get_default_scopes(self) -> List[Scope]:
         return [v for v in self._db.values() if v.default]
 
 
 class AccessCodeCollection(Collection, abc.AccessCodeCollection[Scope, str]):
+    '''Access codes collection. Expired and used codes are removed
+    by :meth:`reap`, which is called periodically by
+    :meth:`Memory.start`'s background task.'''
+
+    def __init__(self, store: abc.Store):
+        super().__init__(store)
+        self._by_code = self.create_index(lambda x: (x.code,))
+        self._deadlines: Dict[str, float] = {}
+        self._expiry: List[Tuple[float, str]] = []
+        self._reaped = 0
 
     async def create(self, **kwargs) -> AccessCode:
         if 'scopes' in kwargs and isinstance(kwargs['scopes'], set):
@@ -104,18 +216,219 @@ class AccessCodeCollection(Collection, abc.AccessCodeCollection[Scope, str]):
         await self.put(code)
         return code
 
+    async def put(self, obj: AccessCode) -> AccessCode:
+        await super().put(obj)
+        self._schedule(obj)
+        return obj
+
+    def _schedule(self, obj: AccessCode) -> None:
+        # Used code is not needed anymore, remove it on next reap.
+        deadline = 0.0 if obj.used else obj.expires.timestamp()
+        if self._deadlines.get(obj.id) != deadline:
+            self._deadlines[obj.id] = deadline
+            heappush(self._expiry, (deadline, obj.id))
+
+    async def delete(self, key: str) -> None:
+        await super().delete(key)
+        self._deadlines.pop(key, None)
+
     async def get_by_code(self, code: str) -> AccessCode:
-        for v in self._db.values():
-            if v.code == code:
-                return v
-        raise KeyError('Access code not found.')
+        try:
+            return self.lookup(self._by_code, code)
+        except KeyError:
+            raise KeyError('Access code not found.')
+
+    async def consume(self,
+                      code: str,
+                      client_id: str,
+                      redirect_uri: Optional[str] = None) -> AccessCode:
+        # There is no await between lookup and marking code as used, so
+        # concurrent redemptions in event loop can't interleave here.
+        access_code = self.lookup(self._by_code, code)
+        if access_code.used:
+            raise ValueError('Code already used.')
+        if access_code.is_expired():
+            raise ValueError('Code expired.')
+        if access_code.client_id != client_id:
+            raise ValueError('Code was issued to another client.')
+        if access_code.redirect_uri != redirect_uri:
+            raise ValueError('Parameter `redirect_uri\' does not match '
+                             'authorization request.')
+        access_code.used = True
+        self._schedule(access_code)
+        return access_code
+
+    def reap(self, limit: int = 1000, now: Optional[float] = None) -> int:
+        '''Remove at most `limit` expired or used codes.
+
+        :returns: number of removed codes'''
+        if now is None:
+            now = time()
+        expiry = self._expiry
+        count = 0
+        while expiry and expiry[0][0] <= now and count < limit:
+            deadline, key = heappop(expiry)
+            # Skip entries, replaced by later put()
+            if self._deadlines.get(key) != deadline:
+                continue
+            del self._deadlines[key]
+            del self._db[key]
+            for index in self._indexes:
+                index.remove(key)
+            count += 1
+        self._reaped += count
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        '''Returns collection counters: `live` is number of codes held,
+        `reaped` is total number of removed codes.'''
+        return {'live': len(self._db), 'reaped': self._reaped}
+
+
+class RefreshTokenCollection(Collection,
+                             abc.RefreshTokenCollection[RefreshToken, bytes]):
+    '''Refresh tokens collection, keyed by token hash. Tokens are kept
+    until expiration even if used, to detect reuse; expired tokens are
+    removed by :meth:`reap`.'''
+
+    def __init__(self, store: abc.Store):
+        super().__init__(store)
+        self._families: Dict[str, Set[bytes]] = {}
+        self._expiry: List[Tuple[float, bytes]] = []
+        self._reaped = 0
+        self._revoked = 0
+
+    async def create(self, **kwargs) -> RefreshToken:
+        return await self.put(RefreshToken(**kwargs))
+
+    async def put(self, obj: RefreshToken) -> RefreshToken:
+        old = self._db.get(obj.id)
+        if old is not None and old.family != obj.family:
+            self._forget(old)
+        await super().put(obj)
+        self._families.setdefault(obj.family, set()).add(obj.id)
+        heappush(self._expiry, (obj.expires, obj.id))
+        return obj
+
+    async def delete(self, key: bytes) -> None:
+        obj = self._db[key]
+        await super().delete(key)
+        self._forget(obj)
+
+    def _forget(self, obj: RefreshToken) -> None:
+        family = self._families.get(obj.family)
+        if family is not None:
+            family.discard(obj.id)
+            if not family:
+                del self._families[obj.family]
+
+    async def rotate(self, token_id: bytes, client_id: str) -> RefreshToken:
+        # No await inside, so token can't be rotated twice concurrently.
+        token = self._db[token_id]
+        if token.client_id != client_id:
+            raise ValueError('Refresh token was issued to another client.')
+        if token.is_expired():
+            raise ValueError('Refresh token expired.')
+        if token.used:
+            count = self._revoke_family(token.family)
+            logger.warning(
+                'Refresh token of user %s reused, revoked %d tokens',
+                token.user_id, count)
+            raise ValueError('Refresh token already used.')
+        token.used = True
+        return token
+
+    async def release(self, token_id: bytes) -> None:
+        token = self._db.get(token_id)
+        if token is not None:
+            token.used = False
+
+    async def revoke_family(self, family: str) -> int:
+        return self._revoke_family(family)
+
+    def _revoke_family(self, family: str) -> int:
+        ids = self._families.pop(family, ())
+        for key in ids:
+            del self._db[key]
+        self._revoked += len(ids)
+        return len(ids)
+
+    def reap(self, limit: int = 1000, now: Optional[float] = None) -> int:
+        '''Remove at most `limit` expired tokens.
+
+        :returns: number of removed tokens'''
+        if now is None:
+            now = time()
+        expiry = self._expiry
+        count = 0
+        while expiry and expiry[0][0] <= now and count < limit:
+            deadline, key = heappop(expiry)
+            # Skip revoked tokens and entries replaced by later put()
+            obj = self._db.get(key)
+            if obj is None or obj.expires != deadline:
+                continue
+            del self._db[key]
+            self._forget(obj)
+            count += 1
+        self._reaped += count
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        '''Returns collection counters: `live` is number of tokens held,
+        `reaped` is total number of expired tokens removed, `revoked` is
+        total number of tokens removed by family revocation.'''
+        return {
+            'live': len(self._db),
+            'reaped': self._reaped,
+            'revoked': self._revoked
+        }
 
 
 class Memory(abc.Store):
+    '''Memory store.
 
-    def __init__(self):
+    :param float reap_interval: seconds between removing of expired
+        objects
+    :param int reap_batch: maximum of objects removed at once, before
+        giving control back to event loop'''
+
+    def __init__(self, reap_interval: float = 1.0, reap_batch: int = 1000):
         self.providers = ProvidersCollection(self)
         self.users = UsersCollection(self)
         self.clients = ClientsCollection(self)
         self.scopes = ScopesCollection(self)
         self.access_codes = AccessCodeCollection(self)
+        self.refresh_tokens = RefreshTokenCollection(self)
+
+        self.reap_interval = reap_interval
+        self.reap_batch = reap_batch
+        self._reaper: Optional[Task] = None
+
+    async def reaper(self) -> None:
+        while True:
+            count = self.access_codes.reap(self.reap_batch)
+            if count:
+                logger.debug('Reaped %d access codes, stats: %s', count,
+                             self.access_codes.stats())
+            tokens = self.refresh_tokens.reap(self.reap_batch - count)
+            if tokens:
+                logger.debug('Reaped %d refresh tokens, stats: %s', tokens,
+                             self.refresh_tokens.stats())
+            count += tokens
+            if count < self.reap_batch:
+                await sleep(self.reap_interval)
+            else:
+                await sleep(0)
+
+    async def start(self) -> None:
+        if self._reaper is None:
+            self._reaper = create_task(self.reaper())
+
+    async def stop(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except CancelledError:
+                pass
+            self._reaper = None
@@ -0,0 +1,528 @@
+'''Store in SQLite database. Processes opening the same database file,
+e.g. workers of server, share all objects. Queries are run in dedicated
+thread, so event loop is not blocked by disk I/O.
+
+Objects are pickled, secondary keys of objects are kept in separate
+table, so lookups by them are index lookups. Access codes and refresh
+tokens have own tables: they are redeemed and rotated in immediate
+transactions, so code or token is used once even if concurrent requests
+come to different processes.
+
+Objects returned by store are copies, object must be saved with
+:meth:`Collection.put` to change it in store.'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import CancelledError, Task, create_task, get_running_loop, sleep
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from json import dumps
+from logging import getLogger
+from pickle import HIGHEST_PROTOCOL, dumps as pickle, loads as unpickle
+from sqlite3 import Connection, connect
+from time import time
+from typing import (Any, Callable, Dict, Hashable, Iterator, List, Optional,
+                    Tuple)
+from uuid import uuid4
+
+from bigur.auth.model import (
+    AccessCode,
+    Client,
+    Human,
+    Object,
+    Provider,
+    RefreshToken,
+    Scope,
+    User,
+)
+from bigur.auth.store import abc
+
+logger = getLogger(__name__)
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS objects ('
+    ' collection TEXT NOT NULL,'
+    ' id TEXT NOT NULL,'
+    ' data BLOB NOT NULL,'
+    ' PRIMARY KEY (collection, id))',
+    'CREATE TABLE IF NOT EXISTS object_keys ('
+    ' collection TEXT NOT NULL,'
+    ' key TEXT NOT NULL,'
+    ' id TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS object_keys_key'
+    ' ON object_keys (collection, key)',
+    'CREATE INDEX IF NOT EXISTS object_keys_id'
+    ' ON object_keys (collection, id)',
+    'CREATE TABLE IF NOT EXISTS access_codes ('
+    ' id TEXT PRIMARY KEY,'
+    ' code TEXT NOT NULL,'
+    ' data BLOB NOT NULL,'
+    ' deadline REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS access_codes_code ON access_codes (code)',
+    'CREATE INDEX IF NOT EXISTS access_codes_deadline'
+    ' ON access_codes (deadline)',
+    'CREATE TABLE IF NOT EXISTS refresh_tokens ('
+    ' id BLOB PRIMARY KEY,'
+    ' family TEXT NOT NULL,'
+    ' user_id TEXT,'
+    ' client_id TEXT,'
+    ' scopes TEXT NOT NULL,'
+    ' expires REAL NOT NULL,'
+    ' used INTEGER NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS refresh_tokens_family'
+    ' ON refresh_tokens (family)',
+    'CREATE INDEX IF NOT EXISTS refresh_tokens_expires'
+    ' ON refresh_tokens (expires)',
+)
+
+
+@contextmanager
+def transaction(db: Connection, immediate: bool = False) -> Iterator[None]:
+    '''Runs statements in transaction. Immediate transaction takes write
+    lock at once, so other processes can't change rows read in it.'''
+    db.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+    try:
+        yield
+    except BaseException:
+        db.execute('ROLLBACK')
+        raise
+    db.execute('COMMIT')
+
+
+class Collection(abc.Collection[Object, str]):
+    '''Objects of one type in `objects` table.'''
+
+    #: Name of collection in database.
+    name: str = ''
+
+    #: Functions which return tuples of object's keys, by index name.
+    indexes: Dict[str, Callable[[Any], Tuple[Hashable, ...]]] = {}
+
+    def _keys(self, obj: Object) -> List[Tuple[str, str, str]]:
+        return [(self.name, dumps([name, key]), obj.id)
+                for name, extract in self.indexes.items()
+                for key in extract(obj)]
+
+    def _get(self, db: Connection, key: str) -> Object:
+        row = db.execute(
+            'SELECT data FROM objects WHERE collection = ? AND id = ?',
+            (self.name, key)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return unpickle(row[0])
+
+    def _put(self, db: Connection, obj: Object) -> None:
+        with transaction(db):
+            db.execute(
+                'INSERT OR REPLACE INTO objects (collection, id, data)'
+                ' VALUES (?, ?, ?)',
+                (self.name, obj.id, pickle(obj, HIGHEST_PROTOCOL)))
+            db.execute(
+                'DELETE FROM object_keys WHERE collection = ? AND id = ?',
+                (self.name, obj.id))
+            db.executemany(
+                'INSERT INTO object_keys (collection, key, id)'
+                ' VALUES (?, ?, ?)', self._keys(obj))
+
+    def _delete(self, db: Connection, key: str) -> None:
+        with transaction(db):
+            if not db.execute(
+                    'DELETE FROM objects WHERE collection = ? AND id = ?',
+                    (self.name, key)).rowcount:
+                raise KeyError(key)
+            db.execute(
+                'DELETE FROM object_keys WHERE collection = ? AND id = ?',
+                (self.name, key))
+
+    def _lookup(self, db: Connection, index: str, key: Hashable) -> Object:
+        row = db.execute(
+            'SELECT objects.data FROM object_keys JOIN objects'
+            ' ON objects.collection = object_keys.collection'
+            ' AND objects.id = object_keys.id'
+            ' WHERE object_keys.collection = ? AND object_keys.key = ?'
+            ' ORDER BY object_keys.rowid LIMIT 1',
+            (self.name, dumps([index, key]))).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return unpickle(row[0])
+
+    def _all(self, db: Connection) -> List[Object]:
+        return [
+            unpickle(x[0]) for x in db.execute(
+                'SELECT data FROM objects WHERE collection = ?'
+                ' ORDER BY rowid', (self.name,))
+        ]
+
+    async def lookup(self, index: str, key: Hashable) -> Object:
+        '''Returns first object with `key` of `index`.'''
+        return await self.store.run(self._lookup, index, key)
+
+    async def get(self, key: str) -> Object:
+        return await self.store.run(self._get, key)
+
+    async def put(self, obj: Object) -> Object:
+        if obj.id is None:
+            obj.id = uuid4().hex
+        await self.store.run(self._put, obj)
+        return obj
+
+    async def delete(self, key: str) -> None:
+        await self.store.run(self._delete, key)
+
+
+class ProvidersCollection(Collection, abc.ProvidersCollection[Provider, str]):
+
+    name = 'providers'
+    indexes = {'domain': lambda x: tuple(getattr(x, 'domains', None) or ())}
+
+    async def create(self, **kwargs) -> Provider:
+        return await self.put(Provider(**kwargs))
+
+    async def get_by_domain(self, domain: str) -> Provider:
+        try:
+            return await self.lookup('domain', domain)
+        except KeyError:
+            raise KeyError('Provider for domain {} not found'.format(domain))
+
+
+class UsersCollection(Collection, abc.UsersCollection[User, str]):
+
+    name = 'users'
+    indexes = {
+        'username': lambda x: (x.username,),
+        'oidp': lambda x: tuple((x.oidc_accounts or {}).items()),
+    }
+
+    async def create(self, *, human=True, **kwargs) -> User:
+        if human:
+            return await self.put(Human(**kwargs))
+        return await self.put(User(**kwargs))
+
+    async def get_by_username(self, username: str) -> User:
+        try:
+            return await self.lookup('username', username)
+        except KeyError:
+            raise KeyError('User not found')
+
+    async def get_by_oidp(self, provider_id: str, user_id: str) -> User:
+        try:
+            return await self.lookup('oidp', (provider_id, user_id))
+        except KeyError:
+            raise KeyError('User not found')
+
+
+class ClientsCollection(Collection, abc.ClientsCollection[Client, str]):
+
+    name = 'clients'
+
+    async def create(self, **kwargs) -> Client:
+        return await self.put(Client(**kwargs))
+
+
+class ScopesCollection(Collection, abc.ScopesCollection[Scope, str]):
+
+    name = 'scopes'
+    indexes = {'code': lambda x: (x.code,)}
+
+    async def create(self, **kwargs) -> Scope:
+        return await self.put(Scope(**kwargs))
+
+    async def get_by_code(self, code: str) -> Scope:
+        try:
+            return await self.lookup('code', code)
+        except KeyError:
+            raise KeyError('Scope not found.')
+
+    async def get_default_scopes(self) -> List[Scope]:
+        return [x for x in await self.store.run(self._all) if x.default]
+
+
+class AccessCodeCollection(Collection,
+                           abc.AccessCodeCollection[AccessCode, str]):
+    '''Access codes in `access_codes` table. Used codes are not needed
+    anymore, so their deadline is reset and they are removed, as well as
+    expired ones, by :meth:`reap`.'''
+
+    def __init__(self, store: abc.Store):
+        super().__init__(store)
+        self._reaped = 0
+
+    async def create(self, **kwargs) -> AccessCode:
+        if 'scopes' in kwargs and isinstance(kwargs['scopes'], set):
+            kwargs['scopes'] = list(kwargs['scopes'])
+        return await self.put(AccessCode(**kwargs))
+
+    def _get(self, db: Connection, key: str) -> AccessCode:
+        row = db.execute('SELECT data FROM access_codes WHERE id = ?',
+                         (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return unpickle(row[0])
+
+    def _put(self, db: Connection, obj: AccessCode) -> None:
+        db.execute(
+            'INSERT OR REPLACE INTO access_codes (id, code, data, deadline)'
+            ' VALUES (?, ?, ?, ?)',
+            (obj.id, obj.code, pickle(obj, HIGHEST_PROTOCOL),
+             0.0 if obj.used else obj.expires.timestamp()))
+
+    def _delete(self, db: Connection, key: str) -> None:
+        if not db.execute('DELETE FROM access_codes WHERE id = ?',
+                          (key,)).rowcount:
+            raise KeyError(key)
+
+    def _get_by_code(self, db: Connection, code: str) -> AccessCode:
+        row = db.execute(
+            'SELECT data FROM access_codes WHERE code = ?'
+            ' ORDER BY rowid LIMIT 1', (code,)).fetchone()
+        if row is None:
+            raise KeyError('Access code not found.')
+        return unpickle(row[0])
+
+    def _consume(self, db: Connection, code: str, client_id: str,
+                 redirect_uri: Optional[str]) -> AccessCode:
+        with transaction(db, immediate=True):
+            access_code = self._get_by_code(db, code)
+            if access_code.used:
+                raise ValueError('Code already used.')
+            if access_code.is_expired():
+                raise ValueError('Code expired.')
+            if access_code.client_id != client_id:
+                raise ValueError('Code was issued to another client.')
+            if access_code.redirect_uri != redirect_uri:
+                raise ValueError('Parameter `redirect_uri\' does not match '
+                                 'authorization request.')
+            access_code.used = True
+            self._put(db, access_code)
+        return access_code
+
+    def _reap(self, db: Connection, limit: int, now: float) -> int:
+        return db.execute(
+            'DELETE FROM access_codes WHERE id IN'
+            ' (SELECT id FROM access_codes WHERE deadline <= ? LIMIT ?)',
+            (now, limit)).rowcount
+
+    async def get_by_code(self, code: str) -> AccessCode:
+        return await self.store.run(self._get_by_code, code)
+
+    async def consume(self,
+                      code: str,
+                      client_id: str,
+                      redirect_uri: Optional[str] = None) -> AccessCode:
+        return await self.store.run(self._consume, code, client_id,
+                                    redirect_uri)
+
+    async def reap(self, limit: int = 1000,
+                   now: Optional[float] = None) -> int:
+        '''Remove at most `limit` expired or used codes.
+
+        :returns: number of removed codes'''
+        count = await self.store.run(self._reap, limit,
+                                     time() if now is None else now)
+        self._reaped += count
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        '''Returns total number of `reaped` codes.'''
+        return {'reaped': self._reaped}
+
+
+class RefreshTokenCollection(Collection,
+                             abc.RefreshTokenCollection[RefreshToken, bytes]):
+    '''Refresh tokens in `refresh_tokens` table, keyed by token hash.
+    Tokens are kept until expiration even if used, to detect reuse;
+    expired tokens are removed by :meth:`reap`.'''
+
+    def __init__(self, store: abc.Store):
+        super().__init__(store)
+        self._reaped = 0
+        self._revoked = 0
+
+    async def create(self, **kwargs) -> RefreshToken:
+        return await self.put(RefreshToken(**kwargs))
+
+    def _get(self, db: Connection, key: bytes) -> RefreshToken:
+        row = db.execute(
+            'SELECT family, user_id, client_id, scopes, expires, used'
+            ' FROM refresh_tokens WHERE id = ?', (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return RefreshToken(id=key,
+                            family=row[0],
+                            user_id=row[1],
+                            client_id=row[2],
+                            scopes=tuple(row[3].split()),
+                            expires=row[4],
+                            used=bool(row[5]))
+
+    def _put(self, db: Connection, obj: RefreshToken) -> None:
+        db.execute(
+            'INSERT OR REPLACE INTO refresh_tokens'
+            ' (id, family, user_id, client_id, scopes, expires, used)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (obj.id, obj.family, obj.user_id, obj.client_id,
+             ' '.join(obj.scopes), obj.expires, int(obj.used)))
+
+    def _delete(self, db: Connection, key: bytes) -> None:
+        if not db.execute('DELETE FROM refresh_tokens WHERE id = ?',
+                          (key,)).rowcount:
+            raise KeyError(key)
+
+    def _rotate(self, db: Connection, token_id: bytes,
+                client_id: str) -> Tuple[RefreshToken, Optional[int]]:
+        # Returns token and number of revoked tokens if token is reused
+        with transaction(db, immediate=True):
+            token = self._get(db, token_id)
+            if token.client_id != client_id:
+                raise ValueError('Refresh token was issued to another client.')
+            if token.is_expired():
+                raise ValueError('Refresh token expired.')
+            if token.used:
+                return token, self._revoke_family(db, token.family)
+            db.execute('UPDATE refresh_tokens SET used = 1 WHERE id = ?',
+                       (token_id,))
+        token.used = True
+        return token, None
+
+    def _release(self, db: Connection, token_id: bytes) -> None:
+        db.execute('UPDATE refresh_tokens SET used = 0 WHERE id = ?',
+                   (token_id,))
+
+    def _revoke_family(self, db: Connection, family: str) -> int:
+        return db.execute('DELETE FROM refresh_tokens WHERE family = ?',
+                          (family,)).rowcount
+
+    def _reap(self, db: Connection, limit: int, now: float) -> int:
+        return db.execute(
+            'DELETE FROM refresh_tokens WHERE id IN'
+            ' (SELECT id FROM refresh_tokens WHERE expires <= ? LIMIT ?)',
+            (now, limit)).rowcount
+
+    async def put(self, obj: RefreshToken) -> RefreshToken:
+        await self.store.run(self._put, obj)
+        return obj
+
+    async def rotate(self, token_id: bytes, client_id: str) -> RefreshToken:
+        token, count = await self.store.run(self._rotate, token_id,
+                                            client_id)
+        if count is not None:
+            self._revoked += count
+            logger.warning(
+                'Refresh token of user %s reused, revoked %d tokens',
+                token.user_id, count)
+            raise ValueError('Refresh token already used.')
+        return token
+
+    async def release(self, token_id: bytes) -> None:
+        await self.store.run(self._release, token_id)
+
+    async def revoke_family(self, family: str) -> int:
+        count = await self.store.run(self._revoke_family, family)
+        self._revoked += count
+        return count
+
+    async def reap(self, limit: int = 1000,
+                   now: Optional[float] = None) -> int:
+        '''Remove at most `limit` expired tokens.
+
+        :returns: number of removed tokens'''
+        count = await self.store.run(self._reap, limit,
+                                     time() if now is None else now)
+        self._reaped += count
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        '''Returns total number of expired tokens `reaped` and of tokens
+        `revoked` by family revocation in this process.'''
+        return {'reaped': self._reaped, 'revoked': self._revoked}
+
+
+class SQLite(abc.Store):
+    '''SQLite store, shared by processes using the same database file.
+
+    :param str path: database file
+    :param float reap_interval: seconds between removing of expired
+        objects
+    :param int reap_batch: maximum of objects removed at once'''
+
+    def __init__(self,
+                 path: str = 'store.sqlite',
+                 reap_interval: float = 1.0,
+                 reap_batch: int = 1000):
+        self.path = path
+        self.providers = ProvidersCollection(self)
+        self.users = UsersCollection(self)
+        self.clients = ClientsCollection(self)
+        self.scopes = ScopesCollection(self)
+        self.access_codes = AccessCodeCollection(self)
+        self.refresh_tokens = RefreshTokenCollection(self)
+
+        self.reap_interval = reap_interval
+        self.reap_batch = reap_batch
+        self._executor = ThreadPoolExecutor(max_workers=1,
+                                            thread_name_prefix='store')
+        self._db: Optional[Connection] = None
+        self._reaper: Optional[Task] = None
+
+    def _connect(self) -> Connection:
+        if self._db is None:
+            logger.debug('Opening store database %s', self.path)
+            self._db = connect(self.path, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                self._db.execute(statement)
+        return self._db
+
+    def _close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        '''Runs `func(db, *args)` in database thread, where `db` is
+        connection to database.'''
+
+        def call():
+            return func(self._connect(), *args)
+
+        return await get_running_loop().run_in_executor(self._executor, call)
+
+    async def reaper(self) -> None:
+        while True:
+            try:
+                count = await self.access_codes.reap(self.reap_batch)
+                if count:
+                    logger.debug('Reaped %d access codes, stats: %s', count,
+                                 self.access_codes.stats())
+                tokens = await self.refresh_tokens.reap(self.reap_batch -
+                                                        count)
+                if tokens:
+                    logger.debug('Reaped %d refresh tokens, stats: %s',
+                                 tokens, self.refresh_tokens.stats())
+                count += tokens
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error('Error while reaping store: %s', e)
+                count = 0
+            if count < self.reap_batch:
+                await sleep(self.reap_interval)
+            else:
+                await sleep(0)
+
+    async def start(self) -> None:
+        await get_running_loop().run_in_executor(self._executor,
+                                                 self._connect)
+        if self._reaper is None:
+            self._reaper = create_task(self.reaper())
+
+    async def stop(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except CancelledError:
+                pass
+            self._reaper = None
+        await get_running_loop().run_in_executor(self._executor, self._close)
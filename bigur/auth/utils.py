@@ -2,14 +2,20 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
-from asyncio import Task, create_task
-from collections import defaultdict
+from asyncio import Future, ensure_future, shield
+from base64 import urlsafe_b64encode
+from collections import OrderedDict, defaultdict
 from dataclasses import asdict as asdict_core
+from hashlib import sha256
 from importlib import import_module
 from sys import modules
-from typing import Awaitable, Callable, Dict, List, Tuple, TypeVar
+from time import monotonic
+from typing import (Awaitable, Callable, Dict, Generic, Hashable, List,
+                    Optional, Tuple, TypeVar)
 
 T = TypeVar('T')
+K = TypeVar('K')
+V = TypeVar('V')
 
 
 def import_class(name: str):
@@ -93,13 +99,139 @@ def choice_content_type(ctypes: List[Tuple[str, float]],
     return needed[0]
 
 
-def call_async(func: Callable[[T], Awaitable[T]]) -> Callable[[T], Task]:
-    '''Returns function that creates task (:class:`asyncio.Task`) with
-    `func()` coroutine.
+def parse_cache_control(header_string: Optional[str]) -> Optional[int]:
+    '''Returns number of seconds response can be cached for, according
+    to `Cache-Control` header, or `None` if header does not limit it.'''
+    if not header_string:
+        return None
+    max_age: Optional[int] = None
+    for directive in header_string.split(','):
+        name, _, value = directive.strip().partition('=')
+        name = name.strip().lower()
+        if name in ('no-store', 'no-cache'):
+            return 0
+        elif name in ('max-age', 's-maxage') and max_age is None:
+            try:
+                max_age = max(int(value.strip().strip('"')), 0)
+            except ValueError:
+                continue
+    return max_age
 
-    :param func: async function'''
 
-    def invoke(value: T) -> Task:
-        return create_task(func(value))
+def make_etag(body: bytes) -> str:
+    '''Returns strong entity tag for response `body`.'''
+    return '"{}"'.format(
+        urlsafe_b64encode(sha256(body).digest()).rstrip(b'=').decode('ascii'))
 
-    return invoke
+
+def etag_matches(etag: str, header_string: Optional[str]) -> bool:
+    '''Returns `True` if `etag` matches `If-None-Match` header
+    (weak comparison, RFC 7232).'''
+    if not header_string:
+        return False
+    for tag in header_string.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag == etag:
+            return True
+        if tag.startswith('W/') and tag[2:] == etag:
+            return True
+    return False
+
+
+class SingleFlight(Generic[T]):
+    '''Coalesces concurrent calls with the same key: while call is in
+    progress, other callers with the same key wait for its result
+    instead of making their own call.'''
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def start(self, key: Hashable,
+              func: Callable[[], Awaitable[T]]) -> Future:
+        '''Starts call `func()` for `key` if it is not in progress yet.
+        Returns future with result of call.'''
+        try:
+            return self._calls[key]
+        except KeyError:
+            future = self._calls[key] = ensure_future(func())
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+            return future
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        '''Waits for result of call `func()` for `key`. Cancelling one
+        of waiters does not cancel the call itself.'''
+        return await shield(self.start(key, func))
+
+
+class LRUCache(Generic[K, V]):
+    '''Bounded mapping, which drops least recently used items.
+
+    :param int maxsize: maximum number of items
+    :param float ttl: seconds item lives in cache, forever if not set'''
+
+    def __init__(self, maxsize: int = 128, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items: 'OrderedDict[K, Tuple[V, float]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        try:
+            value, expires = self._items[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        if expires and expires <= monotonic():
+            del self._items[key]
+            self.misses += 1
+            return default
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        '''Puts `value` into cache for `ttl` seconds (default is
+        :attr:`ttl`).'''
+        if ttl is None:
+            ttl = self.ttl
+        self._items[key] = (value, monotonic() + ttl if ttl else 0.0)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        try:
+            return self._items.pop(key)[0]
+        except KeyError:
+            return default
+
+    def pop_value(self, value: V) -> int:
+        '''Removes all items with `value`, returns number of removed
+        items.'''
+        keys = [k for k, v in self._items.items() if v[0] == value]
+        for key in keys:
+            del self._items[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+    def stats(self) -> Dict[str, float]:
+        '''Returns cache size, hits, misses and hit ratio.'''
+        total = self.hits + self.misses
+        return {
+            'size': len(self._items),
+            'hits': self.hits,
+            'misses': self.misses,
+            'ratio': self.hits / total if total else 0.0,
+        }
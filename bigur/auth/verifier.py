@@ -0,0 +1,251 @@
+'''Verification of tokens, signed by :class:`~bigur.auth.signer.Signer`.
+It can be used by resource servers too: keys are loaded from JSON web
+key set by :meth:`TokenVerifier.from_jwks`.'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from hashlib import sha256
+from json import loads
+from time import time
+from typing import Any, Collection, Dict, Mapping, Optional, Union
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric.ec import (
+    ECDSA,
+    SECP256R1,
+    EllipticCurvePublicNumbers,
+)
+from cryptography.hazmat.primitives.asymmetric.ed25519 import (
+    Ed25519PublicKey,
+)
+from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicNumbers
+from cryptography.hazmat.primitives.asymmetric.utils import (
+    encode_dss_signature,
+)
+from cryptography.hazmat.primitives.hashes import SHA256
+from jwt.utils import base64url_decode
+
+from bigur.auth.oauth2.exceptions import InvalidToken
+from bigur.auth.revocation import RevocationList
+from bigur.auth.signer import (
+    ALGORITHMS,
+    ES256_SIZE,
+    PublicKey,
+    key_algorithm,
+)
+from bigur.auth.utils import LRUCache
+
+Claims = Dict[str, Any]
+
+
+def _int(value: str) -> int:
+    return int.from_bytes(base64url_decode(value), 'big')
+
+
+def parse_jwk(jwk: Dict[str, Any]) -> PublicKey:
+    '''Returns public key of RSA, EC P-256 or Ed25519 JWK, raises
+    :exc:`ValueError` if key is not supported.'''
+    kty, crv = jwk.get('kty'), jwk.get('crv')
+    try:
+        if kty == 'RSA':
+            return RSAPublicNumbers(_int(jwk['e']), _int(jwk['n'])).public_key(
+                default_backend())
+        if kty == 'EC' and crv == 'P-256':
+            return EllipticCurvePublicNumbers(
+                _int(jwk['x']), _int(jwk['y']),
+                SECP256R1()).public_key(default_backend())
+        if kty == 'OKP' and crv == 'Ed25519':
+            return Ed25519PublicKey.from_public_bytes(
+                base64url_decode(jwk['x']))
+    except (KeyError, TypeError) as exc:
+        raise ValueError('Invalid key: {}'.format(exc))
+    raise ValueError('Unsupported key type {} {}'.format(kty, crv or ''))
+
+
+class TokenVerifier:
+    '''Verifies tokens, signed with one of :data:`ALGORITHMS`:
+    signature by public key with token's `kid`, expiration, issuer and
+    audience. Token's algorithm must match type of the key, so token
+    can't be verified with key of other type. Verified tokens are
+    remembered by SHA-256 digest until they expire, so verification of
+    recently seen token costs one hash and cache lookup. Revocation is
+    checked for cached tokens too.
+
+    :param keys: mapping of key id to public key, it is read on every
+        cache miss, so it can be updated in place
+    :param str issuer: required `iss` claim, not checked if not set
+    :param str audience: value required in `aud` claim, not checked if
+        not set
+    :param float leeway: seconds of allowed clock skew
+    :param bool require_exp: reject tokens without `exp` claim
+    :param int maxsize: maximum number of cached tokens
+    :param revocations: list of revoked token ids, not checked if not
+        set
+    :param algorithms: accepted algorithms, all supported by default
+    :param bool access_token: accept only access tokens, which have
+        `client_id` and `scope` claims, so ID token signed by the same
+        key can't be used as access token'''
+
+    def __init__(self,
+                 keys: Mapping[str, PublicKey],
+                 issuer: Optional[str] = None,
+                 audience: Optional[str] = None,
+                 leeway: float = 0.0,
+                 require_exp: bool = True,
+                 maxsize: int = 10000,
+                 revocations: Optional[RevocationList] = None,
+                 algorithms: Collection[str] = ALGORITHMS,
+                 access_token: bool = False):
+        self.keys = keys
+        self.algorithms = frozenset(algorithms)
+        self.access_token = access_token
+        self.issuer = issuer
+        self.audience = audience
+        self.leeway = leeway
+        self.require_exp = require_exp
+        self.revocations = revocations
+        self._cache: LRUCache[bytes, Claims] = LRUCache(maxsize)
+        self._padding = PKCS1v15()
+        self._hash = SHA256()
+        self._ecdsa = ECDSA(self._hash)
+
+    @classmethod
+    def from_jwks(cls, jwks: Union[str, bytes, Dict[str, Any]],
+                  **kwargs) -> 'TokenVerifier':
+        '''Returns verifier with signing keys from JSON web key set
+        (e.g. `jwks_uri` document of provider). Keys of unsupported types
+        are skipped.'''
+        if not isinstance(jwks, dict):
+            jwks = loads(jwks)
+        keys = {}
+        for jwk in jwks.get('keys', []):
+            if jwk.get('use', 'sig') != 'sig':
+                continue
+            try:
+                keys[jwk.get('kid')] = parse_jwk(jwk)
+            except ValueError:
+                continue
+        return cls(keys, **kwargs)
+
+    def verify(self, token: Union[str, bytes]) -> Claims:
+        '''Returns claims of `token`, raises
+        :exc:`~bigur.auth.oauth2.exceptions.InvalidToken` if token is
+        not valid. Returned dict is shared by calls with the same token
+        and must not be changed.'''
+        if isinstance(token, str):
+            try:
+                token = token.encode('ascii')
+            except UnicodeEncodeError:
+                raise InvalidToken('Malformed token.')
+        digest = sha256(token).digest()
+        now = time()
+
+        claims = self._cache.get(digest)
+        if claims is None:
+            claims = self._verify(token, now)
+            exp = claims.get('exp')
+            self._cache.set(digest, claims,
+                            None if exp is None else exp + self.leeway - now)
+        else:
+            exp = claims.get('exp')
+            if exp is not None and exp + self.leeway <= now:
+                self._cache.pop(digest)
+                raise InvalidToken('Token expired.')
+
+        revocations = self.revocations
+        if revocations is not None and revocations.is_revoked(
+                claims.get('jti'), exp, now):
+            raise InvalidToken('Token revoked.')
+        return claims
+
+    def _verify(self, token: bytes, now: float) -> Claims:
+        try:
+            signing_input, _, signature = token.rpartition(b'.')
+            header_segment, _, payload = signing_input.partition(b'.')
+            header = loads(base64url_decode(header_segment))
+            if not isinstance(header, dict) or not payload:
+                raise ValueError('Invalid header')
+            alg = header.get('alg')
+            if alg not in self.algorithms:
+                raise InvalidToken('Unsupported algorithm.')
+            key = self.get_key(header.get('kid'))
+            if key_algorithm(key) != alg:
+                raise InvalidToken('Algorithm does not match key.')
+            self._verify_signature(alg, key, base64url_decode(signature),
+                                   signing_input)
+            claims = loads(base64url_decode(payload))
+            if not isinstance(claims, dict):
+                raise ValueError('Invalid payload')
+        except InvalidSignature:
+            raise InvalidToken('Invalid signature.')
+        except (TypeError, ValueError):
+            raise InvalidToken('Malformed token.')
+
+        leeway = self.leeway
+        exp = claims.get('exp')
+        if exp is None:
+            if self.require_exp:
+                raise InvalidToken('Token has no expiration time.')
+        elif not isinstance(exp, (int, float)):
+            raise InvalidToken('Malformed token.')
+        elif exp + leeway <= now:
+            raise InvalidToken('Token expired.')
+
+        nbf = claims.get('nbf')
+        if isinstance(nbf, (int, float)) and nbf - leeway > now:
+            raise InvalidToken('Token is not yet valid.')
+
+        if self.issuer is not None and claims.get('iss') != self.issuer:
+            raise InvalidToken('Invalid issuer.')
+
+        if self.audience is not None:
+            aud = claims.get('aud')
+            if isinstance(aud, str):
+                aud = [aud]
+            if not isinstance(aud, list) or self.audience not in aud:
+                raise InvalidToken('Invalid audience.')
+
+        if self.access_token and (
+                'client_id' not in claims or 'scope' not in claims or
+                'nonce' in claims or 'at_hash' in claims):
+            raise InvalidToken('Not an access token.')
+
+        return claims
+
+    def _verify_signature(self, alg: str, key: PublicKey, signature: bytes,
+                          signing_input: bytes) -> None:
+        if alg == 'RS256':
+            key.verify(signature, signing_input, self._padding, self._hash)
+        elif alg == 'ES256':
+            if len(signature) != 2 * ES256_SIZE:
+                raise InvalidSignature()
+            key.verify(
+                encode_dss_signature(
+                    int.from_bytes(signature[:ES256_SIZE], 'big'),
+                    int.from_bytes(signature[ES256_SIZE:], 'big')),
+                signing_input, self._ecdsa)
+        else:
+            key.verify(signature, signing_input)
+
+    def get_key(self, kid: Optional[str]) -> PublicKey:
+        '''Returns public key with `kid`. Token without `kid` can be
+        verified only if there is one key.'''
+        keys = self.keys
+        try:
+            if kid is None and len(keys) == 1:
+                return next(iter(keys.values()))
+            return keys[kid]
+        except KeyError:
+            raise InvalidToken('Unknown signing key.')
+
+    def clear(self) -> None:
+        '''Forget verified tokens.'''
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, float]:
+        '''Returns counters of verified tokens cache.'''
+        return self._cache.stats()
@@ -0,0 +1,166 @@
+'''Multi-process server mode. Master process forks workers, each runs
+its own event loop and listens on the same address with `SO_REUSEPORT`,
+so kernel balances connections between them. Everything loaded before
+:meth:`Supervisor.run` (configuration, keys) is shared by workers, but
+state changed while serving requests is not: stores keeping it in
+process memory can't be used with more than one worker (see
+:func:`unshared_state`), SQLite stores and revocation list backed by
+SQLite database are shared.'''
+
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Business group for development management'
+__licence__ = 'For license information see LICENSE'
+
+from logging import getLogger
+from os import WNOHANG, _exit, fork, kill, waitpid
+from os import WEXITSTATUS, WIFEXITED, WIFSIGNALED, WTERMSIG
+from signal import SIGHUP, SIGINT, SIGKILL, SIGTERM, SIG_DFL, signal
+from time import monotonic, sleep
+from typing import Any, Callable, Dict, List, Optional
+
+from bigur.auth.revocation import RevocationList
+from bigur.auth.session import MemorySessionStore
+from bigur.auth.store import Memory
+
+logger = getLogger(__name__)
+
+
+def unshared_state(store: Any, sessions: Any, revocations: Any) -> List[str]:
+    '''Returns descriptions of stores, which keep state in process
+    memory. Workers using them would not see each other's access codes,
+    clients, sessions or revoked tokens.'''
+    problems = []
+    if isinstance(store, Memory):
+        problems.append('store.class is memory store')
+    if isinstance(sessions, MemorySessionStore):
+        problems.append('session.class is memory session store')
+    if isinstance(revocations, RevocationList) and revocations.path is None:
+        problems.append('oauth2.revocation.path is not set')
+    return problems
+
+
+class Supervisor:
+    '''Runs `target` in forked worker processes and restarts workers
+    which exit. `SIGHUP` is forwarded to workers, on `SIGTERM` or
+    `SIGINT` workers are asked to stop with `SIGTERM` and killed if they
+    are still running after `shutdown_timeout` seconds.
+
+    :param target: function, which runs server in worker
+    :param int workers: number of workers
+    :param float restart_delay: seconds to wait before restarting a
+        worker which exited in less than :attr:`min_uptime` seconds, so
+        crashing worker does not spin
+    :param float shutdown_timeout: seconds to wait for workers on
+        shutdown'''
+
+    #: Worker which lived less seconds is restarted with delay.
+    min_uptime = 1.0
+
+    #: Seconds between checks of workers' state.
+    poll_interval = 0.1
+
+    def __init__(self,
+                 target: Callable[[], None],
+                 workers: int,
+                 restart_delay: float = 1.0,
+                 shutdown_timeout: float = 60.0):
+        self.target = target
+        self.workers = workers
+        self.restart_delay = restart_delay
+        self.shutdown_timeout = shutdown_timeout
+        self.restarts = 0
+        self._pids: Dict[int, float] = {}
+        self._pending: List[float] = []
+        self._deadline: Optional[float] = None
+
+    @property
+    def pids(self) -> List[int]:
+        return list(self._pids)
+
+    def spawn(self) -> int:
+        '''Fork worker, returns its pid.'''
+        pid = fork()
+        if pid == 0:  # pragma: no cover
+            for signum in (SIGHUP, SIGINT, SIGTERM):
+                signal(signum, SIG_DFL)
+            code = 0
+            try:
+                self.target()
+            except BaseException:  # pylint: disable=broad-except
+                logger.exception('Worker failed')
+                code = 1
+            finally:
+                _exit(code)
+        logger.info('Worker %d started', pid)
+        self._pids[pid] = monotonic()
+        return pid
+
+    def send(self, signum: int) -> None:
+        '''Send signal to all workers.'''
+        for pid in self._pids:
+            try:
+                kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def stop(self, signum: int = SIGTERM, frame=None) -> None:
+        '''Start graceful shutdown of workers.'''
+        if self._deadline is None:
+            logger.info('Stopping workers')
+            self._deadline = monotonic() + self.shutdown_timeout
+        self.send(SIGTERM)
+
+    def reload(self, signum: int = SIGHUP, frame=None) -> None:
+        logger.info('Forwarding SIGHUP to workers')
+        self.send(SIGHUP)
+
+    def reap(self) -> None:
+        '''Collect exited workers, schedule restart if not stopping.'''
+        while self._pids:
+            pid, status = waitpid(-1, WNOHANG)
+            if pid == 0:
+                break
+            started = self._pids.pop(pid, None)
+            if started is None:
+                continue
+            if WIFSIGNALED(status):
+                reason = 'killed by signal {}'.format(WTERMSIG(status))
+            elif WIFEXITED(status):
+                reason = 'exited with code {}'.format(WEXITSTATUS(status))
+            else:  # pragma: no cover
+                reason = 'exited'
+            if self._deadline is not None:
+                logger.info('Worker %d %s', pid, reason)
+                continue
+            logger.error('Worker %d %s, restarting', pid, reason)
+            self.restarts += 1
+            now = monotonic()
+            if now - started < self.min_uptime:
+                self._pending.append(now + self.restart_delay)
+            else:
+                self._pending.append(now)
+
+    def run(self) -> None:
+        '''Start workers and supervise them until shutdown.'''
+        signal(SIGTERM, self.stop)
+        signal(SIGINT, self.stop)
+        signal(SIGHUP, self.reload)
+        try:
+            for _ in range(self.workers):
+                self.spawn()
+            while self._pids or (self._pending and self._deadline is None):
+                self.reap()
+                now = monotonic()
+                for due in [x for x in self._pending if x <= now]:
+                    self._pending.remove(due)
+                    if self._deadline is None:
+                        self.spawn()
+                if self._deadline is not None and now > self._deadline:
+                    logger.warning('Killing workers after shutdown timeout')
+                    self.send(SIGKILL)
+                    self._deadline = now + self.shutdown_timeout
+                sleep(self.poll_interval)
+        finally:
+            for signum in (SIGHUP, SIGINT, SIGTERM):
+                signal(signum, SIG_DFL)
+        logger.info('All workers stopped')
@@ -172,7 +172,6 @@ intersphinx_mapping = {
     'aiohttp': ('https://aiohttp.readthedocs.io/en/stable/', None),
     'multidict': ('https://multidict.readthedocs.io/en/stable/', None),
     'python': ('https://docs.python.org/', None),
-    'rxpy': ('https://rxpy.readthedocs.io/en/latest/', None),
 }
 
 autodoc_member_order = 'bysource'
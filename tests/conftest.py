@@ -30,6 +30,13 @@ def debug(caplog):
 
 
 # Cryptography
+@fixture(scope='session', autouse=True)
+def password_hasher():
+    '''Cheap scrypt parameters, to speed up tests.'''
+    from bigur.auth.password import set_hasher
+    return set_hasher('scrypt', n=2**10, r=8, p=1)
+
+
 @fixture(scope='module')
 def jwt_key():
     logger.debug('Generating new JWT key')
@@ -55,6 +62,7 @@ def config():
             },
             'oidc': {
                 'provider_protocol': 'http',
+                'discovery_min_ttl': 0,
             }
         },
         'http_server': {
@@ -101,13 +109,18 @@ def app(loop, config, store, jwt_key, cookie_key):
     from aiohttp.web import Application
     from aiohttp_jinja2 import setup as jinja_setup
     from jinja2 import FileSystemLoader
-    from rx.scheduler.eventloop import AsyncIOScheduler
+    from bigur.auth.config import Settings, set_settings
+    from bigur.auth.http_client import http_client
+    from bigur.auth.key_jar import KeyJar
     from bigur.auth.middlewares import session
+    from bigur.auth.session import MemorySessionStore, sessions
+    sessions.set_store(MemorySessionStore())
     app = Application(middlewares=[session])
     app['config'] = config
+    set_settings(Settings.from_config(config))
+    KeyJar(keys=[jwt_key])
     app['jwt_keys'] = [jwt_key]
     app['cookie_key'] = cookie_key
-    app['scheduler'] = AsyncIOScheduler(loop)
     app['provider'] = {}
     templates = normpath(dirname(__file__) + '/../templates')
     jinja_setup(app, loader=FileSystemLoader(templates))
@@ -130,6 +143,24 @@ def app(loop, config, store, jwt_key, cookie_key):
 
     app['store'] = WarnWrapper()
 
+    async def start_http_client(app):
+        await http_client.start()
+
+    async def stop_http_client(app):
+        await http_client.stop()
+
+    app.on_startup.append(start_http_client)
+    app.on_cleanup.append(stop_http_client)
+
+    async def start_sessions(app):
+        await sessions.start()
+
+    async def stop_sessions(app):
+        await sessions.stop()
+
+    app.on_startup.append(start_sessions)
+    app.on_cleanup.append(stop_sessions)
+
     return app
 
 
@@ -246,11 +277,10 @@ async def login(cli, user):
 async def stub_endpoint(app):
     from dataclasses import dataclass
     from typing import Optional
-    from rx import return_value
-    from rx import operators as op
     from bigur.auth.handler.base import OAuth2Handler
     from bigur.auth.oauth2.request import OAuth2Request
     from bigur.auth.oauth2.response import OAuth2Response
+    from bigur.auth.pipeline import Pipeline
 
     @dataclass
     class StubRequest(OAuth2Request):
@@ -260,9 +290,7 @@ async def stub_endpoint(app):
     class StubResponse(OAuth2Response):
         test: Optional[str] = None
 
-    def create_stub_stream(context):
-        return return_value(context).pipe(
-            op.map(lambda x: StubResponse(test='passed')))
+    create_stub_stream = Pipeline(lambda x: StubResponse(test='passed'))
 
     class StubHandler(OAuth2Handler):
 
@@ -0,0 +1,161 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import sleep
+from base64 import urlsafe_b64encode
+from os import urandom
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers import Cipher
+from cryptography.hazmat.primitives.ciphers.algorithms import AES
+from cryptography.hazmat.primitives.ciphers.modes import CBC
+from pytest import fixture, mark, raises
+
+from bigur.auth.authn.user.base import (BLOCK_SIZE, VERSION_GCM, CookieCache,
+                                        CookieCodec, crypt, decrypt, get_codec)
+from bigur.auth.config import Settings, set_settings
+
+# pylint: disable=redefined-outer-name
+
+
+def crypt_cbc(key: bytes, value: str) -> bytes:
+    iv = urandom(BLOCK_SIZE)
+    encryptor = Cipher(AES(key), CBC(iv), backend=default_backend()).encryptor()
+    padder = padding.PKCS7(BLOCK_SIZE * 8).padder()
+    padded = padder.update(value.encode('utf-8')) + padder.finalize()
+    return iv + encryptor.update(padded) + encryptor.finalize()
+
+
+@fixture
+def key():
+    return urandom(32)
+
+
+@fixture(autouse=True)
+def settings(config):
+    set_settings(Settings.from_config(config))
+
+
+class TestCookieCodec(object):
+    '''Test encryption of cookies.'''
+
+    def test_round_trip(self, key):
+        codec = CookieCodec(key)
+        value = codec.encode('user')
+        assert value[0] == VERSION_GCM
+        assert codec.decode(value) == 'user'
+        assert codec.encode('user') != value
+
+    def test_tampered(self, key):
+        codec = CookieCodec(key)
+        value = bytearray(codec.encode('user'))
+        value[5] ^= 1
+        with raises(ValueError):
+            codec.decode(bytes(value))
+
+    def test_wrong_key(self, key):
+        value = CookieCodec(key).encode('user')
+        with raises(ValueError):
+            CookieCodec(urandom(32)).decode(value)
+
+    def test_legacy(self, key):
+        value = crypt_cbc(key, 'user')
+        assert CookieCodec(key).decode(value) == 'user'
+        with raises(ValueError):
+            CookieCodec(key, legacy=False).decode(value)
+
+    def test_legacy_version_byte(self, key):
+        # CBC value, which starts with version byte of GCM value, is
+        # not retried as CBC
+        value = crypt_cbc(key, 'user')
+        while value[0] != VERSION_GCM:
+            value = crypt_cbc(key, 'user')
+        with raises(ValueError):
+            CookieCodec(key).decode(value)
+
+    def test_short(self, key):
+        with raises(ValueError):
+            CookieCodec(key).decode(b'')
+        with raises(ValueError):
+            CookieCodec(key).decode(bytes((VERSION_GCM,)))
+
+    def test_functions(self, key):
+        assert get_codec(key) is get_codec(key)
+        assert decrypt(key, crypt(key, 'user')) == 'user'
+        assert decrypt(key, crypt_cbc(key, 'user')) == 'user'
+
+    def test_legacy_setting(self, key, config):
+        cookie = config.configuration_data['authn']['cookie']
+        cookie['legacy_cbc'] = False
+        try:
+            set_settings(Settings.from_config(config))
+            assert decrypt(key, crypt(key, 'user')) == 'user'
+            with raises(ValueError):
+                decrypt(key, crypt_cbc(key, 'user'))
+        finally:
+            del cookie['legacy_cbc']
+
+
+def create_cookie(key: bytes, user_id: str) -> str:
+    return urlsafe_b64encode(crypt(key, user_id)).decode('utf-8')
+
+
+class TestCookieCache(object):
+    '''Test cache of decrypted cookies.'''
+
+    def test_decrypt(self, key):
+        cache = CookieCache()
+        cookie = create_cookie(key, 'user')
+        assert cache.decrypt(key, cookie) == 'user'
+        assert cache.decrypt(key, cookie) == 'user'
+        assert cache.stats() == {
+            'size': 1,
+            'hits': 1,
+            'misses': 1,
+            'ratio': 0.5
+        }
+
+    def test_other_key(self, key):
+        cache = CookieCache()
+        cookie = create_cookie(key, 'user')
+        assert cache.decrypt(key, cookie) == 'user'
+        with raises(ValueError):
+            cache.decrypt(urandom(32), cookie)
+
+    def test_invalid(self, key):
+        cache = CookieCache()
+        with raises(ValueError):
+            cache.decrypt(key, 'invalid')
+        assert cache.stats()['size'] == 0
+
+    def test_revoke(self, key):
+        cache = CookieCache()
+        first = create_cookie(key, 'user')
+        second = create_cookie(key, 'user')
+        other = create_cookie(key, 'other')
+        for cookie in (first, second, other):
+            cache.decrypt(key, cookie)
+        assert cache.revoke('user') == 2
+        assert cache.stats()['size'] == 1
+        assert cache.revoke('user') == 0
+        assert cache.decrypt(key, other) == 'other'
+
+    @mark.asyncio
+    async def test_ttl(self, key):
+        cache = CookieCache(ttl=0.01)
+        cookie = create_cookie(key, 'user')
+        cache.decrypt(key, cookie)
+        await sleep(0.02)
+        cache.decrypt(key, cookie)
+        assert cache.stats()['misses'] == 2
+
+    def test_configure(self, key):
+        cache = CookieCache()
+        cache.decrypt(key, create_cookie(key, 'user'))
+        cache.configure(maxsize=1, ttl=10)
+        assert cache.stats()['size'] == 0
+        cache.decrypt(key, create_cookie(key, 'user'))
+        cache.decrypt(key, create_cookie(key, 'other'))
+        assert cache.stats()['size'] == 1
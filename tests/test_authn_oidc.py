@@ -8,12 +8,17 @@ from hashlib import sha1
 from re import match, DOTALL, MULTILINE
 from urllib.parse import urlparse, parse_qs
 
+from asyncio import gather, sleep
+
 from pytest import fixture, mark
 
 from aiohttp.web import View, json_response
+from jwt import encode
 
 from bigur.auth.authn.user import OpenIDConnect
+from bigur.auth.authn.user.oidc import discovery
 from bigur.auth.authn.user.base import crypt, decrypt
+from bigur.auth.config import Settings, set_settings
 from bigur.auth.handler.base import OAuth2Handler
 
 # pylint: disable=unused-argument,redefined-outer-name
@@ -23,7 +28,10 @@ class ProviderOpenIDConfigHandler(View):
 
     async def get(self):
         host = self.request.host
-        return json_response({
+        stub = self.request.app['provider']
+        stub['discovery'] = stub.get('discovery', 0) + 1
+        await sleep(stub.get('delay', 0))
+        return json_response(headers=stub.get('headers'), data={
             'issuer': 'http://{}'.format(host),
             'authorization_endpoint': 'http://{}/provider/auth'.format(host),
             'token_endpoint': 'http://{}/provider/token'.format(host),
@@ -66,10 +74,9 @@ class ProviderTokenHandler(View):
         params = await self.request.post()
         assert params.get('code') == '123'
         token = app['provider']['token']
-        return json_response({
-            'token_type': 'bearer',
-            'id_token': token.encode(app['jwt_keys'][0]).decode('utf-8')
-        })
+        if not isinstance(token, str):
+            token = token.encode(app['jwt_keys'][0]).decode('utf-8')
+        return json_response({'token_type': 'bearer', 'id_token': token})
 
 
 class AuthorizeTestHandler(OAuth2Handler):
@@ -112,6 +119,7 @@ def authn_oidc_routing(config, app):
     config.configuration_data['http_server']['endpoints']['oidc'] = {
         'path': '/auth/oidc'
     }
+    set_settings(Settings.from_config(config))
 
 
 @fixture
@@ -210,3 +218,79 @@ class TestOIDCAuthn:
         assert 'text/html; charset=utf-8' == response.headers['Content-Type']
         assert match(r'.*<form.*>.*</form>.*', await response.text(),
                      DOTALL | MULTILINE) is not None
+
+    @mark.asyncio
+    async def test_token_without_kid(self, app, authn_oidc, cli, token):
+        # Header without kid redirects with error, not 500
+        app['provider']['token'] = encode(token.payload(),
+                                          app['jwt_keys'][0],
+                                          algorithm='RS256').decode('utf-8')
+        state = {
+            'n': 'test nonce',
+            'u': '/auth/authorize',
+            'p': {
+                'acr_values': 'idp:localhost:{}'.format(cli.port)
+            },
+        }
+        response = await cli.get(
+            '/auth/oidc',
+            params={
+                'acr_values':
+                    'idp:localhost:{}'.format(cli.port),
+                'code':
+                    '123',
+                'state':
+                    urlsafe_b64encode(crypt(app['cookie_key'],
+                                            dumps(state))).decode('utf-8'),
+            },
+            allow_redirects=False)
+        assert 303 == response.status
+        query = parse_qs(urlparse(response.headers['Location']).query)
+        assert ['bigur_oidc_provider_error'] == query['error']
+        assert ['Can\'t get key with kid None'] == query['error_description']
+
+    @mark.asyncio
+    async def test_concurrent_discovery(self, app, store, authn_oidc, cli):
+        discovery.clear()
+        app['provider']['delay'] = 0.05
+        domain = 'localhost:{}'.format(cli.port)
+        responses = await gather(*[
+            cli.get('/auth/authorize',
+                    params={
+                        'client_id': 'blah',
+                        'acr_values': 'idp:{}'.format(domain),
+                    },
+                    allow_redirects=False) for _ in range(5)
+        ])
+        assert [303] * 5 == [x.status for x in responses]
+        assert 1 == app['provider']['discovery']
+        assert 1 == len([
+            x for x in store.providers._db.values()  # pylint: disable=W0212
+            if domain in x.domains
+        ])
+
+    @mark.asyncio
+    async def test_discovery_cache_control(self, app, store, authn_oidc, cli):
+        discovery.clear()
+        app['provider']['headers'] = {'Cache-Control': 'max-age=0'}
+        domain = 'localhost:{}'.format(cli.port)
+        params = {'client_id': 'blah', 'acr_values': 'idp:{}'.format(domain)}
+
+        response = await cli.get(
+            '/auth/authorize', params=params, allow_redirects=False)
+        assert 303 == response.status
+        assert 1 == app['provider']['discovery']
+
+        # Document is expired, provider is refreshed in background
+        app['provider']['headers'] = {'Cache-Control': 'max-age=3600'}
+        response = await cli.get(
+            '/auth/authorize', params=params, allow_redirects=False)
+        assert 303 == response.status
+        await sleep(0.05)
+        assert 2 == app['provider']['discovery']
+
+        response = await cli.get(
+            '/auth/authorize', params=params, allow_redirects=False)
+        assert 303 == response.status
+        await sleep(0.05)
+        assert 2 == app['provider']['discovery']
@@ -2,10 +2,21 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
+from time import time
+from uuid import uuid4
+
 from aiohttp.web import Response, View
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric.rsa import generate_private_key
 from pytest import fixture, mark
+from yarl import URL
 
 from bigur.auth.authn import authenticate_end_user
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.oauth2.grant.implicit import OAuth2RSAJWT
+from bigur.auth.oidc.grant.implicit import IDToken
+
+# pylint: disable=redefined-outer-name
 
 
 class EchoHandler(View):
@@ -20,6 +31,18 @@ def routing(app):
     app.router.add_route('*', '/auth/test', EchoHandler)
 
 
+@fixture
+def token(config, user, client):
+    return OAuth2RSAJWT(
+        sub=str(user.id),
+        scope=['email'],
+        iss=config.get('oidc.iss'),
+        jti=uuid4().hex,
+        client_id=str(client.id),
+        iat=int(time()),
+        exp=int(time()) + 600)
+
+
 class TestTokenAuthn:
 
     @mark.asyncio
@@ -31,3 +54,68 @@ class TestTokenAuthn:
             allow_redirects=False)
         assert 200 == response.status
         assert 'test passed' == (await response.text())
+
+    @mark.asyncio
+    async def test_cached(self, app, routing, cli, token):
+        token_bytes = token.encode(app['jwt_keys'][0]).decode('utf-8')
+        verifier = KeyJar.instance().verifier
+        misses = verifier.stats()['misses']
+        for _ in range(3):
+            response = await cli.get(
+                '/auth/test',
+                headers={'Authorization': 'bearer  {}'.format(token_bytes)},
+                allow_redirects=False)
+            assert 200 == response.status
+        # Signature is verified once
+        assert verifier.stats()['misses'] == misses + 1
+
+    @mark.asyncio
+    async def test_id_token(self, app, routing, cli, user, config):
+        # ID token, issued to any client, can't be used as access token
+        id_token = IDToken(
+            iss=config.get('oidc.iss'),
+            sub=str(user.id),
+            aud='some-other-client',
+            nonce='nonce',
+            iat=int(time()),
+            exp=int(time()) + 600).encode(app['jwt_keys'][0])
+        response = await cli.get(
+            '/auth/test',
+            headers={'Authorization': 'Bearer {}'.format(
+                id_token.decode('utf-8'))},
+            allow_redirects=False)
+        assert 303 == response.status
+        location = URL(response.headers['Location'])
+        assert location.query['error_description'] == 'Not an access token.'
+
+    @mark.asyncio
+    async def test_invalid(self, app, routing, cli, token, config):
+        valid = token.encode(app['jwt_keys'][0]).decode('utf-8')
+        token.exp = int(time()) - 10
+        expired = token.encode(app['jwt_keys'][0]).decode('utf-8')
+        token.exp = int(time()) + 600
+        token.iss = 'https://example.com'
+        foreign = token.encode(app['jwt_keys'][0]).decode('utf-8')
+        other_key = generate_private_key(
+            public_exponent=65537, key_size=2048, backend=default_backend())
+        token.iss = config.get('oidc.iss')
+        unknown = token.encode(other_key).decode('utf-8')
+
+        for header, reason in (
+            ('Bearer {}'.format(valid[:-4] + 'AAAA'), 'Invalid signature.'),
+            ('Bearer {}'.format(expired), 'Token expired.'),
+            ('Bearer {}'.format(foreign), 'Invalid issuer.'),
+            ('Bearer {}'.format(unknown), 'Unknown signing key.'),
+            ('Basic {}'.format(valid), 'Bearer token required.'),
+            ('Bearer', 'Bearer token required.'),
+            ('Bearer abc', 'Malformed token.'),
+        ):
+            response = await cli.get(
+                '/auth/test',
+                headers={'Authorization': header},
+                allow_redirects=False)
+            assert 303 == response.status, header
+            location = URL(response.headers['Location'])
+            assert location.path == '/auth/login'
+            assert location.query['error'] == 'bigur_token_error'
+            assert location.query['error_description'] == reason
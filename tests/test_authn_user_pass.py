@@ -2,21 +2,23 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
-from base64 import urlsafe_b64decode
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from re import match, DOTALL, MULTILINE
 from urllib.parse import urlparse, parse_qs
 
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import padding
-from cryptography.hazmat.primitives.ciphers.algorithms import AES
-from cryptography.hazmat.primitives.ciphers.modes import CBC
-from cryptography.hazmat.primitives.ciphers import Cipher
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
-from pytest import mark
+from pytest import fixture, mark
 
-from bigur.auth.authn.user.base import BLOCK_SIZE
+from bigur.auth.authn.user.base import NONCE_SIZE, VERSION_GCM, crypt
+from bigur.auth.handler.oauth2 import AuthorizationHandler
 
-# TODO: test can't decrypt cookie
+# pylint: disable=unused-argument,redefined-outer-name
+
+
+@fixture
+def authorization_endpoint(app):
+    app.router.add_route('*', '/auth/authorize', AuthorizationHandler)
 
 
 class TestUserPass:
@@ -110,18 +112,28 @@ class TestUserPass:
         cookie = response.cookies['uid']
 
         value = urlsafe_b64decode(cookie.value)
-        iv = value[:BLOCK_SIZE]
-        data = value[BLOCK_SIZE:]
-
-        backend = default_backend()
-        cipher = Cipher(AES(app['cookie_key']), CBC(iv), backend=backend)
-        decryptor = cipher.decryptor()
-        padded = decryptor.update(data) + decryptor.finalize()
-        unpadder = padding.PKCS7(BLOCK_SIZE * 8).unpadder()
-        userid = unpadder.update(padded) + unpadder.finalize()
+        assert value[0] == VERSION_GCM
+        nonce = value[1:1 + NONCE_SIZE]
+        userid = AESGCM(app['cookie_key']).decrypt(
+            nonce, value[1 + NONCE_SIZE:], None)
 
         assert userid.decode('utf-8') == user.id
 
+    @mark.asyncio
+    async def test_tampered_cookie(self, app, user, authn_userpass,
+                                   authorization_endpoint, cli):
+        value = bytearray(crypt(app['cookie_key'], user.id))
+        value[-1] ^= 1
+        cli.session.cookie_jar.update_cookies(
+            {'uid': urlsafe_b64encode(bytes(value)).decode('utf-8')})
+
+        response = await cli.get(
+            '/auth/authorize?scope=openid&response_type=code',
+            allow_redirects=False)
+
+        assert response.status == 303
+        assert urlparse(response.headers['Location']).path == '/auth/login'
+
     @mark.asyncio
     async def test_bad_redirect_after_login(self, user, authn_userpass, cli):
         response = await cli.post(
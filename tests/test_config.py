@@ -0,0 +1,102 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from kaptan import Kaptan
+from pytest import fixture, raises
+
+from bigur.auth.config import Settings, get_settings, reload
+from bigur.auth.config import config as global_config
+from bigur.auth.config import reload_callbacks, set_settings
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+
+def create_config(data):
+    cfg = Kaptan()
+    cfg.import_config(data)
+    return cfg
+
+
+@fixture
+def settings(config):
+    data = global_config.configuration_data
+    set_settings(Settings.from_config(config))
+    yield get_settings()
+    global_config.configuration_data = data
+    set_settings(Settings.from_config(config))
+
+
+class TestSettings(object):
+    '''Test settings, compiled from configuration.'''
+
+    def test_defaults(self):
+        settings = Settings.from_config(
+            create_config({
+                'http_server': {
+                    'endpoints': {
+                        'login': {
+                            'path': '/login'
+                        }
+                    }
+                }
+            }))
+        assert settings.login_path == '/login'
+        assert settings.cookie_secure is False
+        assert settings.cookie_id_name == 'uid'
+        assert settings.static_prefix == '/'
+        assert settings.issuer is None
+        assert settings.jwks_max_age == 3600
+
+    def test_immutable(self, settings):
+        with raises(AttributeError):
+            settings.login_path = '/other'  # type: ignore
+        with raises(AttributeError):
+            settings.extra = 1  # type: ignore
+
+    def test_login_path_required(self):
+        with raises(ValueError):
+            Settings.from_config(create_config({}))
+
+    def test_invalid_type(self):
+        with raises(ValueError):
+            Settings.from_config(
+                create_config({
+                    'authn': {
+                        'cookie': {
+                            'max_age': '3600'
+                        }
+                    },
+                    'http_server': {
+                        'endpoints': {
+                            'login': {
+                                'path': '/login'
+                            }
+                        }
+                    }
+                }))
+
+    def test_reload(self, tmpdir, settings):
+        filename = tmpdir.join('auth.yaml')
+        filename.write('http_server:\n'
+                       '  endpoints:\n'
+                       '    login:\n'
+                       '      path: /reloaded\n')
+        called = []
+        reload_callbacks.append(lambda: called.append(get_settings()))
+        try:
+            reload(str(filename))
+        finally:
+            reload_callbacks.pop()
+        assert get_settings() is not settings
+        assert get_settings().login_path == '/reloaded'
+        assert called == [get_settings()]
+        path = global_config.get('http_server.endpoints.login.path')
+        assert path == '/reloaded'
+
+    def test_reload_invalid(self, tmpdir, settings):
+        filename = tmpdir.join('auth.yaml')
+        filename.write('oidc:\n  iss: 1\n')
+        with raises(ValueError):
+            reload(str(filename))
+        assert get_settings() is settings
@@ -0,0 +1,107 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import sleep
+
+from aiohttp.test_utils import TestServer
+from aiohttp.web import Application, json_response
+from pytest import fixture, mark, raises
+
+from bigur.auth.authn.user.oidc import ConfigurationError, Discovery
+from bigur.auth.http_client import HTTPClient
+from bigur.auth.model import Provider
+
+# pylint: disable=redefined-outer-name
+
+
+@fixture
+async def stub_provider():
+    '''Stub provider, which records client's address of each request.'''
+    peers = []
+
+    async def keys(request):
+        peers.append(request.transport.get_extra_info('peername'))
+        return json_response({'keys': [{'kid': '1', 'kty': 'RSA'}]})
+
+    async def slow(request):
+        await sleep(0.2)
+        return json_response({})
+
+    app = Application()
+    app.router.add_get('/keys', keys)
+    app.router.add_get('/slow', slow)
+    server = TestServer(app)
+    await server.start_server()
+    server.peers = peers
+    yield server
+    await server.close()
+
+
+@fixture
+async def http_client():
+    client = HTTPClient(limit_per_host=1)
+    await client.start()
+    yield client
+    await client.stop()
+
+
+class TestHTTPClient:
+    '''Test shared HTTP client.'''
+
+    @mark.asyncio
+    async def test_reuse_connection(self, http_client, stub_provider):
+        url = str(stub_provider.make_url('/keys'))
+        for _ in range(5):
+            async with http_client.get(url) as response:
+                assert response.status == 200
+                await response.json()
+        assert len(stub_provider.peers) == 5
+        assert len(set(stub_provider.peers)) == 1
+
+    @mark.asyncio
+    async def test_provider_keys(self, monkeypatch, http_client,
+                                 stub_provider):
+        monkeypatch.setattr('bigur.auth.model.provider.http_client',
+                            http_client)
+        provider = Provider(
+            issuer='http://localhost',
+            authorization_endpoint='http://localhost/auth',
+            jwks_uri=str(stub_provider.make_url('/keys')),
+            response_types_supported=['id_token'],
+            subject_types_supported=['public'],
+            id_token_signing_alg_values_supported=['RS256'],
+            client_id='client',
+            client_secret='secret')
+        for _ in range(3):
+            await provider.update_keys()
+        assert provider.get_key('1') == {'kid': '1', 'kty': 'RSA'}
+        assert len(set(stub_provider.peers)) == 1
+
+    @mark.asyncio
+    async def test_timeout(self, monkeypatch, stub_provider):
+        client = HTTPClient(timeout=0.05)
+        monkeypatch.setattr('bigur.auth.authn.user.oidc.http_client', client)
+        try:
+            with raises(ConfigurationError):
+                await Discovery().fetch(
+                    str(stub_provider.make_url('/slow')), 60, 0)
+        finally:
+            await client.stop()
+        # Let abandoned request finish before server closes
+        await sleep(0.2)
+
+    @mark.asyncio
+    async def test_stop(self, http_client):
+        session = http_client.session
+        await http_client.stop()
+        assert session.closed
+        assert http_client.session is not session
+
+    def test_configure(self):
+        client = HTTPClient()
+        client.configure(limit_per_host=2, timeout=1)
+        assert client.limit_per_host == 2
+        assert client.timeout == 1
+        with raises(TypeError):
+            client.configure(unknown=1)
@@ -0,0 +1,187 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import sleep
+from json import loads
+from os import listdir
+from time import time
+
+from pytest import fixture, mark, raises
+
+from bigur.auth.key_jar import CURRENT, NEXT, RETIRING, KeyJar, write_key
+from bigur.auth.signer import generate_key
+
+# pylint: disable=redefined-outer-name
+
+
+@fixture
+def key_dir(tmp_path):
+    return str(tmp_path)
+
+
+def rotating_jar(directory):
+    key_jar = KeyJar(keys=[])
+    key_jar.configure(
+        directory=directory,
+        interval=1000,
+        publish_delay=100,
+        retain=50,
+        key_size=1024)
+    return key_jar
+
+
+def current_period():
+    # States are updated by real time too, so test times are close to it
+    return time() // 1000 * 1000
+
+
+def jwks_kids(key_jar):
+    return [x['kid'] for x in loads(key_jar.jwks)['keys']]
+
+
+class TestKeyStates(object):
+    '''Test states of keys in key jar.'''
+
+    def test_static_keys(self, jwt_key):
+        other = generate_key('RS256', 1024)
+        key_jar = KeyJar(keys=[jwt_key, other])
+        # First key signs, others are published
+        assert key_jar.get_signer().kid == KeyJar.key_id(jwt_key)
+        assert key_jar.states() == {
+            KeyJar.key_id(jwt_key): CURRENT,
+            KeyJar.key_id(other): RETIRING,
+        }
+        key_jar.update(time() + 10**9)
+        assert len(key_jar.states()) == 2
+
+    def test_next_key(self, jwt_key):
+        now = time()
+        key_jar = KeyJar(keys=[jwt_key])
+        old_kid = KeyJar.key_id(jwt_key)
+        new_kid = key_jar.add_key(
+            generate_key('RS256', 1024), not_before=now + 100).kid
+        assert key_jar.states() == {old_kid: CURRENT, new_kid: NEXT}
+        assert key_jar.get_signer().kid == old_kid
+        # New key is published before it is used
+        assert jwks_kids(key_jar) == [old_kid, new_kid]
+        assert set(key_jar.verifier.keys) == {old_kid, new_kid}
+
+        key_jar.update(now + 100)
+        assert key_jar.states() == {old_kid: RETIRING, new_kid: CURRENT}
+        assert key_jar.get_signer().kid == new_kid
+
+        # Replaced key is published while tokens signed by it are valid
+        key_jar.update(now + 100 + key_jar.retain - 1)
+        assert jwks_kids(key_jar) == [old_kid, new_kid]
+        key_jar.update(now + 100 + key_jar.retain)
+        assert key_jar.states() == {new_kid: CURRENT}
+        assert jwks_kids(key_jar) == [new_kid]
+        assert set(key_jar.verifier.keys) == {new_kid}
+
+    def test_algorithms(self, jwt_key):
+        ec_key = generate_key('ES256')
+        ed_key = generate_key('EdDSA')
+        key_jar = KeyJar(keys=[jwt_key, ec_key, ed_key])
+        # Each algorithm has its current key, first key is default
+        assert key_jar.algorithms == ('RS256', 'ES256', 'EdDSA')
+        assert set(key_jar.states().values()) == {CURRENT}
+        assert key_jar.get_signer().alg == 'RS256'
+        assert key_jar.get_signer(alg='ES256').key is ec_key
+        assert key_jar.get_signer(alg='EdDSA').key is ed_key
+
+        key_jar.configure(algorithm='EdDSA')
+        assert key_jar.algorithms == ('EdDSA', 'RS256', 'ES256')
+        assert key_jar.get_signer().alg == 'EdDSA'
+
+        key_jar = KeyJar(keys=[jwt_key])
+        with raises(KeyError):
+            key_jar.get_signer(alg='ES256')
+
+
+class TestKeyRotation(object):
+    '''Test rotation of keys in directory.'''
+
+    def test_rotate(self, key_dir):
+        key_jar = rotating_jar(key_dir)
+        period = current_period()
+        first_file = '{:d}.pem'.format(int(period))
+        second_file = '{:d}.pem'.format(int(period + 1000))
+
+        # First key is used at once
+        first = key_jar.rotate(now=period + 500).kid
+        assert listdir(key_dir) == [first_file]
+        assert key_jar.get_signer().kid == first
+
+        # Next key is generated `publish_delay` before period starts
+        assert key_jar.rotate(now=period + 850) is None
+        second = key_jar.rotate(now=period + 950).kid
+        assert sorted(listdir(key_dir)) == [first_file, second_file]
+        assert key_jar.states() == {first: CURRENT, second: NEXT}
+        assert key_jar.rotate(now=period + 960) is None
+
+        key_jar.update(period + 1000)
+        assert key_jar.states() == {first: RETIRING, second: CURRENT}
+
+        # File of retired key is removed
+        assert key_jar.rotate(now=period + 1050) is None
+        assert key_jar.states() == {second: CURRENT}
+        assert listdir(key_dir) == [second_file]
+
+    def test_shared_directory(self, key_dir):
+        period = current_period()
+        first_jar = rotating_jar(key_dir)
+        first_jar.rotate(now=period + 500)
+        second_jar = rotating_jar(key_dir)
+        assert second_jar.states() == first_jar.states()
+
+        # Only one process writes key for the period
+        kid = first_jar.rotate(now=period + 950).kid
+        assert second_jar.rotate(now=period + 950) is None
+        assert len(listdir(key_dir)) == 2
+        second_jar.update(period + 1000)
+        assert second_jar.get_signer().kid == kid
+
+    def test_algorithm(self, key_dir):
+        key_jar = rotating_jar(key_dir)
+        key_jar.configure(algorithm='ES256')
+        assert key_jar.rotate(now=10500).alg == 'ES256'
+        assert rotating_jar(key_dir).get_signer().alg == 'ES256'
+
+    def test_reload(self, key_dir):
+        key_jar = rotating_jar(key_dir)
+        signer = key_jar.rotate(now=10500)
+        key_jar.reload()
+        # Unchanged file is not loaded again
+        assert key_jar.get_signer() is signer
+
+        key = generate_key('RS256', 1024)
+        write_key('{}/10000.pem'.format(key_dir), key)
+        key_jar.reload()
+        assert key_jar.get_signer().kid == KeyJar.key_id(key)
+        assert jwks_kids(key_jar) == [KeyJar.key_id(key)]
+
+    def test_invalid_file(self, key_dir):
+        key_jar = rotating_jar(key_dir)
+        signer = key_jar.rotate(now=10500)
+        with open('{}/10000.pem'.format(key_dir), 'w') as fh_key:
+            fh_key.write('broken')
+        with open('{}/backup.pem'.format(key_dir), 'w') as fh_key:
+            fh_key.write('broken')
+        # Loaded key is kept
+        key_jar.reload()
+        assert key_jar.get_signer() is signer
+
+    @mark.asyncio
+    async def test_rotator(self, key_dir):
+        key_jar = KeyJar(keys=[])
+        key_jar.configure(
+            directory=key_dir, interval=10**6, check_interval=0.01,
+            publish_delay=100, key_size=1024)
+        await key_jar.start()
+        try:
+            await sleep(0.1)
+        finally:
+            await key_jar.stop()
+        assert len(listdir(key_dir)) == 1
+        assert key_jar.get_signer()
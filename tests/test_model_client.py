@@ -38,6 +38,7 @@ class TestModelClient(object):
             'user_id',
             'title',
             'redirect_uris',
+            'id_token_signed_response_alg',
             'crypt',
             'salt',
         }
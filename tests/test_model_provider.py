@@ -2,10 +2,56 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
-from pytest import mark
+from asyncio import gather, sleep
+from json import loads
 
+from aiohttp.test_utils import TestServer
+from aiohttp.web import Application, json_response
+from jwt.algorithms import RSAAlgorithm
+from pytest import fixture, mark, raises
+
+from bigur.auth.http_client import HTTPClient, http_client
 from bigur.auth.model import Provider
 
+# pylint: disable=redefined-outer-name
+
+
+@fixture
+async def jwks_server(jwt_key):
+    '''Stub provider's JWKS endpoint, counts requests.'''
+    jwk = loads(RSAAlgorithm.to_jwk(jwt_key.public_key()))
+    jwk['kid'] = 'key1'
+
+    async def keys(request):
+        server.requests += 1
+        await sleep(0.01)
+        return json_response({'keys': [jwk, {'kid': 'bad', 'kty': 'XXX'}]},
+                             headers=server.headers)
+
+    app = Application()
+    app.router.add_get('/keys', keys)
+    server = TestServer(app)
+    server.requests = 0
+    server.headers = {'Cache-Control': 'public, max-age=120'}
+    await server.start_server()
+    yield server
+    await server.close()
+
+
+@fixture
+async def provider(jwks_server):
+    await http_client.start()
+    yield Provider(
+        issuer='http://localhost',
+        authorization_endpoint='http://localhost/auth',
+        jwks_uri=str(jwks_server.make_url('/keys')),
+        response_types_supported=['code'],
+        subject_types_supported=['public'],
+        id_token_signing_alg_values_supported=['RS256'],
+        client_id='123',
+        client_secret='xxx')
+    await http_client.stop()
+
 
 class TestProvider(object):
 
@@ -38,3 +84,73 @@ class TestProvider(object):
             domains=['accounts.google.com'],
             client_id='123',
             client_secret='xxx')
+
+    @mark.asyncio
+    async def test_verification_keys(self, jwks_server, provider, jwt_key):
+        assert provider.keys_expired()
+        await gather(*[provider.update_keys() for _ in range(5)])
+        assert 1 == jwks_server.requests
+
+        key = provider.get_verification_key('key1')
+        assert key.public_numbers() == jwt_key.public_key().public_numbers()
+        assert key is provider.get_verification_key('key1')
+
+        with raises(KeyError):
+            provider.get_verification_key('unknown')
+
+        assert not provider.keys_expired()
+        assert provider.keys_expired(now=provider._keys_expires)  # noqa
+
+    @mark.asyncio
+    async def test_shared_jwks_uri(self, jwks_server, provider):
+        other = Provider(**{
+            k: getattr(provider, k)
+            for k in ('issuer', 'authorization_endpoint', 'jwks_uri',
+                      'response_types_supported', 'subject_types_supported',
+                      'id_token_signing_alg_values_supported', 'client_id',
+                      'client_secret')
+        })
+        await gather(provider.update_keys(), other.update_keys())
+        assert 1 == jwks_server.requests
+        assert not other.keys_expired()
+        assert other.get_verification_key('key1') is not None
+
+        Provider.keys_min_ttl = 0
+        jwks_server.headers = {'Cache-Control': 'no-cache'}
+        try:
+            key = other.get_verification_key('key1')
+            await gather(provider.refresh_keys(), other.refresh_keys())
+            assert 2 == jwks_server.requests
+            assert key is not other.get_verification_key('key1')
+        finally:
+            Provider.keys_min_ttl = 60
+
+    @mark.asyncio
+    async def test_refresh_keys(self, jwks_server, provider):
+        jwks_server.headers = {'Cache-Control': 'no-cache'}
+        Provider.keys_min_ttl = 0
+        try:
+            await provider.update_keys()
+            key = provider.get_verification_key('key1')
+            assert provider.keys_expired()
+
+            await provider.refresh_keys()
+            assert 2 == jwks_server.requests
+            assert key is not provider.get_verification_key('key1')
+        finally:
+            Provider.keys_min_ttl = 60
+
+    @mark.asyncio
+    async def test_refresh_timeout(self, monkeypatch, jwks_server, provider):
+        await provider.update_keys()
+        key = provider.get_verification_key('key1')
+
+        client = HTTPClient(timeout=0.001)
+        monkeypatch.setattr('bigur.auth.model.provider.http_client', client)
+        try:
+            # Failed refresh keeps old keys
+            await provider.refresh_keys()
+        finally:
+            await client.stop()
+        assert key is provider.get_verification_key('key1')
+        await sleep(0.05)
@@ -0,0 +1,136 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from time import time
+
+from pytest import fixture, mark
+
+from bigur.auth.handler.oauth2 import IntrospectionHandler, TokenHandler
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.model.refresh_token import hash_token
+from bigur.auth.oauth2.grant.implicit import OAuth2RSAJWT
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+
+@fixture
+def introspection_endpoint(app):
+    app.router.add_route('*', '/auth/introspect', IntrospectionHandler)
+    app.router.add_route('*', '/auth/token', TokenHandler)
+
+
+@fixture
+async def tokens(introspection_endpoint, cli, store, user, client,
+                 redirect_uri):
+    await store.access_codes.create(
+        code='test',
+        scopes=['email'],
+        client_id=client.id,
+        user_id=user.id,
+        redirect_uri=redirect_uri)
+    response = await cli.post(
+        '/auth/token',
+        data={
+            'client_id': client.id,
+            'client_secret': '123',
+            'grant_type': 'authorization_code',
+            'code': 'test',
+            'redirect_uri': redirect_uri,
+        })
+    assert response.status == 200
+    return await response.json()
+
+
+@fixture
+def introspect(introspection_endpoint, cli, client):
+
+    async def post(token, **kwargs):
+        data = {'client_id': client.id, 'client_secret': '123'}
+        if token is not None:
+            data['token'] = token
+        data.update(kwargs)
+        response = await cli.post('/auth/introspect', data=data)
+        return response.status, await response.json()
+
+    return post
+
+
+class TestIntrospectionEndpoint(object):
+    '''Test token introspection endpoint (RFC 7662).'''
+
+    @mark.asyncio
+    async def test_access_token(self, tokens, introspect, user, client):
+        status, result = await introspect(tokens['access_token'])
+        assert status == 200
+        assert result['active'] is True
+        assert result['scope'] == 'email'
+        assert result['client_id'] == client.id
+        assert result['sub'] == user.id
+        assert result['token_type'] == 'Bearer'
+        assert result['iss'] == 'https://localhost:8889'
+        assert result['exp'] > time()
+
+        # Second request is served from cache of verifier
+        hits = KeyJar.instance().verifier.stats()['hits']
+        assert (await introspect(tokens['access_token']))[1] == result
+        assert KeyJar.instance().verifier.stats()['hits'] == hits + 1
+
+    @mark.asyncio
+    async def test_refresh_token(self, tokens, introspect, user, client):
+        status, result = await introspect(
+            tokens['refresh_token'], token_type_hint='refresh_token')
+        assert status == 200
+        assert result['active'] is True
+        assert result['client_id'] == client.id
+        assert result['sub'] == user.id
+
+    @mark.asyncio
+    async def test_inactive(self, tokens, introspect, store, client):
+        access_token = tokens['access_token']
+        for token in ('unknown', access_token[:-4] + 'AAAA', 'a.b.c'):
+            assert await introspect(token) == (200, {'active': False})
+
+        # Rotated refresh token is not active
+        await store.refresh_tokens.rotate(
+            hash_token(tokens['refresh_token']), client.id)
+        assert await introspect(tokens['refresh_token']) == (200, {
+            'active': False
+        })
+
+    @mark.asyncio
+    async def test_not_access_token(self, app, introspect, token, user,
+                                    client):
+        key = app['jwt_keys'][0]
+        # ID token, signed by the same key
+        assert await introspect(token.encode(key).decode('ascii')) == (200, {
+            'active': False
+        })
+
+        # Access token of another issuer
+        access_token = OAuth2RSAJWT(
+            sub=user.id,
+            scope=['email'],
+            iss='https://example.com',
+            jti='1',
+            client_id=client.id,
+            exp=int(time()) + 60)
+        assert await introspect(access_token.encode(key).decode('ascii')) == (
+            200, {
+                'active': False
+            })
+
+    @mark.asyncio
+    async def test_token_required(self, introspect):
+        status, result = await introspect(None)
+        assert status == 400
+        assert result == {
+            'error': 'invalid_request',
+            'error_description': 'Parameter `token\' required.'
+        }
+
+    @mark.asyncio
+    async def test_client_required(self, introspection_endpoint, cli):
+        response = await cli.post('/auth/introspect', data={'token': 'abc'})
+        assert response.status == 401
+        assert (await response.json())['error'] == 'invalid_client'
@@ -0,0 +1,128 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from pytest import fixture, mark, raises
+
+from bigur.auth.handler.oauth2 import (
+    IntrospectionHandler,
+    RevocationHandler,
+    TokenHandler,
+)
+from bigur.auth.model import Client
+from bigur.auth.model.refresh_token import hash_token
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+
+@fixture
+def revocation_endpoint(app):
+    app.router.add_route('*', '/auth/revoke', RevocationHandler)
+    app.router.add_route('*', '/auth/introspect', IntrospectionHandler)
+    app.router.add_route('*', '/auth/token', TokenHandler)
+
+
+@fixture
+async def tokens(revocation_endpoint, cli, store, user, client,
+                 redirect_uri):
+    await store.access_codes.create(
+        code='test',
+        scopes=['email'],
+        client_id=client.id,
+        user_id=user.id,
+        redirect_uri=redirect_uri)
+    response = await cli.post(
+        '/auth/token',
+        data={
+            'client_id': client.id,
+            'client_secret': '123',
+            'grant_type': 'authorization_code',
+            'code': 'test',
+            'redirect_uri': redirect_uri,
+        })
+    assert response.status == 200
+    return await response.json()
+
+
+@fixture
+def post(revocation_endpoint, cli, client):
+
+    async def request(path, token, **kwargs):
+        data = {'client_id': client.id, 'client_secret': '123'}
+        if token is not None:
+            data['token'] = token
+        data.update(kwargs)
+        response = await cli.post(path, data=data)
+        return response.status, await response.json()
+
+    return request
+
+
+class TestRevocationEndpoint(object):
+    '''Test token revocation endpoint (RFC 7009).'''
+
+    @mark.asyncio
+    async def test_access_token(self, tokens, post):
+        access_token = tokens['access_token']
+        status, result = await post('/auth/introspect', access_token)
+        assert result['active'] is True
+
+        assert await post('/auth/revoke', access_token) == (200, {})
+        assert await post('/auth/introspect', access_token) == (200, {
+            'active': False
+        })
+
+        # Revocation is idempotent
+        assert await post('/auth/revoke', access_token) == (200, {})
+
+    @mark.asyncio
+    async def test_refresh_token(self, tokens, post, store, client):
+        refresh_token = tokens['refresh_token']
+        assert await post(
+            '/auth/revoke', refresh_token,
+            token_type_hint='refresh_token') == (200, {})
+        assert await post('/auth/introspect', refresh_token) == (200, {
+            'active': False
+        })
+        with raises(KeyError):
+            await store.refresh_tokens.get(hash_token(refresh_token))
+
+    @mark.asyncio
+    async def test_unknown_token(self, tokens, post):
+        for token in ('unknown', 'a.b.c'):
+            assert await post('/auth/revoke', token) == (200, {})
+
+    @mark.asyncio
+    async def test_token_required(self, post):
+        status, result = await post('/auth/revoke', None)
+        assert status == 400
+        assert result == {
+            'error': 'invalid_request',
+            'error_description': 'Parameter `token\' required.'
+        }
+
+    @mark.asyncio
+    async def test_another_client(self, tokens, cli, store, user):
+        other = await store.clients.put(
+            Client(
+                client_type='confidential',
+                user_id=user.id,
+                title='Other client',
+                password='123',
+                redirect_uris=['http://localhost/feedback']))
+        for token in (tokens['access_token'], tokens['refresh_token']):
+            response = await cli.post(
+                '/auth/revoke',
+                data={
+                    'client_id': other.id,
+                    'client_secret': '123',
+                    'token': token
+                })
+            assert response.status == 400
+            assert (await response.json())['error'] == 'unauthorized_client'
+
+    @mark.asyncio
+    async def test_client_required(self, revocation_endpoint, cli):
+        response = await cli.post('/auth/revoke', data={'token': 'abc'})
+        assert response.status == 401
+        assert (await response.json())['error'] == 'invalid_client'
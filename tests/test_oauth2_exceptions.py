@@ -0,0 +1,58 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from json import loads
+
+from bigur.auth.oauth2.exceptions import (
+    InvalidClient,
+    InvalidGrant,
+    InvalidRequest,
+    OAuth2Error,
+    TemporaryUnavailable,
+    UnsupportedGrantType,
+    UnsupportedResponseType,
+)
+
+
+class TestOAuth2Error(object):
+    '''Test OAuth2 error codes and serialization.'''
+
+    def test_error_code(self):
+        assert InvalidRequest.error_code == 'invalid_request'
+        assert InvalidClient.error_code == 'invalid_client'
+        assert InvalidGrant.error_code == 'invalid_grant'
+        assert UnsupportedGrantType.error_code == 'unsupported_grant_type'
+        assert (UnsupportedResponseType.error_code ==
+                'unsupported_response_type')
+        assert TemporaryUnavailable.error_code == 'temporarily_unavailable'
+
+    def test_subclass(self):
+
+        class InvalidToken(InvalidRequest):
+            pass
+
+        class SlowDown(OAuth2Error):
+            error_code = 'slow_down'
+
+        assert InvalidToken.error_code == 'invalid_token'
+        assert SlowDown.error_code == 'slow_down'
+        assert SlowDown('Wait').to_dict() == {
+            'error': 'slow_down',
+            'error_description': 'Wait'
+        }
+
+    def test_status(self):
+        assert InvalidClient('x').status == 401
+        assert InvalidGrant('x').status == 400
+
+    def test_to_json(self):
+        error = InvalidGrant('Code "123" is\nexpired.')
+        assert loads(error.to_json().decode('utf-8')) == {
+            'error': 'invalid_grant',
+            'error_description': 'Code "123" is\nexpired.'
+        }
+        assert loads(InvalidRequest().to_json().decode('utf-8')) == {
+            'error': 'invalid_request',
+            'error_description': ''
+        }
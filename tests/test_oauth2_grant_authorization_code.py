@@ -2,23 +2,25 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
+from asyncio import gather
+from base64 import urlsafe_b64encode
 from datetime import datetime
+from hashlib import sha256, sha512
 from urllib.parse import parse_qs, urlparse
 
+from jwt import get_unverified_header
 from pytest import fixture, mark
 
 from bigur.auth.handler.oauth2 import AuthorizationHandler, TokenHandler
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.signer import generate_key
+from bigur.auth.verifier import TokenVerifier
 
 # pylint: disable=unused-argument,redefined-outer-name
 
 # TODO: The authorization server MAY fully or partially ignore the scope
 #       requested by the client
 # TODO: Not return scopes if identical with request's
-# TODO: redirect_uri in token request must be same:
-#         REQUIRED, if the "redirect_uri" parameter was included in the
-#         authorization request as described in Section 4.1.1, and their
-#         values MUST be identical.
-# TODO: Get token
 
 
 @fixture
@@ -27,6 +29,46 @@ def handlers(app, authn_userpass):
     app.router.add_route('*', '/auth/token', TokenHandler)
 
 
+@fixture
+async def access_code(handlers, cli, user, login, client, redirect_uri):
+    '''Returns function, which obtains code from authorization
+    endpoint.'''
+
+    async def get_code(scope='email'):
+        response = await cli.post(
+            '/auth/authorize',
+            data={
+                'response_type': 'code',
+                'client_id': client.id,
+                'client_secret': '123',
+                'redirect_uri': redirect_uri,
+                'scope': scope,
+            },
+            allow_redirects=False)
+        assert response.status == 303
+        fragment = parse_qs(urlparse(response.headers['Location']).fragment)
+        return fragment['code'][0]
+
+    return get_code
+
+
+@fixture
+def request_token(handlers, cli, client, redirect_uri):
+
+    def post(code, **kwargs):
+        data = {
+            'client_id': client.id,
+            'client_secret': '123',
+            'grant_type': 'authorization_code',
+            'code': code,
+            'redirect_uri': redirect_uri,
+        }
+        data.update(kwargs)
+        return cli.post('/auth/token', data=data, allow_redirects=False)
+
+    return post
+
+
 @fixture
 async def expired_access_code(store):
     yield await store.access_codes.create(
@@ -449,3 +491,110 @@ class TestAuthorizationCodeGrant(object):
             'error': 'invalid_grant',
             'error_description': 'Code expired.'
         }
+
+
+class TestTokenByCode(object):
+    '''Test exchange of authorization code for access token'''
+
+    @mark.asyncio
+    async def test_get_token(self, access_code, request_token, user, client,
+                             scopes, decode_token):
+        response = await request_token(await access_code())
+
+        assert response.status == 200
+        result = await response.json()
+        assert set(result) == {
+            'access_token', 'token_type', 'expires_in', 'refresh_token',
+            'scope'
+        }
+        assert result['token_type'] == 'Bearer'
+        assert result['scope'] == 'email'
+
+        token = decode_token(result['access_token'])
+        assert token['sub'] == user.id
+        assert token['client_id'] == client.id
+        assert token['scope'] == ['email']
+        assert token['exp'] - token['iat'] == result['expires_in']
+
+    @mark.asyncio
+    async def test_id_token(self, access_code, request_token, user, client,
+                            scopes, decode_token):
+        response = await request_token(await access_code('openid email'))
+
+        assert response.status == 200
+        result = await response.json()
+        token = decode_token(result['id_token'], audience=client.id)
+        assert token['sub'] == user.id
+        assert token['aud'] == client.id
+        assert token['at_hash'] == urlsafe_b64encode(
+            sha256(result['access_token'].encode('ascii')).digest()
+            [:16]).decode('ascii').rstrip('=')
+
+    @mark.asyncio
+    async def test_id_token_alg(self, access_code, request_token, store,
+                                client, scopes):
+        key_jar = KeyJar.instance()
+        key_jar.add_key(generate_key('EdDSA'))
+        client.id_token_signed_response_alg = 'EdDSA'
+        await store.clients.put(client)
+
+        result = await (await request_token(
+            await access_code('openid email'))).json()
+        assert get_unverified_header(result['id_token'])['alg'] == 'EdDSA'
+        # Access token is signed with default key
+        assert get_unverified_header(
+            result['access_token'])['alg'] == 'RS256'
+        token = TokenVerifier(key_jar.verifier.keys,
+                              audience=client.id).verify(result['id_token'])
+        assert token['at_hash'] == urlsafe_b64encode(
+            sha512(result['access_token'].encode('ascii')).digest()
+            [:32]).decode('ascii').rstrip('=')
+
+    @mark.asyncio
+    async def test_code_reused(self, access_code, request_token, scopes):
+        code = await access_code()
+        assert (await request_token(code)).status == 200
+
+        response = await request_token(code)
+        assert response.status == 400
+        assert await response.json() == {
+            'error': 'invalid_grant',
+            'error_description': 'Code already used.'
+        }
+
+    @mark.asyncio
+    async def test_redirect_uri_mismatch(self, access_code, request_token,
+                                         scopes, redirect_uri):
+        response = await request_token(
+            await access_code(), redirect_uri=redirect_uri + '?foo=bar')
+        assert response.status == 400
+        assert (await response.json())['error'] == 'invalid_grant'
+
+    @mark.asyncio
+    async def test_another_client(self, access_code, request_token, store,
+                                  user, scopes):
+        from bigur.auth.model import Client
+        other = await store.clients.put(
+            Client(
+                client_type='public',
+                user_id=user.id,
+                title='Other client',
+                redirect_uris=[]))
+
+        response = await request_token(
+            await access_code(), client_id=other.id, client_secret='')
+        assert response.status == 400
+        assert await response.json() == {
+            'error': 'invalid_grant',
+            'error_description': 'Code was issued to another client.'
+        }
+
+    @mark.asyncio
+    async def test_concurrent_redemption(self, access_code, request_token,
+                                         scopes):
+        code = await access_code()
+        responses = await gather(*[request_token(code) for _ in range(50)])
+
+        statuses = [x.status for x in responses]
+        assert statuses.count(200) == 1
+        assert statuses.count(400) == 49
@@ -0,0 +1,189 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import gather
+from time import time
+
+from pytest import fixture, mark
+
+from bigur.auth.handler.oauth2 import TokenHandler
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.model.refresh_token import generate_token, hash_token
+from bigur.auth.oauth2.exceptions import TemporaryUnavailable
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+
+@fixture
+def token_endpoint(app):
+    app.router.add_route('*', '/auth/token', TokenHandler)
+
+
+@fixture
+async def refresh_token(store, user, client):
+    token = generate_token()
+    await store.refresh_tokens.create(
+        id=hash_token(token),
+        family='family',
+        user_id=user.id,
+        client_id=client.id,
+        scopes=['email', 'profile'])
+    return token
+
+
+@fixture
+def request_token(token_endpoint, cli, client):
+
+    def post(token, **kwargs):
+        data = {
+            'client_id': client.id,
+            'client_secret': '123',
+            'grant_type': 'refresh_token',
+            'refresh_token': token,
+        }
+        data.update(kwargs)
+        return cli.post('/auth/token', data=data, allow_redirects=False)
+
+    return post
+
+
+class TestRefreshTokenGrant(object):
+    '''Test OAuth2 refresh token grant'''
+
+    @mark.asyncio
+    async def test_refresh(self, request_token, refresh_token, user, store,
+                           decode_token):
+        # End user's cookie is not needed, client is authenticated
+        response = await request_token(refresh_token)
+
+        assert response.status == 200
+        result = await response.json()
+        assert result['scope'] == 'email profile'
+        assert result['refresh_token'] != refresh_token
+        assert decode_token(result['access_token'])['sub'] == user.id
+
+        rotated = await store.refresh_tokens.get(hash_token(refresh_token))
+        assert rotated.used
+        issued = await store.refresh_tokens.get(
+            hash_token(result['refresh_token']))
+        assert issued.family == 'family'
+        assert not issued.used
+
+    @mark.asyncio
+    async def test_refresh_token_required(self, request_token):
+        response = await request_token('')
+        assert response.status == 400
+        assert await response.json() == {
+            'error': 'invalid_request',
+            'error_description': 'Parameter `refresh_token\' required.'
+        }
+
+    @mark.asyncio
+    async def test_invalid_token(self, request_token, refresh_token):
+        response = await request_token('not-existing')
+        assert response.status == 400
+        assert await response.json() == {
+            'error': 'invalid_grant',
+            'error_description': 'Invalid refresh token provided.'
+        }
+
+    @mark.asyncio
+    async def test_expired(self, request_token, store, user, client):
+        await store.refresh_tokens.create(
+            id=hash_token('expired'),
+            family='family',
+            user_id=user.id,
+            client_id=client.id,
+            expires=time() - 1)
+        response = await request_token('expired')
+        assert response.status == 400
+        assert (await response.json())['error_description'] == (
+            'Refresh token expired.')
+
+    @mark.asyncio
+    async def test_narrow_scope(self, request_token, refresh_token):
+        response = await request_token(refresh_token, scope='email')
+        assert response.status == 200
+        data = await response.json()
+        assert data['scope'] == 'email'
+
+        # Only access token is narrowed, new refresh token keeps scope
+        response = await request_token(data['refresh_token'])
+        assert response.status == 200
+        assert (await response.json())['scope'] == 'email profile'
+
+    @mark.asyncio
+    async def test_extend_scope(self, request_token, refresh_token):
+        response = await request_token(refresh_token, scope='email openid')
+        assert response.status == 400
+        assert (await response.json())['error'] == 'invalid_scope'
+
+        # Rejected request does not use up token
+        response = await request_token(refresh_token)
+        assert response.status == 200
+
+    @mark.asyncio
+    async def test_signing_failed(self, monkeypatch, request_token,
+                                  refresh_token, store):
+
+        async def sign(*args, **kwargs):
+            raise TemporaryUnavailable('Token signing queue is full.')
+
+        key_jar = KeyJar.instance()
+        with monkeypatch.context() as patch:
+            patch.setattr(key_jar, 'sign', sign)
+            response = await request_token(refresh_token)
+            assert (await response.json())['error'] == (
+                'temporarily_unavailable')
+
+        assert not (await store.refresh_tokens.get(
+            hash_token(refresh_token))).used
+        response = await request_token(refresh_token)
+        assert response.status == 200
+
+    @mark.asyncio
+    async def test_reuse_revokes_family(self, request_token, refresh_token,
+                                        store):
+        response = await request_token(refresh_token)
+        issued = (await response.json())['refresh_token']
+
+        response = await request_token(refresh_token)
+        assert response.status == 400
+        assert await response.json() == {
+            'error': 'invalid_grant',
+            'error_description': 'Refresh token already used.'
+        }
+
+        # Token issued to legitimate client is revoked too
+        response = await request_token(issued)
+        assert response.status == 400
+        assert (await response.json())['error'] == 'invalid_grant'
+        assert store.refresh_tokens.stats()['live'] == 0
+
+    @mark.asyncio
+    async def test_concurrent_refresh(self, request_token, refresh_token):
+        responses = await gather(
+            *[request_token(refresh_token) for _ in range(20)])
+        statuses = [x.status for x in responses]
+        assert statuses.count(200) == 1
+
+    @mark.asyncio
+    async def test_code_and_refresh(self, request_token, store, user, client,
+                                    redirect_uri, scopes):
+        await store.access_codes.create(
+            code='test',
+            scopes=['email'],
+            client_id=client.id,
+            user_id=user.id,
+            redirect_uri=redirect_uri)
+        response = await request_token(
+            '',
+            grant_type='authorization_code',
+            code='test',
+            redirect_uri=redirect_uri)
+        assert response.status == 200
+        token = (await response.json())['refresh_token']
+
+        response = await request_token(token)
+        assert response.status == 200
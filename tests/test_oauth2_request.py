@@ -0,0 +1,40 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from multidict import MultiDict
+
+from bigur.auth.oauth2.grant.authorization_code import AuthorizationRequest
+from bigur.auth.oauth2.request import get_binder
+
+
+class TestRequestBinder(object):
+    '''Test building of OAuth2 requests from parameters.'''
+
+    def test_fields(self):
+        binder = get_binder(AuthorizationRequest)
+        assert binder is get_binder(AuthorizationRequest)
+        assert binder.fields == {
+            'response_type', 'client_id', 'redirect_uri', 'scope', 'state'
+        }
+        assert binder.set_fields == {'response_type', 'scope'}
+
+    def test_bind(self):
+        request = get_binder(AuthorizationRequest).bind(
+            MultiDict([
+                ('response_type', 'code'),
+                ('client_id', '123'),
+                ('scope', ' read  write '),
+                ('state', ''),
+                ('unknown', 'value'),
+            ]))
+        assert request == AuthorizationRequest(
+            response_type={'code'},
+            client_id='123',
+            scope={'read', 'write'})
+        assert request.state is None
+
+    def test_init(self):
+        request = AuthorizationRequest(response_type='code token', scope=None)
+        assert request.response_type == {'code', 'token'}
+        assert request.scope == set()
@@ -0,0 +1,47 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from pytest import mark
+
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.oauth2.context import Context
+from bigur.auth.oauth2.grant.implicit import (
+    TokenRequest,
+    implicit_grant as oauth2_implicit_grant,
+)
+from bigur.auth.oidc.grant.implicit import implicit_grant, token_hash
+
+# pylint: disable=unused-argument
+
+
+class TestImplicitGrant(object):
+    '''Test OpenID Connect implicit grant'''
+
+    @mark.asyncio
+    async def test_at_hash(self, monkeypatch, app, config, user,
+                           decode_token):
+        key_jar = KeyJar.instance()
+        signed = []
+
+        async def sign(payload, kid=None):
+            signed.append(payload)
+            return key_jar.get_signer(kid=kid).sign(payload)
+
+        monkeypatch.setattr(key_jar, 'sign', sign)
+
+        request = TokenRequest(client_id='123', scope='openid', state='xyz')
+        request.owner = user.id
+        request.config = config
+        request.nonce = 'test nonce'
+
+        response = await oauth2_implicit_grant(
+            Context(owner=user.id, oauth2_request=request))
+        id_token = (await implicit_grant(request)).id_token
+
+        # Access token is signed once, ID token hashes the returned one
+        assert 2 == len(signed)
+        payload = decode_token(id_token, audience='123')
+        assert payload['at_hash'] == token_hash(
+            response.access_token.encode('ascii'),
+            key_jar.get_signer().alg)
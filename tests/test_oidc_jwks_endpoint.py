@@ -0,0 +1,72 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from json import dumps
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+from pytest import fixture, mark
+
+from bigur.auth.handler.oidc import JWKSHandler
+from bigur.auth.key_jar import KeyJar
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+
+@fixture
+async def jwks_endpoint(app):
+    app.router.add_route('*', '/auth/jwks.json', JWKSHandler)
+
+
+class TestJWKSEndpoint(object):
+    '''Test JSON web key set endpoint.'''
+
+    @mark.asyncio
+    async def test_keys(self, jwks_endpoint, cli, jwt_key):
+        response = await cli.get('/auth/jwks.json')
+        assert response.status == 200
+        assert response.content_type == 'application/json'
+        assert response.headers['Cache-Control'] == 'public, max-age=3600'
+        assert response.headers['ETag'] == KeyJar.instance().jwks_etag
+
+        keys = (await response.json())['keys']
+        assert len(keys) == 1
+        assert keys[0]['kid'] == KeyJar.key_id(jwt_key)
+        assert keys[0]['alg'] == 'RS256'
+        public_key = RSAAlgorithm.from_jwk(dumps(keys[0]))
+        assert (public_key.public_numbers() ==
+                jwt_key.public_key().public_numbers())
+
+    @mark.asyncio
+    async def test_not_modified(self, jwks_endpoint, cli):
+        response = await cli.get('/auth/jwks.json')
+        etag = response.headers['ETag']
+
+        response = await cli.get(
+            '/auth/jwks.json', headers={'If-None-Match': etag})
+        assert response.status == 304
+        assert response.headers['ETag'] == etag
+        assert await response.read() == b''
+
+        response = await cli.get(
+            '/auth/jwks.json', headers={'If-None-Match': '"other"'})
+        assert response.status == 200
+
+    @mark.asyncio
+    async def test_new_key(self, jwks_endpoint, cli):
+        response = await cli.get('/auth/jwks.json')
+        etag = response.headers['ETag']
+
+        KeyJar.instance().add_key(
+            rsa.generate_private_key(
+                public_exponent=65537,
+                key_size=1024,
+                backend=default_backend()))
+
+        response = await cli.get(
+            '/auth/jwks.json', headers={'If-None-Match': etag})
+        assert response.status == 200
+        assert response.headers['ETag'] != etag
+        assert len((await response.json())['keys']) == 2
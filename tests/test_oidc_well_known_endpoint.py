@@ -0,0 +1,102 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from pytest import fixture, mark
+
+from bigur.auth.config import Settings, reload_callbacks, set_settings
+from bigur.auth.handler.oidc import WellKnownHandler
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.signer import generate_key
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+
+@fixture
+async def well_known_endpoint(app, config):
+    endpoints = config.configuration_data['http_server']['endpoints']
+    endpoints.setdefault('authorize', {'path': '/auth/authorize'})
+    endpoints.setdefault('token', {'path': '/auth/token'})
+    endpoints.setdefault('jwks', {'path': '/auth/jwks.json'})
+    set_settings(Settings.from_config(config))
+    app.router.add_route('*', '/.well-known/openid-configuration',
+                         WellKnownHandler)
+    WellKnownHandler.documents.clear()
+
+
+class TestWellKnownEndpoint(object):
+    '''Test OpenID provider configuration endpoint.'''
+
+    @mark.asyncio
+    async def test_document(self, well_known_endpoint, cli):
+        response = await cli.get('/.well-known/openid-configuration')
+        assert response.status == 200
+        assert response.content_type == 'application/json'
+        assert response.headers['Cache-Control'] == 'public, max-age=3600'
+        assert 'ETag' in response.headers
+
+        root = 'http://127.0.0.1:{}'.format(cli.port)
+        document = await response.json()
+        assert document['issuer'] == 'https://localhost:8889'
+        assert document['authorization_endpoint'] == root + '/auth/authorize'
+        assert document['jwks_uri'] == root + '/auth/jwks.json'
+
+    @mark.asyncio
+    async def test_cached(self, well_known_endpoint, cli):
+        documents = WellKnownHandler.documents
+        first = await cli.get('/.well-known/openid-configuration')
+        second = await cli.get('/.well-known/openid-configuration')
+        assert await first.read() == await second.read()
+        assert documents.stats()['hits'] >= 1
+        assert len(documents) == 1
+
+        # Other host, other document
+        response = await cli.get(
+            '/.well-known/openid-configuration',
+            headers={'Host': 'example.com'})
+        assert (await response.json())['jwks_uri'] == (
+            'http://example.com/auth/jwks.json')
+        assert len(documents) == 2
+
+    @mark.asyncio
+    async def test_not_modified(self, well_known_endpoint, cli):
+        response = await cli.get('/.well-known/openid-configuration')
+        etag = response.headers['ETag']
+        response = await cli.get(
+            '/.well-known/openid-configuration',
+            headers={'If-None-Match': etag})
+        assert response.status == 304
+        assert response.headers['ETag'] == etag
+
+    @mark.asyncio
+    async def test_reload(self, well_known_endpoint, cli, config):
+        response = await cli.get('/.well-known/openid-configuration')
+        etag = response.headers['ETag']
+
+        issuer = config.configuration_data['oidc']['iss']
+        config.configuration_data['oidc']['iss'] = 'https://example.com'
+        try:
+            set_settings(Settings.from_config(config))
+            for callback in reload_callbacks:
+                callback()
+            assert len(WellKnownHandler.documents) == 0
+            response = await cli.get('/.well-known/openid-configuration')
+            assert response.headers['ETag'] != etag
+            assert (await response.json())['issuer'] == 'https://example.com'
+        finally:
+            config.configuration_data['oidc']['iss'] = issuer
+            set_settings(Settings.from_config(config))
+
+    @mark.asyncio
+    async def test_algorithms(self, well_known_endpoint, cli):
+        response = await cli.get('/.well-known/openid-configuration')
+        document = await response.json()
+        assert document['id_token_signing_alg_values_supported'] == ['RS256']
+
+        # New key algorithm, new document
+        KeyJar.instance().add_key(generate_key('ES256'))
+        response = await cli.get('/.well-known/openid-configuration')
+        document = await response.json()
+        assert document['id_token_signing_alg_values_supported'] == [
+            'RS256', 'ES256'
+        ]
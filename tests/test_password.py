@@ -0,0 +1,117 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import gather
+from hashlib import sha512
+from threading import Lock
+from time import sleep
+
+from pytest import importorskip, mark, raises
+
+from bigur.auth import password
+from bigur.auth.model import User
+from bigur.auth.password import (
+    Argon2Hasher,
+    PasswordVerifier,
+    ScryptHasher,
+    set_hasher,
+    verify_password,
+)
+
+
+class TestHashers(object):
+    '''Test password hashers.'''
+
+    def test_scrypt(self):
+        hasher = ScryptHasher(n=2**10, r=8, p=1)
+        crypt = hasher.hash('123', 'salt')
+        assert crypt.startswith('scrypt$n=1024,r=8,p=1$')
+        assert hasher.verify('123', 'salt', crypt)
+        assert not hasher.verify('1234', 'salt', crypt)
+        assert not hasher.needs_update(crypt)
+        assert ScryptHasher(n=2**11).needs_update(crypt)
+
+    def test_argon2(self):
+        importorskip('argon2')
+        hasher = Argon2Hasher(t=1, m=1024, p=1)
+        crypt = hasher.hash('123', 'salt')
+        assert crypt.startswith('argon2id$t=1,m=1024,p=1$')
+        assert hasher.verify('123', 'salt', crypt)
+        assert not hasher.verify('1234', 'salt', crypt)
+
+    def test_unknown_hasher(self):
+        with raises(KeyError):
+            set_hasher('md5')
+
+    def test_unavailable_hasher(self, monkeypatch, password_hasher):
+        user = User(username='admin', password='123')
+        user.crypt = 'md5$$' + user.crypt.rsplit('$', 1)[1]
+        assert not user.verify_password('123')
+
+        monkeypatch.setattr(password, 'hash_secret_raw', None)
+        monkeypatch.setattr(password, '_verifiers', {})
+        user.crypt = 'argon2id$t=1,m=1024,p=1$AAAA'
+        assert not user.verify_password('123')
+
+    def test_legacy(self, password_hasher):
+        user = User(username='admin')
+        user.salt = 'salt'
+        user.crypt = sha512('123salt'.encode('utf-8')).hexdigest()
+        assert user.verify_password('123')
+        assert not user.verify_password('1234')
+        assert user.needs_rehash()
+
+    def test_old_parameters(self, password_hasher):
+        user = User(username='admin', password='123')
+        assert not user.needs_rehash()
+        set_hasher('scrypt', n=2**11, r=8, p=1)
+        try:
+            assert user.needs_rehash()
+            assert user.verify_password('123')
+        finally:
+            set_hasher(password_hasher.name, **password_hasher.params)
+
+
+class TestPasswordVerifier(object):
+    '''Test password verification in thread pool.'''
+
+    @mark.asyncio
+    async def test_verify(self, store, user):
+        assert await verify_password(user, '123', store.users)
+        assert not await verify_password(user, '1234', store.users)
+
+    @mark.asyncio
+    async def test_upgrade(self, store, user):
+        user.salt = 'salt'
+        user.crypt = sha512('123salt'.encode('utf-8')).hexdigest()
+
+        assert not await verify_password(user, '1234', store.users)
+        assert not user.crypt.startswith('scrypt$')
+
+        assert await verify_password(user, '123', store.users)
+        assert user.crypt.startswith('scrypt$')
+        assert not user.needs_rehash()
+        assert user.verify_password('123')
+
+    @mark.asyncio
+    async def test_concurrency(self):
+        verifier = PasswordVerifier(workers=4, concurrency=2)
+        lock = Lock()
+        running = 0
+        maximum = 0
+
+        def work():
+            nonlocal running, maximum
+            with lock:
+                running += 1
+                maximum = max(maximum, running)
+            sleep(0.01)
+            with lock:
+                running -= 1
+
+        try:
+            await gather(*[verifier.run(work) for _ in range(10)])
+        finally:
+            verifier.close()
+        assert maximum == 2
@@ -0,0 +1,102 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import sleep
+from dataclasses import dataclass
+from typing import Optional
+
+from pytest import mark, raises
+
+from bigur.auth.oauth2.exceptions import InvalidRequest
+from bigur.auth.oauth2.response import OAuth2Response
+from bigur.auth.oidc.endpoint import authorization
+from bigur.auth.pipeline import Pipeline
+
+
+async def increment(value):
+    return value + 1
+
+
+def double(value):
+    return value * 2
+
+
+class TestPipeline(object):
+    '''Test request processing pipeline.'''
+
+    @mark.asyncio
+    async def test_stages(self):
+        pipeline = Pipeline(increment, double, increment)
+        assert 9 == await pipeline(3)
+        assert 3 == await Pipeline(increment)(2)
+        assert 2 == await Pipeline()(2)
+        assert '<Pipeline(increment, double, increment)>' == repr(pipeline)
+
+    @mark.asyncio
+    async def test_error(self):
+        calls = []
+
+        async def fail(value):
+            raise InvalidRequest('Invalid')
+
+        def record(value):
+            calls.append(value)
+            return value
+
+        with raises(InvalidRequest):
+            await Pipeline(increment, fail, record)(1)
+        assert [] == calls
+
+
+@dataclass
+class CodeResponse(OAuth2Response):
+    code: Optional[str] = None
+
+
+@dataclass
+class TokenResponse(OAuth2Response):
+    access_token: Optional[str] = None
+
+
+@dataclass
+class StubRequest:
+    response_type: list
+
+
+class TestSelectFlows(object):
+    '''Test OpenID Connect flows selection.'''
+
+    @mark.asyncio
+    async def test_fan_out(self, monkeypatch):
+        events = []
+
+        async def code_flow(request):
+            events.append('code start')
+            await sleep(0.01)
+            events.append('code end')
+            return CodeResponse(code='123')
+
+        async def token_flow(request):
+            events.append('token start')
+            await sleep(0.01)
+            events.append('token end')
+            return TokenResponse(access_token='456')
+
+        monkeypatch.setattr(authorization, 'FLOWS', {
+            'code': code_flow,
+            'token': token_flow
+        })
+        monkeypatch.setattr(authorization, 'AuthorizationResponse', dict)
+
+        response = await authorization.select_flows(
+            StubRequest(response_type=['token', 'code']))
+        assert {'code': '123', 'access_token': '456'} == response
+        # Flows are run concurrently
+        assert {'code start', 'token start'} == set(events[:2])
+
+    @mark.asyncio
+    async def test_invalid(self):
+        with raises(InvalidRequest):
+            await authorization.select_flows(
+                StubRequest(response_type=['code', 'unknown']))
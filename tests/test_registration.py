@@ -49,7 +49,7 @@ class TestRegistration(object):
         assert response.headers['Content-Type'] == 'text/plain; charset=utf-8'
         assert response.status == 200
 
-        user = store.users.get_by_username('admin')
+        user = await store.users.get_by_username('admin')
         assert 'Ivan' == user.given_name
         assert 'Ivanovich' == user.patronymic
         assert 'Smirnov' == user.family_name
@@ -81,7 +81,7 @@ class TestRegistration(object):
 
         assert {'status': 'ok'} == res_data['meta']
 
-        user = store.users.get_by_username('admin')
+        user = await store.users.get_by_username('admin')
         assert 'Ivan' == user.given_name
         assert 'Ivanovich' == user.patronymic
         assert 'Sidorov' == user.family_name
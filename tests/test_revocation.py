@@ -0,0 +1,133 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import sleep
+from time import time
+from uuid import uuid4
+
+from pytest import mark
+
+from bigur.auth.revocation import BloomFilter, RevocationList
+
+
+class TestBloomFilter(object):
+    '''Test Bloom filter.'''
+
+    def test_contains(self):
+        bloom = BloomFilter(1000, 0.01)
+        keys = [uuid4().hex for _ in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        assert all(x in bloom for x in keys)
+        false_positives = sum(uuid4().hex in bloom for _ in range(10000))
+        assert false_positives < 300
+
+
+class TestRevocationList(object):
+    '''Test list of revoked tokens.'''
+
+    def test_revoke(self):
+        revocations = RevocationList()
+        exp = time() + 60
+        assert not revocations.is_revoked('jti', exp)
+        assert revocations.revoke('jti', exp)
+        assert revocations.is_revoked('jti', exp)
+        assert not revocations.is_revoked('other', exp)
+        assert not revocations.is_revoked(None, exp)
+        assert not revocations.is_revoked('jti', None)
+        # Revoked twice is counted once
+        assert revocations.revoke('jti', exp)
+        assert len(revocations) == 1
+
+    def test_expired(self):
+        revocations = RevocationList()
+        assert not revocations.revoke('jti', time() - 1)
+        assert len(revocations) == 0
+
+    def test_buckets(self):
+        revocations = RevocationList(bucket_width=10)
+        now = 1000.0
+        for i in range(30):
+            revocations.revoke(str(i), now + i + 0.5, now=now)
+        assert revocations.stats() == {
+            'live': 30,
+            'buckets': 3,
+            'reaped': 0
+        }
+        # Bucket is dropped after its latest token expired
+        assert revocations.reap(now=now + 9) == 0
+        assert revocations.reap(now=now + 10) == 10
+        assert revocations.is_revoked('29', now + 29.5, now=now + 15)
+
+        # Lookup drops expired buckets too
+        assert not revocations.is_revoked('29', now + 29.5, now=now + 30)
+        assert revocations.stats() == {
+            'live': 0,
+            'buckets': 0,
+            'reaped': 30
+        }
+
+    def test_bloom(self):
+        revocations = RevocationList(bloom=True, capacity=16)
+        exp = time() + 60
+        ids = [uuid4().hex for _ in range(100)]
+        for jti in ids:
+            revocations.revoke(jti, exp)
+        # Filter is rebuilt with larger capacity
+        assert all(revocations.is_revoked(x, exp) for x in ids)
+        assert not revocations.is_revoked(uuid4().hex, exp)
+
+    def test_configure(self):
+        revocations = RevocationList()
+        revocations.revoke('jti', time() + 60)
+        revocations.configure(bucket_width=1, bloom=True)
+        assert revocations.bucket_width == 1
+        assert len(revocations) == 0
+        revocations.revoke('jti', time() + 60)
+        assert revocations.is_revoked('jti', time() + 60)
+
+
+class TestSharedRevocationList(object):
+    '''Test revocations shared by processes through database.'''
+
+    @mark.asyncio
+    async def test_sync(self, tmpdir):
+        path = str(tmpdir.join('revocations.sqlite'))
+        first = RevocationList(path=path, sync_interval=0.01)
+        second = RevocationList(path=path, sync_interval=0.01)
+        await first.start()
+        await second.start()
+        try:
+            exp = time() + 60
+            first.revoke('jti', exp)
+            assert not second.is_revoked('jti', exp)
+            await sleep(0.05)
+            assert second.is_revoked('jti', exp)
+            assert len(second) == 1
+
+            # Own revocations are not counted twice
+            assert await first.sync() == 0
+            assert len(first) == 1
+        finally:
+            await first.stop()
+            await second.stop()
+
+    @mark.asyncio
+    async def test_load(self, tmpdir):
+        path = str(tmpdir.join('revocations.sqlite'))
+        revocations = RevocationList(path=path)
+        await revocations.start()
+        revocations.revoke('jti', time() + 60)
+        revocations.revoke('expired', time() + 0.01)
+        # Pending revocations are written on stop
+        await revocations.stop()
+
+        await sleep(0.02)
+        revocations = RevocationList(path=path, bloom=True)
+        await revocations.start()
+        try:
+            assert len(revocations) == 1
+            assert revocations.is_revoked('jti', time() + 60)
+        finally:
+            await revocations.stop()
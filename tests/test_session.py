@@ -0,0 +1,241 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import sleep
+from time import time
+from urllib.parse import urlparse
+
+from pytest import fixture, mark
+
+from bigur.auth.authn.user.base import cookie_cache
+from bigur.auth.handler.oauth2 import AuthorizationHandler
+from bigur.auth.session import (MemorySessionStore, Session,
+                                SQLiteSessionStore, sessions)
+
+# pylint: disable=unused-argument,redefined-outer-name
+
+
+@fixture
+async def sqlite_store(tmpdir):
+    store = SQLiteSessionStore(path=str(tmpdir.join('sessions.sqlite')))
+    yield store
+    await store.stop()
+
+
+@fixture
+def authorization_endpoint(app, authn_userpass):
+    app.router.add_route('*', '/auth/authorize', AuthorizationHandler)
+
+
+class TestMemorySessionStore(object):
+    '''Test memory session store.'''
+
+    @mark.asyncio
+    async def test_put_get(self):
+        store = MemorySessionStore()
+        session = await store.put(Session(user_id='user'))
+        assert session.expires > time()
+        assert await store.get(session.sid) is session
+        assert await store.get('unknown') is None
+
+    @mark.asyncio
+    async def test_expired(self):
+        store = MemorySessionStore(ttl=0.01)
+        session = await store.put(Session())
+        await sleep(0.02)
+        assert await store.get(session.sid) is None
+        assert len(store) == 0
+
+    @mark.asyncio
+    async def test_sliding(self):
+        store = MemorySessionStore(ttl=10)
+        first = await store.put(Session())
+        second = await store.put(Session())
+        expires = first.expires
+        assert await store.get(first.sid) is first
+        assert first.expires > expires
+        # First session is prolonged, so it expires last
+        assert await store.reap(now=second.expires) == 1
+        assert await store.get(first.sid) is first
+
+    @mark.asyncio
+    async def test_fixed(self):
+        store = MemorySessionStore(ttl=10, sliding=False)
+        session = await store.put(Session())
+        expires = session.expires
+        assert await store.get(session.sid) is session
+        await store.put(Session(sid=session.sid, user_id='user'))
+        assert (await store.get(session.sid)).expires == expires
+
+    @mark.asyncio
+    async def test_eviction(self):
+        store = MemorySessionStore(maxsize=2)
+        first = await store.put(Session())
+        second = await store.put(Session())
+        await store.get(first.sid)
+        await store.put(Session())
+        assert len(store) == 2
+        assert await store.get(second.sid) is None
+        assert await store.get(first.sid) is first
+        assert store.stats()['evicted'] == 1
+
+    @mark.asyncio
+    async def test_revoke(self):
+        store = MemorySessionStore()
+        first = await store.put(Session(user_id='user'))
+        await store.put(Session(user_id='user'))
+        other = await store.put(Session(user_id='other'))
+        assert await store.revoke('user') == 2
+        assert await store.get(first.sid) is None
+        assert await store.get(other.sid) is other
+        other.user_id = 'user'
+        await store.put(other)
+        assert await store.revoke('other') == 0
+        assert await store.revoke('user') == 1
+
+    @mark.asyncio
+    async def test_reap(self):
+        store = MemorySessionStore(ttl=10)
+        for _ in range(5):
+            await store.put(Session())
+        assert await store.reap(limit=3, now=time() + 20) == 3
+        assert await store.reap(now=time()) == 0
+        assert await store.reap(now=time() + 20) == 2
+        assert store.stats() == {'live': 0, 'reaped': 5, 'evicted': 0}
+
+    @mark.asyncio
+    async def test_reaper(self):
+        store = MemorySessionStore(ttl=0.01, reap_interval=0.01)
+        await store.start()
+        try:
+            await store.put(Session())
+            await sleep(0.05)
+            assert len(store) == 0
+        finally:
+            await store.stop()
+
+
+class TestSQLiteSessionStore(object):
+    '''Test SQLite session store.'''
+
+    @mark.asyncio
+    async def test_put_get(self, sqlite_store):
+        session = await sqlite_store.put(
+            Session(user_id='user', data={'a': 1}))
+        stored = await sqlite_store.get(session.sid)
+        assert (stored.sid, stored.user_id, stored.data,
+                stored.created) == (session.sid, 'user', {'a': 1},
+                                    session.created)
+        assert await sqlite_store.get('unknown') is None
+        await sqlite_store.delete(session.sid)
+        assert await sqlite_store.get(session.sid) is None
+
+    @mark.asyncio
+    async def test_persistent(self, tmpdir):
+        path = str(tmpdir.join('sessions.sqlite'))
+        store = SQLiteSessionStore(path=path)
+        await store.start()
+        session = await store.put(Session(user_id='user'))
+        await store.stop()
+
+        store = SQLiteSessionStore(path=path)
+        await store.start()
+        try:
+            assert (await store.get(session.sid)).user_id == 'user'
+        finally:
+            await store.stop()
+
+    @mark.asyncio
+    async def test_expired(self, tmpdir):
+        store = SQLiteSessionStore(
+            path=str(tmpdir.join('sessions.sqlite')), ttl=0.01)
+        try:
+            session = await store.put(Session())
+            await sleep(0.02)
+            assert await store.get(session.sid) is None
+        finally:
+            await store.stop()
+
+    @mark.asyncio
+    async def test_touch_interval(self, tmpdir):
+        store = SQLiteSessionStore(
+            path=str(tmpdir.join('sessions.sqlite')), touch_interval=0)
+        try:
+            session = await store.put(Session())
+            first = await store.get(session.sid)
+            second = await store.get(session.sid)
+            assert second.expires >= first.expires > session.expires
+        finally:
+            await store.stop()
+
+    @mark.asyncio
+    async def test_revoke(self, sqlite_store):
+        await sqlite_store.put(Session(user_id='user'))
+        await sqlite_store.put(Session(user_id='user'))
+        other = await sqlite_store.put(Session(user_id='other'))
+        assert await sqlite_store.revoke('user') == 2
+        assert (await sqlite_store.get(other.sid)).user_id == 'other'
+
+    @mark.asyncio
+    async def test_reap(self, sqlite_store):
+        for _ in range(5):
+            await sqlite_store.put(Session())
+        assert await sqlite_store.reap(limit=3, now=time() + 86400 * 2) == 3
+        assert await sqlite_store.reap(now=time()) == 0
+        assert await sqlite_store.reap(now=time() + 86400 * 2) == 2
+        assert sqlite_store.stats() == {'reaped': 5}
+
+
+class TestSessionMiddleware(object):
+    '''Test session middleware.'''
+
+    @mark.asyncio
+    async def test_new_session(self, authn_userpass, cli):
+        response = await cli.get('/auth/login')
+        sid = response.cookies['sid'].value
+        # Anonymous session is not saved
+        assert await sessions.get(sid) is None
+
+    @mark.asyncio
+    async def test_anonymous_eviction(self, user, authorization_endpoint,
+                                      login, cli):
+        store = MemorySessionStore(maxsize=3)
+        sid = login.cookies['sid'].value
+        await store.put(await sessions.get(sid))
+        await sessions.stop()
+        sessions.set_store(store)
+        await sessions.start()
+
+        cli.session.cookie_jar.clear()
+        for _ in range(5):
+            await cli.get('/auth/login')
+        assert len(store) == 1
+        assert (await store.get(sid)).user_id == user.id
+
+    @mark.asyncio
+    async def test_unknown_session(self, authn_userpass, cli):
+        cli.session.cookie_jar.update_cookies({'sid': 'unknown'})
+        response = await cli.get('/auth/login')
+        assert response.cookies['sid'].value != 'unknown'
+
+    @mark.asyncio
+    async def test_login_binds_session(self, user, authorization_endpoint,
+                                       login, cli):
+        sid = login.cookies['sid'].value
+        assert (await sessions.get(sid)).user_id == user.id
+
+    @mark.asyncio
+    async def test_revoked_session(self, user, authorization_endpoint, login,
+                                   cli):
+        cookie_cache.clear()
+        response = await cli.get('/auth/authorize', allow_redirects=False)
+        assert response.status == 401
+        assert cookie_cache.stats()['size'] == 1
+
+        # Cached cookie of user is dropped with sessions
+        assert await sessions.revoke(user.id) == 1
+        assert cookie_cache.stats()['size'] == 0
+        response = await cli.get('/auth/authorize', allow_redirects=False)
+        assert response.status == 303
+        assert urlparse(response.headers['Location']).path == '/auth/login'
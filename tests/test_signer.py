@@ -0,0 +1,192 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import ensure_future, gather, sleep as async_sleep
+from time import sleep
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jwt import decode as jwt_decode, encode as jwt_encode
+from jwt import get_unverified_header
+from jwt.utils import base64url_decode
+from pytest import mark, raises
+
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.oauth2.exceptions import TemporaryUnavailable
+from bigur.auth.oidc.grant.implicit import IDToken
+from bigur.auth.signer import (
+    ExecutorSigningBackend,
+    Signer,
+    create_backend,
+    generate_key,
+)
+from bigur.auth.verifier import TokenVerifier
+
+
+class TestSigner(object):
+    '''Test JWT signer.'''
+
+    def test_sign(self, jwt_key, decode_token):
+        signer = Signer(jwt_key)
+        token = signer.sign({'sub': '123', 'scope': ['one']})
+        assert decode_token(token) == {'sub': '123', 'scope': ['one']}
+        assert get_unverified_header(token) == {
+            'alg': 'RS256',
+            'kid': KeyJar.key_id(jwt_key),
+            'typ': 'JWT'
+        }
+
+    def test_key_jar(self, jwt_key, decode_token):
+        key_jar = KeyJar(keys=[jwt_key])
+        signer = key_jar.get_signer()
+        assert signer.key is jwt_key
+        assert key_jar.get_signer(KeyJar.key_id(jwt_key)) is signer
+        assert KeyJar.instance() is key_jar
+        with raises(KeyError):
+            key_jar.get_signer('unknown')
+
+    def test_no_keys(self):
+        with raises(KeyError):
+            KeyJar(keys=[]).get_signer()
+
+    def test_encode(self, jwt_key, decode_token):
+        token = IDToken(
+            iss='https://localhost',
+            sub='123',
+            aud='client',
+            nonce='nonce',
+            iat=1,
+            exp=2)
+        assert token.encode(Signer(jwt_key)) == token.encode(jwt_key)
+        assert decode_token(
+            token.encode(jwt_key),
+            audience='client',
+            options={'verify_exp': False})['nonce'] == 'nonce'
+
+
+class TestSigningBackend(object):
+    '''Test signing backends.'''
+
+    @mark.asyncio
+    @mark.parametrize('backend', ['inline', 'thread', 'process'])
+    async def test_sign(self, backend, jwt_key, decode_token):
+        key_jar = KeyJar(keys=[jwt_key])
+        await key_jar.start(create_backend(backend, workers=2))
+        try:
+            tokens = await gather(
+                *[key_jar.sign({'sub': str(x)}) for x in range(10)])
+        finally:
+            await key_jar.stop()
+        assert [decode_token(x)['sub'] for x in tokens] == [
+            str(x) for x in range(10)
+        ]
+
+    @mark.asyncio
+    async def test_new_key(self, jwt_key):
+        key_jar = KeyJar(keys=[jwt_key])
+        await key_jar.start(create_backend('process', workers=1))
+        try:
+            new_key = rsa.generate_private_key(
+                public_exponent=65537,
+                key_size=2048,
+                backend=default_backend())
+            kid = key_jar.add_key(new_key).kid
+            token = await key_jar.sign({'sub': '123'}, kid=kid)
+        finally:
+            await key_jar.stop()
+        assert get_unverified_header(token)['kid'] == kid
+
+    @mark.asyncio
+    async def test_queue_full(self, jwt_key):
+        key_jar = KeyJar(keys=[jwt_key])
+        await key_jar.start(ExecutorSigningBackend('thread', queue=1))
+        try:
+            with raises(TemporaryUnavailable):
+                await gather(key_jar.sign({}), key_jar.sign({}))
+        finally:
+            await key_jar.stop()
+
+    @mark.asyncio
+    async def test_stop(self):
+        backend = ExecutorSigningBackend('thread', workers=1)
+        await backend.start([])
+        # Pool is busy, shutdown waits for it
+        backend._pool.submit(sleep, 0.2)  # pylint: disable=protected-access
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await async_sleep(0.01)
+
+        task = ensure_future(tick())
+        await backend.stop()
+        task.cancel()
+        assert backend._pool is None  # pylint: disable=protected-access
+        # Event loop is not blocked while pool shuts down
+        assert ticks >= 5
+
+
+class TestAlgorithms(object):
+    '''Test signing with keys of different types.'''
+
+    @mark.parametrize('alg', ['RS256', 'ES256', 'EdDSA'])
+    def test_sign(self, alg):
+        key = generate_key(alg, key_size=1024)
+        signer = Signer(key)
+        assert signer.alg == alg
+        token = signer.sign({'sub': '123'})
+        assert get_unverified_header(token)['alg'] == alg
+
+        verifier = TokenVerifier({signer.kid: key.public_key()},
+                                 require_exp=False)
+        assert verifier.verify(token) == {'sub': '123'}
+        # Public key is restored from JWK
+        verifier = TokenVerifier.from_jwks({'keys': [signer.jwk()]},
+                                           require_exp=False)
+        assert verifier.verify(token) == {'sub': '123'}
+
+    def test_es256_pyjwt(self):
+        key = generate_key('ES256')
+        signer = Signer(key)
+        assert jwt_decode(
+            signer.sign({'sub': '123'}), key.public_key(),
+            algorithms=['ES256']) == {'sub': '123'}
+
+        token = jwt_encode({'sub': '123'}, key, algorithm='ES256',
+                           headers={'kid': signer.kid})
+        verifier = TokenVerifier({signer.kid: key.public_key()},
+                                 require_exp=False)
+        assert verifier.verify(token) == {'sub': '123'}
+
+    def test_jwk(self):
+        jwk = Signer(generate_key('ES256')).jwk()
+        assert (jwk['kty'], jwk['crv'], jwk['alg']) == ('EC', 'P-256',
+                                                        'ES256')
+        assert len(base64url_decode(jwk['x'])) == 32
+        assert len(base64url_decode(jwk['y'])) == 32
+
+        jwk = Signer(generate_key('EdDSA')).jwk()
+        assert (jwk['kty'], jwk['crv'], jwk['alg']) == ('OKP', 'Ed25519',
+                                                        'EdDSA')
+        assert len(base64url_decode(jwk['x'])) == 32
+
+    def test_unsupported(self):
+        with raises(ValueError):
+            Signer(ec.generate_private_key(ec.SECP384R1(), default_backend()))
+        with raises(ValueError):
+            generate_key('HS256')
+
+    @mark.asyncio
+    async def test_process_backend(self):
+        key = generate_key('EdDSA')
+        key_jar = KeyJar(keys=[key])
+        await key_jar.start(create_backend('process', workers=1))
+        try:
+            token = await key_jar.sign({'sub': '123'})
+        finally:
+            await key_jar.stop()
+        verifier = TokenVerifier(key_jar.verifier.keys, require_exp=False)
+        assert verifier.verify(token) == {'sub': '123'}
@@ -0,0 +1,287 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import gather, sleep
+from datetime import datetime
+from time import time
+
+from pytest import mark, raises
+
+from bigur.auth.model import Provider, User
+from bigur.auth.store import Memory
+
+
+class TestMemoryIndexes(object):
+    '''Test secondary indexes of memory store.'''
+
+    @mark.asyncio
+    async def test_username(self, store):
+        user = await store.users.put(User(username='admin'))
+        assert await store.users.get_by_username('admin') is user
+        with raises(KeyError):
+            await store.users.get_by_username('root')
+
+    @mark.asyncio
+    async def test_username_changed(self, store):
+        user = await store.users.put(User(username='admin'))
+        user.username = 'root'
+        await store.users.put(user)
+        assert await store.users.get_by_username('root') is user
+        with raises(KeyError):
+            await store.users.get_by_username('admin')
+
+    @mark.asyncio
+    async def test_changed_without_put(self, store):
+        user = await store.users.put(User(username='admin'))
+        user.username = 'root'
+        with raises(KeyError):
+            await store.users.get_by_username('admin')
+        assert await store.users.get_by_username('root') is user
+
+    @mark.asyncio
+    async def test_shared_key(self, store):
+        first = await store.users.put(User(username='admin'))
+        second = await store.users.put(User(username='admin'))
+        assert await store.users.get_by_username('admin') is first
+
+        first.username = 'root'
+        await store.users.put(first)
+        assert await store.users.get_by_username('admin') is second
+        assert await store.users.get_by_username('root') is first
+
+        await store.users.delete(second.id)
+        with raises(KeyError):
+            await store.users.get_by_username('admin')
+
+    @mark.asyncio
+    async def test_oidp(self, store):
+        user = await store.users.put(User(username='admin'))
+        user.add_oidc_account('google', '123')
+        await store.users.put(user)
+        assert await store.users.get_by_oidp('google', '123') is user
+
+        user.delete_oidc_account('google')
+        await store.users.put(user)
+        with raises(KeyError):
+            await store.users.get_by_oidp('google', '123')
+
+    @mark.asyncio
+    async def test_delete(self, store):
+        user = await store.users.put(User(username='admin'))
+        await store.users.delete(user.id)
+        with raises(KeyError):
+            await store.users.get_by_username('admin')
+        with raises(KeyError):
+            await store.users.get(user.id)
+
+    @mark.asyncio
+    async def test_domain(self, store):
+        provider = await store.providers.put(
+            Provider(
+                issuer='https://accounts.google.com',
+                authorization_endpoint='https://accounts.google.com/auth',
+                jwks_uri='https://www.googleapis.com/oauth2/v3/certs',
+                response_types_supported=['code'],
+                subject_types_supported=['public'],
+                id_token_signing_alg_values_supported=['RS256'],
+                client_id='123',
+                client_secret='xxx',
+                domains=['google.com', 'accounts.google.com']))
+        assert await store.providers.get_by_domain('google.com') is provider
+        assert await store.providers.get_by_domain(
+            'accounts.google.com') is provider
+
+        provider.domains = ['google.com']
+        await store.providers.put(provider)
+        with raises(KeyError):
+            await store.providers.get_by_domain('accounts.google.com')
+
+    @mark.asyncio
+    async def test_access_code(self, store):
+        code = await store.access_codes.create(code='test')
+        assert await store.access_codes.get_by_code('test') is code
+        with raises(KeyError):
+            await store.access_codes.get_by_code('other')
+
+
+class TestMemoryAccessCodesExpiry(object):
+    '''Test removing of expired and used access codes.'''
+
+    @mark.asyncio
+    async def test_expires(self, store):
+        code = await store.access_codes.create()
+        assert code.expires > code.created
+        assert not code.is_expired()
+
+    @mark.asyncio
+    async def test_reap_expired(self, store):
+        await store.access_codes.create(
+            code='expired', created=datetime(1970, 1, 1))
+        await store.access_codes.create(code='live')
+        assert store.access_codes.stats() == {'live': 2, 'reaped': 0}
+
+        assert store.access_codes.reap() == 1
+        assert store.access_codes.stats() == {'live': 1, 'reaped': 1}
+        with raises(KeyError):
+            await store.access_codes.get_by_code('expired')
+        assert await store.access_codes.get_by_code('live')
+
+    @mark.asyncio
+    async def test_reap_used(self, store):
+        code = await store.access_codes.create(code='used')
+        code.used = True
+        await store.access_codes.put(code)
+        assert store.access_codes.reap() == 1
+        with raises(KeyError):
+            await store.access_codes.get_by_code('used')
+
+    @mark.asyncio
+    async def test_reap_batch(self, store):
+        for _ in range(10):
+            await store.access_codes.create(created=datetime(1970, 1, 1))
+        assert store.access_codes.reap(limit=3) == 3
+        assert store.access_codes.reap(limit=3) == 3
+        assert store.access_codes.reap() == 4
+        assert store.access_codes.stats() == {'live': 0, 'reaped': 10}
+
+    @mark.asyncio
+    async def test_reap_consumed(self, store):
+        await store.access_codes.create(code='test', client_id='client')
+        await store.access_codes.consume('test', 'client')
+        assert store.access_codes.reap() == 1
+
+    @mark.asyncio
+    async def test_deleted(self, store):
+        code = await store.access_codes.create(created=datetime(1970, 1, 1))
+        await store.access_codes.delete(code.id)
+        assert store.access_codes.reap() == 0
+
+    @mark.asyncio
+    async def test_reaper_task(self):
+        store = Memory(reap_interval=0.01)
+        await store.access_codes.create(created=datetime(1970, 1, 1))
+        await store.start()
+        await sleep(0.05)
+        await store.stop()
+        assert store.access_codes.stats() == {'live': 0, 'reaped': 1}
+
+
+class TestMemoryAccessCodesConsume(object):
+    '''Test redemption of access codes.'''
+
+    @mark.asyncio
+    async def test_consume(self, store):
+        code = await store.access_codes.create(
+            code='test', client_id='client', redirect_uri='http://localhost')
+        assert await store.access_codes.consume(
+            'test', 'client', 'http://localhost') is code
+        assert code.used
+        with raises(ValueError, match='already used'):
+            await store.access_codes.consume('test', 'client',
+                                             'http://localhost')
+
+    @mark.asyncio
+    async def test_not_found(self, store):
+        with raises(KeyError):
+            await store.access_codes.consume('test', 'client')
+
+    @mark.asyncio
+    async def test_expired(self, store):
+        await store.access_codes.create(
+            code='test', client_id='client', created=datetime(1970, 1, 1))
+        with raises(ValueError, match='expired'):
+            await store.access_codes.consume('test', 'client')
+
+    @mark.asyncio
+    async def test_mismatch(self, store):
+        code = await store.access_codes.create(
+            code='test', client_id='client', redirect_uri='http://localhost')
+        with raises(ValueError, match='another client'):
+            await store.access_codes.consume('test', 'other',
+                                             'http://localhost')
+        with raises(ValueError, match='redirect_uri'):
+            await store.access_codes.consume('test', 'client')
+        assert not code.used
+
+    @mark.asyncio
+    async def test_concurrent(self, store):
+        await store.access_codes.create(code='test', client_id='client')
+
+        async def consume():
+            await sleep(0)
+            return await store.access_codes.consume('test', 'client')
+
+        results = await gather(*[consume() for _ in range(100)],
+                               return_exceptions=True)
+        assert len([x for x in results if not isinstance(x, Exception)]) == 1
+
+
+class TestMemoryRefreshTokens(object):
+    '''Test refresh tokens collection.'''
+
+    @mark.asyncio
+    async def test_rotate(self, store):
+        token = await store.refresh_tokens.create(
+            id=b'first', family='family', user_id='user', client_id='client')
+        assert await store.refresh_tokens.rotate(b'first', 'client') is token
+        assert token.used
+        with raises(KeyError):
+            await store.refresh_tokens.rotate(b'other', 'client')
+
+    @mark.asyncio
+    async def test_another_client(self, store):
+        token = await store.refresh_tokens.create(
+            id=b'first', family='family', user_id='user', client_id='client')
+        with raises(ValueError, match='another client'):
+            await store.refresh_tokens.rotate(b'first', 'other')
+        assert not token.used
+
+    @mark.asyncio
+    async def test_reuse(self, store):
+        for key in (b'first', b'second'):
+            await store.refresh_tokens.create(
+                id=key, family='family', user_id='user', client_id='client')
+        other = await store.refresh_tokens.create(
+            id=b'other', family='other', user_id='user', client_id='client')
+        await store.refresh_tokens.rotate(b'first', 'client')
+        with raises(ValueError, match='already used'):
+            await store.refresh_tokens.rotate(b'first', 'client')
+        with raises(KeyError):
+            await store.refresh_tokens.get(b'second')
+        assert await store.refresh_tokens.get(b'other') is other
+        assert store.refresh_tokens.stats() == {
+            'live': 1,
+            'reaped': 0,
+            'revoked': 2
+        }
+
+    @mark.asyncio
+    async def test_reap(self, store):
+        now = time()
+        for i in range(5):
+            await store.refresh_tokens.create(
+                id=bytes([i]),
+                family='family',
+                user_id='user',
+                client_id='client',
+                expires=now + i)
+        await store.refresh_tokens.revoke_family('family')
+        await store.refresh_tokens.create(
+            id=b'expired', family='other', user_id='user',
+            client_id='client', expires=now - 1)
+        await store.refresh_tokens.create(
+            id=b'live', family='other', user_id='user', client_id='client')
+        # Revoked tokens are skipped
+        assert store.refresh_tokens.reap(now=now + 10) == 1
+        assert store.refresh_tokens.stats() == {
+            'live': 1,
+            'reaped': 1,
+            'revoked': 5
+        }
+
+    @mark.asyncio
+    async def test_slots(self, store):
+        token = await store.refresh_tokens.create(
+            id=b'first', family='family', user_id='user', client_id='client')
+        assert not hasattr(token, '__dict__')
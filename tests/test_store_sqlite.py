@@ -0,0 +1,286 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from asyncio import gather, sleep
+from datetime import datetime
+from time import time
+
+from pytest import fixture, mark, raises
+
+from bigur.auth.model import Client, Human, Provider, Scope, User
+from bigur.auth.store import SQLite
+
+# pylint: disable=redefined-outer-name
+
+
+@fixture
+def path(tmpdir):
+    return str(tmpdir.join('store.sqlite'))
+
+
+@fixture
+async def sqlite_store(path):
+    # Not started, so reaper does not race with tests
+    store = SQLite(path=path)
+    yield store
+    await store.stop()
+
+
+@fixture
+async def other_store(path, sqlite_store):
+    '''Store of other process, opening the same database.'''
+    store = SQLite(path=path)
+    yield store
+    await store.stop()
+
+
+class TestSQLiteObjects(object):
+    '''Test objects and their secondary keys in SQLite store.'''
+
+    @mark.asyncio
+    async def test_user(self, sqlite_store, other_store):
+        user = await sqlite_store.users.create(username='admin',
+                                               password='123',
+                                               given_name='Admin')
+        loaded = await other_store.users.get(user.id)
+        assert isinstance(loaded, Human)
+        assert loaded == user
+        assert loaded.verify_password('123')
+        assert await other_store.users.get_by_username('admin') == user
+        with raises(KeyError):
+            await other_store.users.get_by_username('root')
+
+    @mark.asyncio
+    async def test_username_changed(self, sqlite_store):
+        user = await sqlite_store.users.put(User(username='admin'))
+        user.username = 'root'
+        await sqlite_store.users.put(user)
+        assert (await sqlite_store.users.get_by_username('root')).id == user.id
+        with raises(KeyError):
+            await sqlite_store.users.get_by_username('admin')
+
+    @mark.asyncio
+    async def test_shared_key(self, sqlite_store):
+        first = await sqlite_store.users.put(User(username='admin'))
+        second = await sqlite_store.users.put(User(username='admin'))
+        assert (await sqlite_store.users.get_by_username('admin')) == first
+
+        await sqlite_store.users.delete(first.id)
+        assert (await sqlite_store.users.get_by_username('admin')) == second
+
+    @mark.asyncio
+    async def test_oidp(self, sqlite_store):
+        user = await sqlite_store.users.put(User(username='admin'))
+        user.add_oidc_account('google', '123')
+        await sqlite_store.users.put(user)
+        assert await sqlite_store.users.get_by_oidp('google', '123') == user
+
+        user.delete_oidc_account('google')
+        await sqlite_store.users.put(user)
+        with raises(KeyError):
+            await sqlite_store.users.get_by_oidp('google', '123')
+
+    @mark.asyncio
+    async def test_delete(self, sqlite_store):
+        user = await sqlite_store.users.put(User(username='admin'))
+        await sqlite_store.users.delete(user.id)
+        with raises(KeyError):
+            await sqlite_store.users.get_by_username('admin')
+        with raises(KeyError):
+            await sqlite_store.users.get(user.id)
+        with raises(KeyError):
+            await sqlite_store.users.delete(user.id)
+
+    @mark.asyncio
+    async def test_client(self, sqlite_store):
+        client = await sqlite_store.clients.create(client_type='confidential',
+                                                   user_id='user',
+                                                   title='Test',
+                                                   password='xxx')
+        loaded = await sqlite_store.clients.get(client.id)
+        assert loaded == client
+        assert loaded.verify_password('xxx')
+
+    @mark.asyncio
+    async def test_scopes(self, sqlite_store):
+        await sqlite_store.scopes.put(Scope(code='one', title='One'))
+        default = await sqlite_store.scopes.put(
+            Scope(code='two', title='Two', default=True))
+        assert (await sqlite_store.scopes.get_by_code('one')).title == 'One'
+        assert await sqlite_store.scopes.get_default_scopes() == [default]
+        with raises(KeyError):
+            await sqlite_store.scopes.get_by_code('three')
+
+    @mark.asyncio
+    async def test_domain(self, sqlite_store):
+        provider = Provider(
+            issuer='https://accounts.google.com',
+            authorization_endpoint='https://accounts.google.com/auth',
+            jwks_uri='https://www.googleapis.com/oauth2/v3/certs',
+            response_types_supported=['code'],
+            subject_types_supported=['public'],
+            id_token_signing_alg_values_supported=['RS256'],
+            client_id='123',
+            client_secret='xxx',
+            domains=['google.com', 'accounts.google.com'])
+        # Parsed keys are not saved
+        provider._verification_keys['kid'] = object()  # noqa
+        await sqlite_store.providers.put(provider)
+
+        loaded = await sqlite_store.providers.get_by_domain('google.com')
+        assert loaded.issuer == provider.issuer
+        assert loaded._verification_keys == {}  # noqa
+        assert loaded.keys_expired()
+
+        provider.domains = ['google.com']
+        await sqlite_store.providers.put(provider)
+        with raises(KeyError):
+            await sqlite_store.providers.get_by_domain('accounts.google.com')
+
+
+class TestSQLiteAccessCodes(object):
+    '''Test access codes in SQLite store.'''
+
+    @mark.asyncio
+    async def test_consume(self, sqlite_store, other_store):
+        code = await sqlite_store.access_codes.create(
+            code='test', client_id='client', redirect_uri='http://localhost')
+        assert await other_store.access_codes.get_by_code('test') == code
+        consumed = await other_store.access_codes.consume(
+            'test', 'client', 'http://localhost')
+        assert consumed.id == code.id
+        assert consumed.used
+        with raises(ValueError, match='already used'):
+            await sqlite_store.access_codes.consume('test', 'client',
+                                                    'http://localhost')
+        with raises(KeyError):
+            await sqlite_store.access_codes.consume('other', 'client')
+
+    @mark.asyncio
+    async def test_mismatch(self, sqlite_store):
+        await sqlite_store.access_codes.create(
+            code='test', client_id='client', redirect_uri='http://localhost')
+        with raises(ValueError, match='another client'):
+            await sqlite_store.access_codes.consume('test', 'other',
+                                                    'http://localhost')
+        with raises(ValueError, match='redirect_uri'):
+            await sqlite_store.access_codes.consume('test', 'client')
+        assert not (await sqlite_store.access_codes.get_by_code('test')).used
+
+    @mark.asyncio
+    async def test_expired(self, sqlite_store):
+        await sqlite_store.access_codes.create(
+            code='test', client_id='client', created=datetime(1970, 1, 1))
+        with raises(ValueError, match='expired'):
+            await sqlite_store.access_codes.consume('test', 'client')
+
+    @mark.asyncio
+    async def test_concurrent(self, sqlite_store, other_store):
+        await sqlite_store.access_codes.create(code='test', client_id='client')
+        results = await gather(
+            *[store.access_codes.consume('test', 'client')
+              for store in (sqlite_store, other_store) * 10],
+            return_exceptions=True)
+        assert len([x for x in results if not isinstance(x, Exception)]) == 1
+
+    @mark.asyncio
+    async def test_reap(self, sqlite_store):
+        await sqlite_store.access_codes.create(code='expired',
+                                               created=datetime(1970, 1, 1))
+        await sqlite_store.access_codes.create(code='used', client_id='client')
+        await sqlite_store.access_codes.consume('used', 'client')
+        await sqlite_store.access_codes.create(code='live')
+
+        assert await sqlite_store.access_codes.reap(limit=1) == 1
+        assert await sqlite_store.access_codes.reap() == 1
+        assert sqlite_store.access_codes.stats() == {'reaped': 2}
+        assert await sqlite_store.access_codes.get_by_code('live')
+
+    @mark.asyncio
+    async def test_reaper_task(self, path):
+        store = SQLite(path=path, reap_interval=0.01)
+        await store.access_codes.create(created=datetime(1970, 1, 1))
+        await store.start()
+        await sleep(0.05)
+        await store.stop()
+        assert store.access_codes.stats() == {'reaped': 1}
+
+
+class TestSQLiteRefreshTokens(object):
+    '''Test refresh tokens in SQLite store.'''
+
+    @mark.asyncio
+    async def test_rotate(self, sqlite_store, other_store):
+        await sqlite_store.refresh_tokens.create(id=b'first',
+                                                 family='family',
+                                                 user_id='user',
+                                                 client_id='client',
+                                                 scopes=['one', 'two'])
+        token = await other_store.refresh_tokens.rotate(b'first', 'client')
+        assert token.used
+        assert token.scopes == ('one', 'two')
+        with raises(KeyError):
+            await other_store.refresh_tokens.rotate(b'other', 'client')
+
+        await other_store.refresh_tokens.release(b'first')
+        assert not (await sqlite_store.refresh_tokens.get(b'first')).used
+
+    @mark.asyncio
+    async def test_another_client(self, sqlite_store):
+        await sqlite_store.refresh_tokens.create(
+            id=b'first', family='family', user_id='user', client_id='client')
+        with raises(ValueError, match='another client'):
+            await sqlite_store.refresh_tokens.rotate(b'first', 'other')
+        assert not (await sqlite_store.refresh_tokens.get(b'first')).used
+
+    @mark.asyncio
+    async def test_reuse(self, sqlite_store, other_store):
+        for key in (b'first', b'second'):
+            await sqlite_store.refresh_tokens.create(
+                id=key, family='family', user_id='user', client_id='client')
+        await sqlite_store.refresh_tokens.create(
+            id=b'other', family='other', user_id='user', client_id='client')
+        await sqlite_store.refresh_tokens.rotate(b'first', 'client')
+        with raises(ValueError, match='already used'):
+            await other_store.refresh_tokens.rotate(b'first', 'client')
+        with raises(KeyError):
+            await sqlite_store.refresh_tokens.get(b'second')
+        assert await sqlite_store.refresh_tokens.get(b'other')
+        assert other_store.refresh_tokens.stats() == {
+            'reaped': 0,
+            'revoked': 2
+        }
+
+    @mark.asyncio
+    async def test_concurrent(self, sqlite_store, other_store):
+        await sqlite_store.refresh_tokens.create(
+            id=b'first', family='family', user_id='user', client_id='client')
+        results = await gather(
+            sqlite_store.refresh_tokens.rotate(b'first', 'client'),
+            other_store.refresh_tokens.rotate(b'first', 'client'),
+            return_exceptions=True)
+        assert len([x for x in results if not isinstance(x, Exception)]) == 1
+
+    @mark.asyncio
+    async def test_reap(self, sqlite_store):
+        now = time()
+        await sqlite_store.refresh_tokens.create(
+            id=b'expired', family='family', user_id='user',
+            client_id='client', expires=now - 1)
+        await sqlite_store.refresh_tokens.create(
+            id=b'live', family='family', user_id='user', client_id='client')
+        assert await sqlite_store.refresh_tokens.reap() == 1
+        assert await sqlite_store.refresh_tokens.get(b'live')
+        with raises(KeyError):
+            await sqlite_store.refresh_tokens.get(b'expired')
+
+
+class TestSQLiteClient(object):
+    '''Test client objects keep class invariants after loading.'''
+
+    @mark.asyncio
+    async def test_public(self, sqlite_store):
+        client = await sqlite_store.clients.put(
+            Client(client_type='public', user_id='user', title='Public'))
+        assert not (await sqlite_store.clients.get(client.id)).has_password()
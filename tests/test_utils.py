@@ -2,7 +2,18 @@ __author__ = 'Gennady Kovalev <gik@bigur.ru>'
 __copyright__ = '(c) 2016-2019 Development management business group'
 __licence__ = 'For license information see LICENSE'
 
-from bigur.auth.utils import parse_accept, choice_content_type
+from asyncio import gather, sleep
+
+from pytest import mark
+
+from bigur.auth.utils import (
+    LRUCache,
+    SingleFlight,
+    choice_content_type,
+    etag_matches,
+    parse_accept,
+    parse_cache_control,
+)
 
 
 class TestUtils(object):
@@ -51,3 +62,79 @@ class TestUtils(object):
              ('application/xml', 0.9), ('image/webp', 1), ('image/apng', 1),
              ('*/*', 0.8), ('application/signed-exchange', 1)],
             ['application/json', 'text/html']))
+
+    def test_parse_cache_control(self):
+        '''Test Cache-Control header'''
+        assert parse_cache_control(None) is None
+        assert parse_cache_control('public') is None
+        assert 300 == parse_cache_control('public, max-age=300')
+        assert 0 == parse_cache_control('no-cache, max-age=300')
+        assert 0 == parse_cache_control('no-store')
+        assert 10 == parse_cache_control('max-age="10", s-maxage=20')
+        assert parse_cache_control('max-age=abc') is None
+
+    @mark.asyncio
+    async def test_single_flight(self):
+        '''Test coalescing of concurrent calls'''
+        flight = SingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await sleep(0.01)
+            return len(calls)
+
+        results = await gather(*[flight.do('a', call) for _ in range(5)])
+        assert [1] * 5 == results
+        assert 'a' not in flight
+
+        assert 2 == await flight.do('a', call)
+
+    def test_etag_matches(self):
+        '''Test If-None-Match header'''
+        assert etag_matches('"a"', '"a"')
+        assert etag_matches('"a"', '"b", W/"a"')
+        assert etag_matches('"a"', '*')
+        assert not etag_matches('"a"', '"b"')
+        assert not etag_matches('"a"', None)
+
+    def test_lru_cache(self):
+        '''Test LRU cache'''
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+        assert cache.pop('c') == 3
+        assert len(cache) == 1
+        assert cache.stats() == {
+            'size': 1,
+            'hits': 3,
+            'misses': 1,
+            'ratio': 0.75
+        }
+
+    @mark.asyncio
+    async def test_lru_cache_ttl(self):
+        '''Test expiration of cached items'''
+        cache = LRUCache(ttl=0.01)
+        cache.set('a', 1)
+        cache.set('b', 2, ttl=10)
+        assert 'a' in cache
+        await sleep(0.02)
+        assert 'a' not in cache
+        assert cache.get('b') == 2
+
+    def test_lru_cache_pop_value(self):
+        '''Test removing items by value'''
+        cache = LRUCache()
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 1)
+        assert cache.pop_value(1) == 2
+        assert len(cache) == 1
+        assert cache.get('b') == 2
+        assert cache.pop_value(3) == 0
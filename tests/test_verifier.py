@@ -0,0 +1,169 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from json import loads
+from time import time
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import rsa
+from pytest import fixture, mark, raises
+
+from bigur.auth.key_jar import KeyJar
+from bigur.auth.oauth2.exceptions import InvalidToken
+from bigur.auth.signer import Signer, generate_key
+from bigur.auth.verifier import TokenVerifier
+
+# pylint: disable=redefined-outer-name
+
+
+@fixture
+def signer(jwt_key):
+    return Signer(jwt_key)
+
+
+@fixture
+def verifier(signer):
+    return TokenVerifier({signer.kid: signer.key.public_key()},
+                         issuer='https://localhost',
+                         audience='api')
+
+
+@fixture
+def claims():
+    return {
+        'iss': 'https://localhost',
+        'aud': ['api', 'other'],
+        'sub': 'user',
+        'exp': int(time()) + 60
+    }
+
+
+def access_claims(key_jar, claims):
+    '''Returns claims of access token, accepted by key jar's verifier.'''
+    return dict(claims,
+                iss=key_jar.verifier.issuer,
+                client_id='client',
+                scope=['email'])
+
+
+class TestTokenVerifier(object):
+    '''Test token verifier.'''
+
+    def test_verify(self, signer, verifier, claims):
+        token = signer.sign(claims)
+        assert verifier.verify(token) == claims
+        assert verifier.verify(token.decode('ascii')) == claims
+        assert verifier.stats()['hits'] == 1
+
+    def test_signature(self, signer, verifier, claims):
+        head, payload, signature = signer.sign(claims).split(b'.')
+        with raises(InvalidToken, match='signature'):
+            verifier.verify(b'.'.join((head, payload[:-2], signature)))
+
+    def test_malformed(self, verifier):
+        for token in ('', 'abc', 'a.b.c', 'ы.ы.ы', b'e30.e30.'):
+            with raises(InvalidToken):
+                verifier.verify(token)
+
+    def test_unknown_key(self, verifier, claims):
+        signer = Signer(
+            rsa.generate_private_key(
+                public_exponent=65537,
+                key_size=2048,
+                backend=default_backend()))
+        with raises(InvalidToken, match='Unknown'):
+            verifier.verify(signer.sign(claims))
+
+    def test_expired(self, signer, verifier, claims):
+        claims['exp'] = int(time()) - 1
+        with raises(InvalidToken, match='expired'):
+            verifier.verify(signer.sign(claims))
+
+        del claims['exp']
+        with raises(InvalidToken, match='expiration'):
+            verifier.verify(signer.sign(claims))
+
+    def test_leeway(self, signer, verifier, claims):
+        claims['exp'] = int(time()) - 1
+        verifier.leeway = 10
+        assert verifier.verify(signer.sign(claims)) == claims
+
+    def test_expired_in_cache(self, signer, verifier, claims, monkeypatch):
+        token = signer.sign(claims)
+        verifier.verify(token)
+        monkeypatch.setattr('bigur.auth.verifier.time', lambda: time() + 120)
+        with raises(InvalidToken, match='expired'):
+            verifier.verify(token)
+        assert verifier.stats()['size'] == 0
+
+    def test_issuer(self, signer, verifier, claims):
+        claims['iss'] = 'https://other'
+        with raises(InvalidToken, match='issuer'):
+            verifier.verify(signer.sign(claims))
+
+    def test_audience(self, signer, verifier, claims):
+        claims['aud'] = 'api'
+        assert verifier.verify(signer.sign(claims)) == claims
+        claims['aud'] = 'other'
+        with raises(InvalidToken, match='audience'):
+            verifier.verify(signer.sign(claims))
+
+    def test_from_jwks(self, jwt_key, signer, claims):
+        key_jar = KeyJar(keys=[jwt_key])
+        verifier = TokenVerifier.from_jwks(key_jar.jwks)
+        assert verifier.verify(signer.sign(claims)) == claims
+        verifier = TokenVerifier.from_jwks(loads(key_jar.jwks))
+        assert list(verifier.keys) == [signer.kid]
+
+    def test_key_jar(self, jwt_key, signer, claims):
+        key_jar = KeyJar(keys=[])
+        claims = access_claims(key_jar, claims)
+        with raises(InvalidToken):
+            key_jar.verifier.verify(signer.sign(claims))
+        key_jar.add_key(jwt_key)
+        assert key_jar.verifier.verify(signer.sign(claims)) == claims
+
+    def test_key_jar_issuer(self, jwt_key, signer, claims):
+        key_jar = KeyJar(keys=[jwt_key])
+        key_jar.verifier.issuer = 'https://localhost:8889'
+        claims = access_claims(key_jar, claims)
+        assert key_jar.verifier.verify(signer.sign(claims)) == claims
+        claims['iss'] = 'https://example.com'
+        with raises(InvalidToken, match='Invalid issuer'):
+            key_jar.verifier.verify(signer.sign(claims))
+
+    def test_access_token(self, signer, claims):
+        verifier = TokenVerifier({signer.kid: signer.key.public_key()},
+                                 access_token=True)
+        with raises(InvalidToken, match='Not an access token'):
+            verifier.verify(signer.sign(claims))
+
+        claims.update(client_id='client', scope=['email'])
+        assert verifier.verify(signer.sign(claims)) == claims
+
+        # ID token, signed by the same key
+        for name in ('nonce', 'at_hash'):
+            with raises(InvalidToken, match='Not an access token'):
+                verifier.verify(signer.sign(dict(claims, **{name: 'x'})))
+
+    @mark.parametrize('alg', ['ES256', 'EdDSA'])
+    def test_algorithms(self, jwt_key, alg, claims):
+        signer = Signer(generate_key(alg))
+        key_jar = KeyJar(keys=[jwt_key, signer.key])
+        claims = access_claims(key_jar, claims)
+        token = signer.sign(claims)
+        assert key_jar.verifier.verify(token) == claims
+        assert TokenVerifier.from_jwks(key_jar.jwks).verify(token) == claims
+
+        # Other algorithms are not accepted
+        verifier = TokenVerifier(key_jar.verifier.keys, algorithms=['RS256'])
+        with raises(InvalidToken, match='Unsupported algorithm'):
+            verifier.verify(token)
+
+    def test_algorithm_mismatch(self, signer, claims):
+        # Token signed by RSA key, but its kid is of EC key
+        verifier = TokenVerifier(
+            {signer.kid: generate_key('ES256').public_key()})
+        with raises(InvalidToken, match='does not match'):
+            verifier.verify(signer.sign(claims))
@@ -0,0 +1,134 @@
+__author__ = 'Gennady Kovalev <gik@bigur.ru>'
+__copyright__ = '(c) 2016-2019 Development management business group'
+__licence__ = 'For license information see LICENSE'
+
+from multiprocessing import get_context
+from os import getpid, kill
+from signal import SIG_IGN, SIGKILL, SIGTERM, signal
+from time import monotonic, sleep
+
+from pytest import fixture
+
+from bigur.auth.revocation import RevocationList
+from bigur.auth.session import MemorySessionStore, SQLiteSessionStore
+from bigur.auth.store import Memory
+from bigur.auth.workers import Supervisor, unshared_state
+
+# pylint: disable=redefined-outer-name
+
+
+def register(path: str) -> None:
+    with open(path, 'a') as fh:
+        fh.write('{}\n'.format(getpid()))
+
+
+def read_pids(path: str):
+    try:
+        with open(path) as fh:
+            return [int(x) for x in fh.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+def wait_pids(path: str, count: int, timeout: float = 10):
+    deadline = monotonic() + timeout
+    while monotonic() < deadline:
+        pids = read_pids(path)
+        if len(pids) >= count:
+            return pids
+        sleep(0.01)
+    raise AssertionError('Workers not started')
+
+
+def serve(path: str) -> None:
+    register(path)
+    sleep(60)
+
+
+def serve_stubborn(path: str) -> None:
+    signal(SIGTERM, SIG_IGN)
+    register(path)
+    sleep(60)
+
+
+def crash(path: str) -> None:
+    register(path)
+    raise RuntimeError('Crash')
+
+
+def is_alive(pid: int) -> bool:
+    try:
+        kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+@fixture
+def pids_file(tmpdir):
+    return str(tmpdir.join('pids'))
+
+
+def start_supervisor(**kwargs):
+    process = get_context('fork').Process(
+        target=lambda: Supervisor(**kwargs).run())
+    process.start()
+    return process
+
+
+class TestSupervisor(object):
+    '''Test supervisor of worker processes.'''
+
+    def test_restart(self, pids_file):
+        process = start_supervisor(target=lambda: serve(pids_file),
+                                   workers=2)
+        try:
+            first, second = wait_pids(pids_file, 2)
+            kill(first, SIGKILL)
+            third = wait_pids(pids_file, 3)[2]
+            assert third not in (first, second)
+        finally:
+            process.terminate()
+            process.join(10)
+        assert process.exitcode == 0
+        assert not is_alive(second)
+        assert not is_alive(third)
+
+    def test_shutdown_timeout(self, pids_file):
+        process = start_supervisor(target=lambda: serve_stubborn(pids_file),
+                                   workers=1,
+                                   shutdown_timeout=0.2)
+        pid = wait_pids(pids_file, 1)[0]
+        begin = monotonic()
+        process.terminate()
+        process.join(10)
+        assert process.exitcode == 0
+        assert monotonic() - begin < 5
+        assert not is_alive(pid)
+
+    def test_crash_delay(self, pids_file):
+        process = start_supervisor(target=lambda: crash(pids_file),
+                                   workers=1,
+                                   restart_delay=1)
+        try:
+            wait_pids(pids_file, 2)
+            sleep(0.3)
+            # Worker crashes at once, so it is restarted with delay
+            assert len(read_pids(pids_file)) == 2
+        finally:
+            process.terminate()
+            process.join(10)
+        assert process.exitcode == 0
+
+
+class TestUnsharedState(object):
+    '''Test detection of state, which is not shared by workers.'''
+
+    def test_memory(self):
+        assert len(unshared_state(Memory(), MemorySessionStore(),
+                                  RevocationList())) == 3
+
+    def test_shared(self, tmpdir):
+        sessions = SQLiteSessionStore(path=str(tmpdir.join('s.sqlite')))
+        revocations = RevocationList(path=str(tmpdir.join('r.sqlite')))
+        assert unshared_state(object(), sessions, revocations) == []